@@ -0,0 +1,109 @@
+import os
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+# Queue-depth-aware admission control for /get-advice.
+# Each request is admitted in the cheapest mode that keeps the service inside
+# its latency SLO. Pressure is the worse of two signals: how many requests are
+# in the service (running, or arrived and still waiting for a handler thread)
+# compared to MAX_IN_FLIGHT, and how recent latency compares to the SLO.
+# Arrival is recorded by middleware on the event loop (arrive()), before the
+# handoff to the thread pool, so a saturated pool shows up as queue depth and
+# latency is measured from arrival. As pressure rises the
+# service steps down:
+#
+#   full            classifier + encoder + retrieval (normal path)
+#   no_classifier   skip the emotion classifier
+#   cached          encoder only; semantic-cache hit or validation layer only
+#   low_confidence  no models at all, build_low_confidence_response()
+
+LATENCY_SLO_MS = float(os.environ.get("NOTIA_LATENCY_SLO_MS", "800"))
+MAX_IN_FLIGHT = int(os.environ.get("NOTIA_MAX_IN_FLIGHT", "32"))
+
+SERVICE_MODES = ("full", "no_classifier", "cached", "low_confidence")
+
+# Upper pressure bound for each mode except the last (which takes the rest)
+MODE_THRESHOLDS = (0.6, 0.85, 1.2)
+
+_arrival: ContextVar[dict | None] = ContextVar("notia_admission_arrival", default=None)
+
+
+class AdmissionController:
+    def __init__(
+        self,
+        slo_ms: float = LATENCY_SLO_MS,
+        max_in_flight: int = MAX_IN_FLIGHT,
+        smoothing: float = 0.2,
+    ):
+        self.slo_ms = slo_ms
+        self.max_in_flight = max_in_flight
+        self.smoothing = smoothing
+
+        self.in_flight = 0
+        self.queued = 0  # arrived, not admitted yet
+        self.latency_ms = 0.0  # exponentially weighted moving average
+        self.served = {mode: 0 for mode in SERVICE_MODES}
+        self._lock = threading.Lock()
+
+    def pressure(self) -> float:
+        """>= 1.0 means the queue is full or latency is at/over the SLO."""
+        depth = self.in_flight + self.queued
+        return max(depth / self.max_in_flight, self.latency_ms / self.slo_ms)
+
+    def _choose_mode(self) -> str:
+        pressure = self.pressure()
+        for mode, bound in zip(SERVICE_MODES, MODE_THRESHOLDS):
+            if pressure < bound:
+                return mode
+        return SERVICE_MODES[-1]
+
+    @contextmanager
+    def arrive(self):
+        """Count the current request as queued until admit() picks it up."""
+        arrival = {"start": time.perf_counter(), "admitted": False}
+        with self._lock:
+            self.queued += 1
+        token = _arrival.set(arrival)
+        try:
+            yield
+        finally:
+            _arrival.reset(token)
+            with self._lock:
+                if not arrival["admitted"]:  # rejected before admission
+                    self.queued -= 1
+
+    @contextmanager
+    def admit(self):
+        """Yield the service mode for one request and record its latency."""
+        arrival = _arrival.get()
+        with self._lock:
+            if arrival is not None and not arrival["admitted"]:
+                arrival["admitted"] = True
+                self.queued -= 1
+            self.in_flight += 1
+            mode = self._choose_mode()
+            self.served[mode] += 1
+
+        # from arrival when known, so time spent waiting for a thread counts
+        start = arrival["start"] if arrival is not None else time.perf_counter()
+        try:
+            yield mode
+        finally:
+            elapsed_ms = (time.perf_counter() - start) * 1000
+            with self._lock:
+                self.in_flight -= 1
+                self.latency_ms += self.smoothing * (elapsed_ms - self.latency_ms)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "latency_slo_ms": self.slo_ms,
+                "max_in_flight": self.max_in_flight,
+                "in_flight": self.in_flight,
+                "queued": self.queued,
+                "latency_ewma_ms": round(self.latency_ms, 2),
+                "pressure": round(self.pressure(), 3),
+                "served": dict(self.served),
+            }
@@ -0,0 +1,122 @@
+import hashlib
+import json
+from urllib.parse import quote
+
+try:
+    import orjson
+except ImportError:  # orjson is optional; stdlib json is just slower
+    orjson = None
+
+# Pre-serialized advice payloads.
+# The layer texts for a parent_id only change when the index is rebuilt, so
+# each parent's `advice_layers` object is encoded to JSON bytes once at load
+# time. Responses serialize only the per-request fields (emotions, confidence,
+# ...) and splice the cached bytes in, so serialization cost no longer grows
+# with the amount of advice text.
+
+LAYER_TYPES = ('validation', 'psychoeducation', 'technique', 'reframing', 'journaling')
+
+# Layers sent inline when a client asks for progressive disclosure; the rest
+# are fetched one by one from GET /advice/{parent_id}/layers/{layer_type}
+INITIAL_LAYERS = ('validation',)
+
+
+def index_version(*paths: str) -> str:
+    """Short content hash of the index files; changes whenever they are rebuilt."""
+    digest = hashlib.sha256()
+    for path in paths:
+        with open(path, 'rb') as f:
+            for block in iter(lambda: f.read(1 << 20), b''):
+                digest.update(block)
+    return digest.hexdigest()[:12]
+
+
+def dumps(obj) -> bytes:
+    """Compact UTF-8 JSON, via orjson when it is installed."""
+    if orjson is not None:
+        return orjson.dumps(obj, option=orjson.OPT_SERIALIZE_NUMPY)
+    return json.dumps(obj, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+
+class PreSerialized:
+    """JSON bytes that render_response() splices in without re-encoding."""
+
+    __slots__ = ("raw",)
+
+    def __init__(self, raw: bytes):
+        self.raw = raw
+
+
+def render_response(body: dict) -> bytes:
+    """Encode a response dict, splicing PreSerialized values in verbatim."""
+    raw_fields = {k: v for k, v in body.items() if isinstance(v, PreSerialized)}
+    if not raw_fields:
+        return dumps(body)
+
+    head = dumps({k: v for k, v in body.items() if k not in raw_fields})
+    parts = [head[:-1]]  # drop the closing brace
+    needs_comma = head != b"{}"
+    for key, value in raw_fields.items():
+        if needs_comma:
+            parts.append(b",")
+        parts.append(dumps(key) + b":" + value.raw)
+        needs_comma = True
+    parts.append(b"}")
+    return b"".join(parts)
+
+
+class AdvicePayloads:
+    """Per-parent_id advice layers, as dicts and as pre-encoded JSON."""
+
+    def __init__(self, metadata: list[dict], version: str = "", knowledge_base: str | None = None):
+        self.version = version
+        self.knowledge_base = knowledge_base  # added to layer URLs for non-default bases
+        self.layers: dict[str, dict] = {}
+        for m in metadata:
+            if m["layer_type"] not in LAYER_TYPES:
+                continue
+            self.layers.setdefault(m["parent_id"], {})[m["layer_type"]] = {
+                "text": m["text"],
+                "emotions": m.get("emotions", []),
+            }
+
+        # keep the canonical layer order in every payload
+        for parent_id, layers in self.layers.items():
+            self.layers[parent_id] = {t: layers[t] for t in LAYER_TYPES if t in layers}
+
+        self.payloads = {pid: PreSerialized(dumps(layers)) for pid, layers in self.layers.items()}
+        self.initial_payloads = {
+            pid: PreSerialized(dumps({t: layers[t] for t in INITIAL_LAYERS if t in layers}))
+            for pid, layers in self.layers.items()
+        }
+
+        # Single-layer bodies with strong ETags: content hash scoped to the index version
+        self.layer_bodies: dict[tuple[str, str], tuple[bytes, str]] = {}
+        for pid, layers in self.layers.items():
+            for layer_type, layer in layers.items():
+                body = dumps({"parent_id": pid, "layer_type": layer_type, **layer})
+                etag = f'"{version}-{hashlib.sha1(body).hexdigest()[:16]}"'
+                self.layer_bodies[(pid, layer_type)] = (body, etag)
+
+    def get(self, parent_id: str) -> dict:
+        return self.layers.get(parent_id, {})
+
+    def payload(self, parent_id: str) -> PreSerialized:
+        return self.payloads.get(parent_id) or PreSerialized(b"{}")
+
+    def initial_payload(self, parent_id: str) -> PreSerialized:
+        return self.initial_payloads.get(parent_id) or PreSerialized(b"{}")
+
+    def layer(self, parent_id: str, layer_type: str) -> tuple[bytes, str] | None:
+        """(JSON body, ETag) for one layer, or None if it doesn't exist."""
+        return self.layer_bodies.get((parent_id, layer_type))
+
+    def layer_urls(self, parent_id: str) -> dict[str, str]:
+        """Versioned URLs for the layers not sent inline."""
+        kb = f"&kb={quote(self.knowledge_base, safe='')}" if self.knowledge_base else ""
+        parent = quote(parent_id, safe="")
+        return {
+            t: f"/advice/{parent}/layers/{t}?v={self.version}{kb}"
+            for t in self.layers.get(parent_id, {})
+            if t not in INITIAL_LAYERS
+        }
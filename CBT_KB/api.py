@@ -1,157 +1,33 @@
-from fastapi import FastAPI
+from fastapi import FastAPI, Request, Response, WebSocket, WebSocketDisconnect
 from fastapi.middleware.cors import CORSMiddleware
 from pydantic import BaseModel
 import json
+import logging
+import time
+import uuid
+from datetime import datetime
+from typing import Dict, List, Any
 import numpy as np
-import faiss
-from sentence_transformers import SentenceTransformer
-from transformers import pipeline
-
-#domain matching for better retrieval
-# At the top, after imports
-DOMAIN_KEYWORDS = {
-    "academic": {
-        "exam", "test", "assignment", "grade", "grades", "school", "university",
-        "class", "lecture", "midterm", "final", "study", "studying", "homework"
-    },
-    "relationships": {
-        "boyfriend", "girlfriend", "partner", "relationship", "friend", "friends",
-        "family", "mom", "dad", "sister", "brother", "husband", "wife", "cheated",
-        "cheat", "affair", "broke up", "breakup"
-    },
-    "work": {
-        "job", "work", "manager", "boss", "deadline", "office", "coworker",
-        "colleague", "promotion", "fired"
-    },
-    "gratitude_positive": {
-        "grateful", "gratitude", "thankful", "appreciate", "blessed",
-        "happy for", "proud of", "excited about"
-    },
-}
-
-def detect_domains(text: str) -> set[str]:
-    text_lower = text.lower()
-    domains: set[str] = set()
-    for domain, keywords in DOMAIN_KEYWORDS.items():
-        if any(k in text_lower for k in keywords):
-            domains.add(domain)
-    return domains
-
-#mapping issues to domains for more contextual retrieval
-# ---- existing: DOMAIN_KEYWORDS + detect_domains here ----
-
-ISSUE_TO_DOMAIN = {
-    "emotional_regulation": "emotional_regulation",
-    "emotional_validation": "emotional_validation",
-    "worthlessness": "worth/self_worth",
-    "self_doubt": "self_doubt",
-    "all_or_nothing_thinking": "all_or_nothing",
-    "anxiety": "anxiety",
-    "shame": "shame",
-    "self_sabotage": "self_sabotage",
-    "unhealthy_coping_mechanisms": "coping",
-    # extend later if you add issues like gratitude / savoring
-}
-
-SUB_ISSUE_TO_DOMAIN = {
-    # emotional_regulation
-    "acceptance_vs_suppression": "emotional_regulation",
-    "cognitive_defusion": "emotional_regulation",
-    "values_driven_action": "emotional_regulation",
-    "self_as_context": "emotional_regulation",
-    "uncomfortable_vs_wrong": "emotional_regulation",
-    "emotional_intensity_overwhelm": "emotional_regulation",
-    "difficulty_sitting_with_discomfort": "emotional_regulation",
-    "reactive_emotional_responses": "emotional_regulation",
-    "emotional_numbness_shutdown": "emotional_regulation",
-    "confusion_about_what_you_feel": "emotional_regulation",
-
-    # worthlessness
-    "intrinsic_value_recognition": "worth/self_worth",
-    "challenging_negative_self_talk": "worth/self_worth",
-    "worthlessness_driven_self_sabotage": "worth/self_worth",
-
-    # anxiety
-    "fear_vs_intuition": "anxiety",
-    "worry_as_avoidance": "anxiety",
-    "physical_symptoms_management": "anxiety",
-    "cognitive_distortions_in_anxiety": "anxiety",
-    "resistance_during_positive_change": "anxiety",
-
-    # all_or_nothing_thinking
-    "perfectionism_trap": "all_or_nothing",
-    "discounting_partial_success": "all_or_nothing",
-    "fear_of_starting": "all_or_nothing",
-    "relationship_extremes": "relationships",
-    "goal_abandonment_after_setbacks": "all_or_nothing",
-
-    # shame
-    "shame_vs_guilt_distinction": "shame",
-    "childhood_origins_of_shame": "shame",
-    "shame_spirals_and_rumination": "shame",
-    "self_compassion_as_antidote": "shame",
-    "shame_and_vulnerability": "shame",
-
-    # self_doubt
-    "confidence_through_action": "self_doubt",
-    "challenging_inner_critic": "self_doubt",
-    "understanding_origins": "self_doubt",
-    "building_evidence_of_capability": "self_doubt",
-    "embracing_imperfection": "self_doubt",
-
-    # self_sabotage
-    "upper_limit_problem": "self_sabotage",
-    "procrastination_as_protection": "self_sabotage",
-    "fear_of_outgrowing_old_identity": "self_sabotage",
-    "fear_of_visibility_and_responsibility": "self_sabotage",
-    "fear_of_disappointing_others": "self_sabotage",
-
-    # unhealthy_coping_mechanisms
-    "numbing_and_avoidance": "coping",
-    "self_destructive_patterns": "coping",
-    "overworking_and_productivity_addiction": "coping",
-    "people_pleasing_and_self_abandonment": "coping",
-    "emotional_eating_or_restriction": "eating_body",
-
-    # emotional_validation
-    "self_invalidation": "emotional_validation",
-    "minimizing_your_pain": "emotional_validation",
-    "fear_of_being_too_much": "emotional_validation",
-    "needing_permission_to_feel": "emotional_validation",
-}
-
-from typing import Dict, List, Set, Any
-
-def score_candidate(
-    entry_dict: Dict[str, Any],
-    base_score: float,
-    emotion_labels: List[str],
-    domains: Set[str],
-) -> float:
-    """Adjust FAISS base score using emotion overlap + domain match."""
-    score = base_score
-
-    # Emotion overlap
-    entry_emotions = set(entry_dict.get("emotions") or [])
-    overlap = entry_emotions.intersection(set(emotion_labels))
-    score += 0.05 * len(overlap)
-
-    # Domain from issue/sub_issue (ensure strings)
-    issue = entry_dict.get("issue") or ""
-    sub_issue = entry_dict.get("sub_issue") or ""
-
-    advice_domain = SUB_ISSUE_TO_DOMAIN.get(sub_issue) or ISSUE_TO_DOMAIN.get(issue)
-
-    # Domain match bonus
-    if advice_domain and advice_domain in domains:
-        score += 0.4
-
-    # Positive context: avoid pathologizing gratitude
-    if "gratitude_positive" in domains:
-        if advice_domain in {"shame", "self_sabotage", "self_doubt", "worth/self_worth"}:
-            score -= 0.3
-
-    return float(score)
+from admission import AdmissionController
+from advice_payloads import render_response
+from deadlines import Deadline, StageRunner, StageTimeout
+from history_store import HistoryStore
+from knowledge_bases import DEFAULT_KB, KnowledgeBase, KnowledgeBaseRegistry, UnknownKnowledgeBase
+from live_preview import PreviewSession, PreviewStats
+from model_artifacts import calibrate_probs, load_classifier, load_classifier_thresholds, load_encoder
+from profiling import RequestProfiler
+import request_log
+from runtime_profile import (
+    apply_handler_threads,
+    apply_runtime_profile,
+    gil_warning,
+    interpreter_info,
+    load_runtime_profile,
+)
+from scoring import EMOTION_LABELS, detect_domains, emotions_from_scores, score_candidate
+from taxonomy_router import TAXONOMY_ROUTING
+from text_pipeline import SharedTextPipeline
+from trend_store import GRANULARITIES, TrendStore
 
 
 def build_low_confidence_response(detected_emotions: list[dict], best_score: float):
@@ -196,114 +72,213 @@ app.add_middleware(
 
 # LOAD MODELS AT STARTUP
 
-EMOTION_LABELS = [
-    'admiration', 'amusement', 'anger', 'annoyance', 'approval', 'caring',
-    'confusion', 'curiosity', 'desire', 'disappointment', 'disapproval',
-    'disgust', 'embarrassment', 'excitement', 'fear', 'gratitude', 'grief',
-    'joy', 'love', 'nervousness', 'optimism', 'pride', 'realization',
-    'relief', 'remorse', 'sadness', 'surprise', 'neutral'
-]
+# JSON log lines via a bounded queue and a background writer (request_log.py)
+request_log.setup_logging()
+
+# Thread counts tuned for this host by autotune.py (library defaults otherwise)
+runtime_profile = load_runtime_profile()
+apply_runtime_profile(runtime_profile)
+
+request_log.log_event("startup", stage="loading_models")
+
+# Pre-built artifacts from build_artifacts.py when present (traced graphs,
+# safetensors weights, fast tokenizers); the original models otherwise
+classifier_model, classifier_tokenizer = load_classifier()
+# per-class thresholds when serving the distilled student (None for the teacher)
+classifier_thresholds = load_classifier_thresholds()
+request_log.log_event(
+    "model_loaded",
+    model="emotion_classifier",
+    impl=type(classifier_model).__name__,
+    layers=getattr(classifier_model.config, "n_layers", None),
+    calibrated=classifier_thresholds is not None,
+)
+
+embedding_model = load_encoder()
+
+# Advice bases per programme/locale, loaded on first use and evicted LRU
+# under a memory budget; every base shares the models above. Each carries
+# its FAISS index, metadata, pre-encoded advice_layers, taxonomy router
+# (issue -> sub_issue centroids) and semantic cache.
+knowledge_bases = KnowledgeBaseRegistry(embedding_dim=embedding_model.get_sentence_embedding_dimension())
+default_kb = knowledge_bases.get(DEFAULT_KB)
+
+request_log.log_event("model_loaded", model="embedding_model", impl=type(embedding_model).__name__)
+request_log.log_event(
+    "knowledge_base_loaded",
+    knowledge_base=default_kb.name,
+    layers=len(default_kb.metadata),
+    issues=len(default_kb.router.issues),
+    sub_issues=len(default_kb.router.sub_issues),
+    routing=TAXONOMY_ROUTING,
+    available=knowledge_bases.available(),
+)
 
-print("🔧 Loading models...")
+# One tokenization pass per entry feeds both the classifier and the encoder;
+# safe to share across handler threads (per-thread tokenizers, shared weights)
+text_pipeline = SharedTextPipeline(
+    classifier_model,
+    classifier_tokenizer,
+    embedding_model,
+)
+request_log.log_event("text_pipeline_ready", shared_tokenization=text_pipeline.shared_vocab)
 
-emotion_classifier = pipeline(
-    "text-classification",
-    model="../model",
-    top_k=None
+trend_store = TrendStore()
+history_store = HistoryStore(
+    embedding_dim=embedding_model.get_sentence_embedding_dimension(),
+    emotion_dim=len(EMOTION_LABELS),
 )
-print("✅ Emotion classifier loaded")
+request_log.log_event("stores_ready", stores=["trends", "history"])
 
-embedding_model = SentenceTransformer('all-MiniLM-L6-v2')
-index = faiss.read_index('embeddings/layered_advice_faiss.index')
+admission = AdmissionController()
+stages = StageRunner()
+profiler = RequestProfiler()
+preview_stats = PreviewStats()
 
-with open('embeddings/layered_advice_metadata.json', 'r', encoding='utf-8') as f:
-    metadata = json.load(f)
+def encode_query(text: str) -> np.ndarray:
+    """MiniLM embedding for a single journal entry"""
+    return text_pipeline.embed([text])[0]
 
-print("✅ Embedding model + FAISS loaded")
-print(f"✅ {len(metadata)} advice layers ready\n")
 
 def semantic_search(
     query: str,
     layer_type: str | None = None,
     top_k: int = 3,
     threshold: float = 0.0,
+    query_emb: np.ndarray | None = None,
+    route: bool = TAXONOMY_ROUTING,
+    kb: KnowledgeBase | None = None,
 ):
     """
     Pure semantic search, same as CLI search_layers.
     Used as the base retrieval before emotion/domain tweaks.
+    Pass `query_emb` to reuse an embedding the caller already computed.
+    With `route`, only layers of the best-matching sub-issues are searched
+    and each result carries the routing decision.
+    Searches `kb`, or the default knowledge base.
     """
-    query_emb = embedding_model.encode([query])[0]
-    search_k = min(top_k * 10, len(metadata))
-    distances, indices = index.search(
-        np.array([query_emb]).astype("float32"), search_k
-    )
+    kb = kb or default_kb
+    if query_emb is None:
+        query_emb = encode_query(query)
+    search_k = min(top_k * 10, len(kb.metadata))
+    search_emb = kb.search_vector(query_emb)
+
+    routing = None
+    if route:
+        dists, idxs, routing = kb.router.search(search_emb, search_k, layer_type)
+        distances, indices = [dists], [idxs]
+    else:
+        distances, indices = kb.index.search(
+            np.array([search_emb]).astype("float32"), search_k
+        )
+    # reduced bases: add back what the projection dropped, then re-rank
+    dists, idxs = kb.full_distances(query_emb, distances[0], indices[0])
 
     results = []
-    for dist, idx in zip(distances[0], indices[0]):
-        score = 1 / (1 + dist)
-
-        if score < threshold:
+    for dist, idx in zip(dists, idxs):
+        if 1 / (1 + dist) < threshold:
             continue
-
-        entry = metadata[idx]
-
-        if layer_type and entry["layer_type"] != layer_type:
+        if layer_type and kb.metadata[idx]["layer_type"] != layer_type:
             continue
 
-        results.append(
-            {
-                "score": float(score),
-                "parent_id": entry["parent_id"],
-                "issue": entry["issue"],
-                "sub_issue": entry["sub_issue"],
-                "emotions": list(entry.get("emotions", [])),
-                "layer_type": entry["layer_type"],
-                "text": entry["text"],
-            }
-        )
-
+        results.append(layer_match(kb, int(idx), float(dist), routing))
         if len(results) >= top_k:
             break
 
     return results
 
 
+def layer_match(kb: KnowledgeBase, row: int, dist: float, routing: dict | None = None) -> dict:
+    """Search result for layer `row` of `kb` at squared distance `dist`."""
+    entry = kb.metadata[row]
+    match = {
+        "score": float(1 / (1 + dist)),
+        "row": row,
+        "parent_id": entry["parent_id"],
+        "issue": entry["issue"],
+        "sub_issue": entry["sub_issue"],
+        "emotions": list(entry.get("emotions", [])),
+        "layer_type": entry["layer_type"],
+        "text": entry["text"],
+    }
+    if routing:
+        match["routing"] = routing
+    return match
+
+
+def rescore_cached_match(kb: KnowledgeBase, row: int, query_emb) -> dict:
+    """
+    A semantic-cache hit stores the matched layer row, not the earlier query's
+    result: score it (and route it) for this query's embedding instead.
+    """
+    search_emb = np.asarray(kb.search_vector(query_emb), dtype=np.float32).reshape(-1)
+    diff = kb.router.vectors[row] - search_emb
+    (dist,), _ = kb.full_distances(query_emb, [float(diff @ diff)], [row])
+    routing = kb.router.route(search_emb)[1] if TAXONOMY_ROUTING else None
+    return layer_match(kb, row, float(dist), routing)
+
+
 
 # REQUEST/RESPONSE MODELS
 
 class JournalEntry(BaseModel):
     text: str
+    user_id: str | None = None
+    entry_id: str | None = None
+    created_at: datetime | None = None
+    # advice base to search, see GET /knowledge-bases (default when omitted)
+    knowledge_base: str | None = None
+    # only send the match + validation; other layers come from /advice/{parent_id}/layers/...
+    progressive: bool = False
+
+
+class DetectedEmotion(BaseModel):
+    emotion: str
+    confidence: float
+
+
+class AdviceLayer(BaseModel):
+    text: str
+    emotions: List[str]
+
+
+class AdviceResponse(BaseModel):
+    detected_emotions: List[DetectedEmotion]
+    matched_issue: str | None
+    matched_sub_issue: str | None
+    matched_parent_id: str | None = None
+    confidence: float
+    emotion_overlap: List[str]
+    advice_layers: Dict[str, AdviceLayer]
+    layer_urls: Dict[str, str] | None = None
+    service_mode: str
+    timed_out_stages: List[str] = []
+    entry_id: str | None = None
+    similar_reflections: List[Dict[str, Any]] | None = None
+    # False when load shedding skipped the classifier or encoder: the entry was
+    # not stored, so resend it (same entry_id) to add it to trends/history
+    reflection_saved: bool | None = None
+    routing: Dict[str, Any] | None = None
 
 
 # CORE FUNCTIONS
 
 def extract_emotions(text, threshold=0.5):
-    """Extract emotions using DistilBERT safely with explicit type handling"""
-    result = emotion_classifier(text)
-    # `result` can be a list of dict or list of lists of dicts depending on pipeline
-    emotions = result[0] if isinstance(result[0], list) else result
-
-    detected = []
-    for emo in emotions:
-        # Ensure emo is dictionary-like and has keys 'label' and 'score'
-        if not isinstance(emo, dict):
-            continue
+    """Extract emotions using DistilBERT (tokens shared with the encoder)"""
+    scores = text_pipeline.classify([text])[0]
+    if classifier_thresholds is not None:
+        scores = calibrate_probs(scores, classifier_thresholds)
+    return emotions_from_scores(scores, threshold)
+
 
-        label = emo.get('label', '')
-        score = emo.get('score', 0)
-
-        # Convert types explicitly
-        if isinstance(label, str) and isinstance(score, (float, int)):
-            if label.startswith('LABEL_') and float(score) > threshold:
-                idx = int(label.split('_')[1])
-                detected.append({
-                    'emotion': EMOTION_LABELS[idx],
-                    'confidence': float(score)
-                })
-
-    detected.sort(key=lambda x: x['confidence'], reverse=True)
-    return detected
-def search_with_emotions(journal_entry, layer_type=None, top_k=3):
+def emotion_vector(detected_emotions) -> np.ndarray:
+    """Dense per-label vector from extract_emotions() output"""
+    vec = np.zeros(len(EMOTION_LABELS), dtype="float32")
+    for e in detected_emotions:
+        vec[EMOTION_LABELS.index(e["emotion"])] = e["confidence"]
+    return vec
+
+def search_with_emotions(journal_entry, layer_type=None, top_k=3, kb: KnowledgeBase | None = None):
     """
     Two-stage retrieval:
     1) Run pure semantic search (same as CLI).
@@ -316,6 +291,7 @@ def search_with_emotions(journal_entry, layer_type=None, top_k=3):
         layer_type=layer_type,
         top_k=top_k,
         threshold=0.0,
+        kb=kb,
     )
 
     # Stage 2: detect emotions
@@ -324,7 +300,7 @@ def search_with_emotions(journal_entry, layer_type=None, top_k=3):
 
     # Stage 2b: detect domains
     domains = detect_domains(journal_entry)
-    print(f"Detected domains: {domains}")
+    request_log.annotate(domains=sorted(domains))
 
     # If no extra signals, just return base results
     if not base_results:
@@ -346,24 +322,92 @@ def search_with_emotions(journal_entry, layer_type=None, top_k=3):
 
 
 
-def get_all_layers(parent_id):
+def get_all_layers(parent_id, kb: KnowledgeBase | None = None):
     """Retrieve all advice layers for a matched entry"""
-    layers = {}
-    
-    for layer_type in ['validation', 'psychoeducation', 'technique', 'reframing', 'journaling']:
-        match = next((m for m in metadata if m['parent_id'] == parent_id and m['layer_type'] == layer_type), None)
-        if match:
-            layers[layer_type] = {
-                'text': match['text'],
-                'emotions': match.get('emotions', [])
-            }
-    
-    return layers
+    return (kb or default_kb).payloads.get(parent_id)
+
+
+def record_reflection(entry: JournalEntry, emotions, query_emb, issue=None, sub_issue=None, classified=True):
+    """
+    Store this reflection in the user's trend buckets and journal history.
+    Returns the user's most similar earlier entries (anonymous entries are skipped).
+    Entries served without the classifier or the encoder (degraded modes,
+    missed deadlines) are not stored: empty emotions or a missing vector would
+    stay in the user's trends and history for good.
+    """
+    if not entry.user_id:
+        return {}
+    if not classified or query_emb is None:
+        request_log.annotate(reflection_saved=False)
+        return {"reflection_saved": False}
+
+    entry_id = entry.entry_id or uuid.uuid4().hex
+    trend_store.record(
+        entry.user_id,
+        entry_id,
+        emotions[:5],
+        issue=issue,
+        sub_issue=sub_issue,
+        created_at=entry.created_at,
+    )
+
+    emo_vec = emotion_vector(emotions)
+    similar = history_store.similar(
+        entry.user_id, query_emb, emo_vec, top_k=3, exclude_entry_id=entry_id
+    )
+
+    history_store.add(
+        entry.user_id,
+        entry_id,
+        query_emb,
+        emo_vec,
+        issue=issue,
+        sub_issue=sub_issue,
+        created_at=entry.created_at,
+    )
+
+    return {"entry_id": entry_id, "similar_reflections": similar, "reflection_saved": True}
 
 # ============================================================
 # API ENDPOINTS
 # ============================================================
 
+@app.middleware("http")
+async def log_requests(request: Request, call_next):
+    """Request id for every request, plus one sampled structured log event"""
+    supplied = request.headers.get(request_log.REQUEST_ID_HEADER, "")[:64]
+    with request_log.request_context(supplied or None) as (request_id, fields):
+        start = time.perf_counter()
+        status = 500
+        try:
+            response = await call_next(request)
+            status = response.status_code
+        finally:
+            duration_ms = (time.perf_counter() - start) * 1000
+            logged_fields = fields.close()  # late stage threads can't touch this copy
+            if request_log.should_log(status, duration_ms):
+                request_log.log_event(
+                    "request",
+                    level=logging.ERROR if status >= 500 else logging.INFO,
+                    method=request.method,
+                    path=request.url.path,
+                    status=status,
+                    duration_ms=round(duration_ms, 2),
+                    **logged_fields,
+                )
+    response.headers["X-Request-Id"] = request_id
+    return response
+
+
+@app.middleware("http")
+async def track_arrivals(request: Request, call_next):
+    """Count /get-advice requests from arrival, while they wait for a handler thread"""
+    if request.url.path != "/get-advice":
+        return await call_next(request)
+    with admission.arrive():
+        return await call_next(request)
+
+
 @app.get("/")
 def root():
     return {
@@ -378,47 +422,223 @@ def health():
     return {
         "status": "ok",
         "models_loaded": True,
-        "advice_entries": len(set(m['parent_id'] for m in metadata)),
-        "total_layers": len(metadata)
+        "interpreter": interpreter_info(),
+        "advice_entries": len(default_kb.payloads.layers),
+        "total_layers": len(default_kb.metadata),
+        "index_version": default_kb.version,
+        "advice_cache": default_kb.cache.stats(),
+        "knowledge_bases": knowledge_bases.stats(),
+        "admission": admission.stats(),
+        "stages": stages.stats(),
+        "text_pipeline": text_pipeline.stats(),
+        "live_preview": preview_stats.snapshot(),
+        "logging": request_log.stats(),
     }
 
 MIN_ACCEPTABLE_SCORE = 0.35  # tune if needed
-@app.post("/get-advice")
-def get_advice(entry: JournalEntry):
+@app.post("/get-advice", response_class=Response, responses={200: {"model": AdviceResponse}})
+def get_advice(entry: JournalEntry, request: Request):
+    # Rendered by hand: the cached advice_layers bytes are spliced in as-is
     if not entry.text or len(entry.text.strip()) < 10:
-        return {"error": "Journal entry too short. Please write at least 10 characters."}
+        body = {"error": "Journal entry too short. Please write at least 10 characters."}
+        return Response(content=render_response(body), media_type="application/json")
 
-    # 1) run pure semantic search, like CLI
-    matches = semantic_search(entry.text, layer_type="validation", top_k=1, threshold=0.0)
+    try:
+        kb = knowledge_bases.get(entry.knowledge_base)
+    except UnknownKnowledgeBase as e:
+        return unknown_knowledge_base(e.name)
 
-    # 2) run emotions only for display (not used for retrieval)
-    emotions = extract_emotions(entry.text, threshold=0.5)
+    with profiler.maybe_profile(request.headers, "get-advice") as profile_id:
+        with admission.admit() as mode:
+            request_log.annotate(service_mode=mode, knowledge_base=kb.name, profile_id=profile_id)
+            body = {**build_advice(entry, mode, kb), "service_mode": mode}
+        content = render_response(body)
+
+    headers = {"X-Notia-Profile-Id": profile_id} if profile_id else None
+    return Response(content=content, media_type="application/json", headers=headers)
 
-    if not matches:
-        return build_low_confidence_response(emotions, best_score=0.0)
 
-    match = matches[0]
-    parent_id = match["parent_id"]
+def unknown_knowledge_base(name: str) -> Response:
+    return Response(
+        content=render_response({"error": f"Unknown knowledge base '{name}'."}),
+        status_code=404,
+        media_type="application/json",
+    )
 
-    all_layers = get_all_layers(parent_id)
+
+def build_advice(entry: JournalEntry, mode: str, kb: KnowledgeBase):
+    """
+    Full /get-advice path, stepping down work as `mode` degrades
+    (see admission.py for the modes). Every model stage runs against the
+    request deadline; late stages are dropped and listed in `timed_out_stages`.
+    """
+    if mode == "low_confidence":
+        return {
+            **build_low_confidence_response([], best_score=0.0),
+            **record_reflection(entry, [], None, classified=False),
+        }
+
+    deadline = Deadline()
+    timed_out = []
+
+    # emotions are only for display, so classify alongside retrieval
+    emotions_future = (
+        stages.start("classify", extract_emotions, entry.text, threshold=0.5) if mode == "full" else None
+    )
+
+    # 1) run pure semantic search, like CLI, unless a near-duplicate entry
+    #    was already answered
+    query_emb = match = all_layers = None
+    try:
+        query_emb = stages.run("encode", deadline, encode_query, entry.text)
+        cached = kb.cache.get(query_emb)
+        request_log.annotate(advice_cache_hit=bool(cached))
+        if cached:
+            row, all_layers = cached
+            match = rescore_cached_match(kb, row, query_emb)
+        else:
+            matches = stages.run(
+                "retrieval", deadline, semantic_search,
+                entry.text, layer_type="validation", top_k=1, threshold=0.0, query_emb=query_emb, kb=kb,
+            )
+            match = matches[0] if matches else None
+            if not match:
+                all_layers = None
+            elif mode == "cached":
+                # overloaded: only the matched validation layer, and don't cache it
+                all_layers = {"validation": {"text": match["text"], "emotions": match["emotions"]}}
+            else:
+                all_layers = kb.payloads.payload(match["parent_id"])
+                kb.cache.put(query_emb, (match["row"], all_layers))
+
+        if match and entry.progressive and mode != "cached":
+            all_layers = kb.payloads.initial_payload(match["parent_id"])
+    except StageTimeout as e:
+        timed_out.append(e.stage)
+
+    # 2) collect emotions if they made it in time
+    emotions = []
+    if emotions_future is not None:
+        try:
+            emotions = stages.wait("classify", emotions_future, deadline)
+        except StageTimeout as e:
+            timed_out.append(e.stage)
+
+    if timed_out:
+        request_log.annotate(timed_out_stages=timed_out)
+    # emotions are only trustworthy enough to store when the classifier ran
+    classified = emotions_future is not None and "classify" not in timed_out
+
+    if not match:
+        history = record_reflection(entry, emotions, query_emb, classified=classified)
+        return {
+            **build_low_confidence_response(emotions, best_score=0.0),
+            **history,
+            "timed_out_stages": timed_out,
+        }
+
+    history = record_reflection(
+        entry, emotions, query_emb, match["issue"], match["sub_issue"], classified=classified
+    )
 
     return {
         "detected_emotions": emotions[:5],
         "matched_issue": match["issue"],
         "matched_sub_issue": match["sub_issue"],
+        "matched_parent_id": match["parent_id"],
         "confidence": match["score"],
         "emotion_overlap": [],  # you can compute if you want
         "advice_layers": all_layers,
+        **({"layer_urls": kb.payloads.layer_urls(match["parent_id"])} if entry.progressive else {}),
+        **history,
+        **({"routing": match["routing"]} if "routing" in match else {}),
+        "timed_out_stages": timed_out,
     }
 
 
 
+@app.get("/advice/{parent_id}/layers/{layer_type}")
+def get_advice_layer(
+    parent_id: str, layer_type: str, request: Request, v: str | None = None, kb: str | None = None
+):
+    """
+    One advice layer, for clients revealing technique/reframing/journaling on demand.
+    Strong ETags let clients and HTTP caches revalidate with a 304.
+    """
+    try:
+        base = knowledge_bases.get(kb)
+    except UnknownKnowledgeBase as e:
+        return unknown_knowledge_base(e.name)
+
+    found = base.payloads.layer(parent_id, layer_type)
+    if found is None:
+        return Response(
+            content=render_response({"error": f"No '{layer_type}' layer for advice '{parent_id}'."}),
+            status_code=404,
+            media_type="application/json",
+        )
+
+    body, etag = found
+    return cacheable_response(request, body, etag, immutable=v == base.version)
+
+
+@app.get("/advice/{parent_id}/related")
+def get_related_advice(parent_id: str, request: Request, v: str | None = None, kb: str | None = None):
+    """
+    Advice entries related to this one, from the graph built with the index
+    (see related_advice.py). No model inference; strong ETags like the layers.
+    """
+    try:
+        base = knowledge_bases.get(kb)
+    except UnknownKnowledgeBase as e:
+        return unknown_knowledge_base(e.name)
+
+    found = base.related.get(parent_id)
+    if found is None:
+        return Response(
+            content=render_response({"error": f"Unknown advice '{parent_id}'."}),
+            status_code=404,
+            media_type="application/json",
+        )
+
+    body, etag = found
+    return cacheable_response(request, body, etag, immutable=v == base.version)
+
+
+def cacheable_response(request: Request, body: bytes, etag: str, immutable: bool) -> Response:
+    """JSON body with a strong ETag, or a 304 when the client already has it."""
+    # URLs carrying the current index version never change content
+    if immutable:
+        cache_control = "public, max-age=31536000, immutable"
+    else:
+        cache_control = "public, no-cache"
+    headers = {"ETag": etag, "Cache-Control": cache_control}
+
+    if_none_match = request.headers.get("if-none-match", "")
+    if etag in [tag.strip() for tag in if_none_match.split(",")] or if_none_match.strip() == "*":
+        return Response(status_code=304, headers=headers)
+    return Response(content=body, media_type="application/json", headers=headers)
+
+
+@app.get("/knowledge-bases")
+def list_knowledge_bases():
+    """
+    Advice bases this server can answer from, and which are loaded right now
+    """
+    return {
+        "default": DEFAULT_KB,
+        "available": knowledge_bases.available(),
+        **knowledge_bases.stats(),
+    }
+
+
 @app.post("/detect-emotions")
-def detect_emotions(entry: JournalEntry):
+def detect_emotions(entry: JournalEntry, request: Request):
     """
     Utility endpoint: Only detect emotions (no advice retrieval)
     """
-    emotions = extract_emotions(entry.text, threshold=0.3)
+    with profiler.maybe_profile(request.headers, "detect-emotions"):
+        emotions = extract_emotions(entry.text, threshold=0.3)
     
     return {
         "text": entry.text,
@@ -426,12 +646,100 @@ def detect_emotions(entry: JournalEntry):
     }
 
 
+@app.websocket("/ws/emotion-preview")
+async def emotion_preview(websocket: WebSocket):
+    """
+    Live emotions while typing: send {"seq": n, "text": "..."} on every change,
+    receive {"seq": n, "detected_emotions": [...]} for the latest settled text
+    (with an "error" field and no emotions if classification failed)
+    """
+    await websocket.accept()
+    session = PreviewSession(
+        lambda text: extract_emotions(text, threshold=0.3)[:10],
+        websocket.send_json,
+        preview_stats,
+    )
+    session.start()
+    try:
+        while True:
+            try:
+                message = json.loads(await websocket.receive_text())
+            except ValueError:
+                continue
+            if isinstance(message, dict) and isinstance(message.get("text"), str):
+                session.submit(message["text"], message.get("seq"))
+    except WebSocketDisconnect:
+        pass
+    finally:
+        await session.close()
+
+
+@app.post("/similar-reflections")
+def similar_reflections(entry: JournalEntry, top_k: int = 5):
+    """
+    Look up a user's earlier entries that resemble this text, without storing it
+    """
+    if not entry.user_id:
+        return {"error": "user_id is required to search journal history."}
+    if top_k < 1 or top_k > 50:
+        return {"error": "top_k must be between 1 and 50."}
+
+    emotions = extract_emotions(entry.text, threshold=0.5)
+    similar = history_store.similar(
+        entry.user_id,
+        encode_query(entry.text),
+        emotion_vector(emotions),
+        top_k=top_k,
+        exclude_entry_id=entry.entry_id,
+    )
+    return {"user_id": entry.user_id, "similar_reflections": similar}
+
+
+@app.get("/trends/{user_id}")
+def get_trends(user_id: str, granularity: str = "day", periods: int = 30):
+    """
+    Rolling per-emotion counts and intensities, one bucket per day/week
+    """
+    if granularity not in GRANULARITIES:
+        return {"error": f"Unknown granularity '{granularity}'. Use one of: {', '.join(GRANULARITIES)}."}
+    if periods < 1 or periods > 366:
+        return {"error": "periods must be between 1 and 366."}
+
+    return {
+        "user_id": user_id,
+        "granularity": granularity,
+        "buckets": trend_store.trends(user_id, granularity, periods),
+    }
+
+
 # ============================================================
 # STARTUP EVENT
 # ============================================================
 
 @app.on_event("startup")
 def startup_event():
-    print("="*60)
-    print(" Notia API is ready")
-    print("="*60)
+    apply_handler_threads(runtime_profile)
+    interpreter = interpreter_info()
+    if interpreter["free_threaded_build"] and interpreter["gil_enabled"]:
+        # some compiled dependency lacks free-threading support
+        request_log.log_event("gil_reenabled", level=logging.WARNING,
+                              reason=gil_warning(interpreter), **interpreter)
+    request_log.log_event("ready", service="Notia API", **interpreter)
+
+
+if __name__ == "__main__":
+    import uvicorn
+
+    # `python api.py` serves from this process, with the models it already
+    # loaded. For the worker count autotune.py picked, start uvicorn itself so
+    # the models are only loaded in the workers:
+    #   uvicorn api:app --host 0.0.0.0 --port 8000 --workers N
+    workers = runtime_profile["uvicorn_workers"]
+    if workers > 1:
+        request_log.log_event(
+            "single_process",
+            level=logging.WARNING,
+            profile_workers=workers,
+            hint=f"uvicorn api:app --host 0.0.0.0 --port 8000 --workers {workers}",
+        )
+    uvicorn.run(app, host="0.0.0.0", port=8000)
@@ -1,24 +1,34 @@
 import json
 
+from corpus_store import CORPUS_DIR, write_documents
+
+# Adds the therapeutic advice to the local corpus as its own subset,
+# processed_data/cbt_bench/therapeutic_advice.parquet, next to the CBT-Bench
+# subsets built by process_cbt_data.py. Re-running replaces the subset.
+
+SUBSET = "therapeutic_advice"
+
+
+def advice_document(entry):
+    """Corpus row for one advice entry; text is its plain-text layers (or legacy advice_text)."""
+    layers = entry.get('response_layers') or {}
+    text = entry.get('advice_text') or "\n\n".join(v for v in layers.values() if isinstance(v, str))
+    return {
+        "id": entry['id'],
+        "source": SUBSET,
+        "classification": [c for c in (entry.get('issue'), entry.get('sub_issue')) if c],
+        "type": entry.get('type', 'therapeutic_advice'),
+        "text": text,  # stripped by write_documents()
+    }
+
+
 # Load the therapeutic advice
 with open('therapeutic_advice.json', 'r', encoding='utf-8') as f:
     therapeutic_advice = json.load(f)
 
-# Load the existing all_cbt_data
-with open('processed_data/all_cbt_data.json', 'r', encoding='utf-8') as f:
-    all_cbt_data = json.load(f)
-
-# Check how many entries we currently have
-print(f"Current entries in all_cbt_data: {len(all_cbt_data)}")
 print(f"Therapeutic advice entries to add: {len(therapeutic_advice)}")
 
-# Append the therapeutic advice
-all_cbt_data.extend(therapeutic_advice)
-
-print(f"Total entries after merge: {len(all_cbt_data)}")
-
-# Save the updated file
-with open('processed_data/all_cbt_data.json', 'w', encoding='utf-8') as f:
-    json.dump(all_cbt_data, f, indent=2, ensure_ascii=False)
+path = write_documents(SUBSET, [advice_document(e) for e in therapeutic_advice])
 
-print("✅ Successfully appended therapeutic advice!")
+print(f"Saved {len(therapeutic_advice)} entries → {path}")
+print(f"✅ Successfully appended therapeutic advice to {CORPUS_DIR}/!")
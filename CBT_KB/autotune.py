@@ -0,0 +1,250 @@
+import argparse
+import json
+import multiprocessing as mp
+import os
+import platform
+import queue
+import time
+import traceback
+from datetime import datetime, timezone
+
+import numpy as np
+
+from admission import LATENCY_SLO_MS
+from corpus_store import load_texts
+from projection import load_projection
+from runtime_profile import RUNTIME_PROFILE_PATH
+
+# Sweeps runtime settings against a CBT-Bench workload and writes the best
+# profile for this host to runtime_profile.json (loaded by api.py at startup).
+#
+# 1) workers x threads: N independent worker processes (one per uvicorn
+#    worker), each with T torch intra-op threads and F FAISS OpenMP threads,
+#    serve the /get-advice model path concurrently. We keep the highest
+#    throughput whose p99 stays inside the latency SLO.
+#    The models are loaded the way api.py loads them (model_artifacts: traced
+#    graphs, student + calibration when selected) and run through the same
+#    SharedTextPipeline, so the settings describe what is actually served.
+# 2) classifier batch size for the batch paths (batch_score.py), at the
+#    chosen thread count.
+
+
+WARMUP_TEXT = "I keep putting off work because I'm afraid I'll fail"
+WORKER_TIMEOUT_S = float(os.environ.get("NOTIA_AUTOTUNE_TIMEOUT_S", "900"))
+
+
+def percentile_ms(latencies, q):
+    return float(np.percentile(np.asarray(latencies) * 1000, q)) if latencies else 0.0
+
+
+def load_models():
+    """The served model path: model_artifacts loaders behind a SharedTextPipeline, as in api.py."""
+    import faiss
+
+    from model_artifacts import load_classifier, load_classifier_thresholds, load_encoder
+    from text_pipeline import SharedTextPipeline
+
+    classifier_model, classifier_tokenizer = load_classifier()
+    pipeline = SharedTextPipeline(classifier_model, classifier_tokenizer, load_encoder())
+    thresholds = load_classifier_thresholds()  # student only
+    index = faiss.read_index('embeddings/layered_advice_faiss.index')
+    projection = load_projection('embeddings')  # reduced-dimension builds only
+    return pipeline, thresholds, index, projection
+
+
+def serve_entry(pipeline, thresholds, index, projection, text):
+    """The model work of one /get-advice entry."""
+    from model_artifacts import calibrate_probs
+
+    scores = pipeline.classify([text])[0]
+    if thresholds is not None:
+        scores = calibrate_probs(scores, thresholds)
+    emb = pipeline.embed([text])
+    if projection is not None:
+        emb = projection.apply(emb)
+    index.search(np.asarray(emb, dtype='float32'), 30)
+
+
+def serve_worker(threads, faiss_threads, texts, ready, go, results):
+    """One simulated API worker: classifier + encoder + FAISS per entry."""
+    try:
+        import faiss
+        import torch
+
+        torch.set_num_threads(threads)
+        faiss.omp_set_num_threads(faiss_threads)
+        models = load_models()
+
+        # warm up before the clock starts, on a text outside the workload so
+        # the token cache doesn't favour its first entry
+        serve_entry(*models, WARMUP_TEXT)
+    except BaseException:
+        ready.put(("error", traceback.format_exc()))
+        return
+    ready.put(("ready", None))
+    go.wait()
+
+    try:
+        latencies = []
+        for text in texts:
+            start = time.perf_counter()
+            serve_entry(*models, text)
+            latencies.append(time.perf_counter() - start)
+    except BaseException:
+        results.put(("error", traceback.format_exc()))
+        return
+    results.put(("ok", latencies))
+
+
+def _collect(q, procs, what):
+    """One message per worker from `q`; raise on a worker error, crash or timeout."""
+    values = []
+    for _ in procs:
+        try:
+            status, value = q.get(timeout=WORKER_TIMEOUT_S)
+        except queue.Empty:
+            dead = [p.exitcode for p in procs if not p.is_alive()]
+            raise RuntimeError(f"no {what} from a worker within {WORKER_TIMEOUT_S:.0f}s (exit codes {dead})")
+        if status == "error":
+            raise RuntimeError(f"worker failed during {what}:\n{value}")
+        values.append(value)
+    return values
+
+
+def measure_serving(workers, threads, faiss_threads, texts):
+    ctx = mp.get_context("spawn")  # fresh interpreters, no inherited thread pools
+    ready, results = ctx.Queue(), ctx.Queue()
+    go = ctx.Event()
+
+    workers = min(workers, len(texts))  # every worker gets at least one entry
+    shares = [texts[i::workers] for i in range(workers)]
+    procs = [
+        ctx.Process(target=serve_worker, args=(threads, faiss_threads, share, ready, go, results))
+        for share in shares
+    ]
+    for p in procs:
+        p.start()
+    try:
+        _collect(ready, procs, "model loading")
+
+        start = time.perf_counter()
+        go.set()
+        latencies = [lat for share in _collect(results, procs, "the run") for lat in share]
+        wall = time.perf_counter() - start
+    except BaseException:
+        for p in procs:
+            p.terminate()
+        raise
+    finally:
+        for p in procs:
+            p.join()
+
+    return {
+        "uvicorn_workers": workers,
+        "torch_threads": threads,
+        "faiss_threads": faiss_threads,
+        "throughput_rps": len(latencies) / wall,
+        "p50_ms": percentile_ms(latencies, 50),
+        "p99_ms": percentile_ms(latencies, 99),
+    }
+
+
+def measure_batch_sizes(threads, texts, batch_sizes):
+    import torch
+
+    torch.set_num_threads(threads)
+    pipeline, _, _, _ = load_models()
+    pipeline.classify([WARMUP_TEXT])
+
+    rows = []
+    for batch_size in batch_sizes:
+        pipeline.clear_cache()  # every batch size tokenizes from scratch
+        latencies = []
+        start = time.perf_counter()
+        for i in range(0, len(texts), batch_size):
+            t = time.perf_counter()
+            pipeline.classify(texts[i:i + batch_size])
+            latencies.append(time.perf_counter() - t)
+        wall = time.perf_counter() - start
+        rows.append({
+            "classifier_batch_size": batch_size,
+            "throughput_eps": len(texts) / wall,
+            "p99_batch_ms": percentile_ms(latencies, 99),
+        })
+    return rows
+
+
+def main():
+    cpus = os.cpu_count() or 1
+    parser = argparse.ArgumentParser(description="Tune thread counts, workers and batch size for this host")
+    parser.add_argument("--texts", type=int, default=200, help="workload size (CBT-Bench test entries)")
+    parser.add_argument("--slo-ms", type=float, default=LATENCY_SLO_MS, help="p99 latency budget per entry")
+    parser.add_argument("--output", default=RUNTIME_PROFILE_PATH)
+    args = parser.parse_args()
+
+    texts = load_texts(split="test")[:args.texts]
+    if not texts:
+        print("❌ No CBT-Bench test entries found; run process_cbt_data.py or restore processed_data/*_test.json")
+        raise SystemExit(1)
+    print(f"📝 Workload: {len(texts)} CBT-Bench test entries, {cpus} CPUs, p99 SLO {args.slo_ms:.0f} ms\n")
+
+    thread_options = sorted({1, 2, 4, 8, cpus} & set(range(1, cpus + 1)))
+    configs = []
+    for threads in thread_options:
+        for faiss_threads in sorted({1, threads}):
+            workers = max(1, cpus // threads)
+            configs.append((workers, threads, faiss_threads))
+
+    print("⚡ Sweeping workers × threads...")
+    serving = []
+    for workers, threads, faiss_threads in configs:
+        try:
+            row = measure_serving(workers, threads, faiss_threads, texts)
+        except RuntimeError as e:
+            print(f"   ❌ workers={workers} torch={threads} faiss={faiss_threads}: {e}")
+            continue
+        serving.append(row)
+        print(f"   workers={workers:<3} torch={threads:<3} faiss={faiss_threads:<3} "
+              f"{row['throughput_rps']:7.1f} req/s   p50 {row['p50_ms']:7.1f} ms   p99 {row['p99_ms']:7.1f} ms")
+
+    if not serving:
+        print("❌ Every configuration failed; no profile written")
+        raise SystemExit(1)
+
+    within_slo = [r for r in serving if r["p99_ms"] <= args.slo_ms]
+    if within_slo:
+        best = max(within_slo, key=lambda r: r["throughput_rps"])
+    else:
+        print("⚠️  No configuration meets the SLO; picking the lowest p99")
+        best = min(serving, key=lambda r: r["p99_ms"])
+
+    print("\n⚡ Sweeping classifier batch size...")
+    batching = measure_batch_sizes(best["torch_threads"], texts, [1, 4, 8, 16, 32, 64])
+    for row in batching:
+        print(f"   batch={row['classifier_batch_size']:<3} {row['throughput_eps']:7.1f} entries/s   "
+              f"p99/batch {row['p99_batch_ms']:7.1f} ms")
+    best_batch = max(batching, key=lambda r: r["throughput_eps"])
+
+    profile = {
+        "torch_threads": best["torch_threads"],
+        "faiss_threads": best["faiss_threads"],
+        "uvicorn_workers": best["uvicorn_workers"],
+        "classifier_batch_size": best_batch["classifier_batch_size"],
+        "measured": {"serving": best, "batching": best_batch, "slo_ms": args.slo_ms},
+        "host": {"cpus": cpus, "machine": platform.machine(), "python": platform.python_version()},
+        "created_at": datetime.now(timezone.utc).isoformat(),
+    }
+    with open(args.output, 'w', encoding='utf-8') as f:
+        json.dump(profile, f, indent=2)
+
+    print("\n" + "="*60)
+    print(f"✅ workers={profile['uvicorn_workers']} torch={profile['torch_threads']} "
+          f"faiss={profile['faiss_threads']} batch={profile['classifier_batch_size']}")
+    print(f"💾 Saved to {args.output}")
+    if profile["uvicorn_workers"] > 1:
+        print(f"🚀 Serve with: uvicorn api:app --host 0.0.0.0 --port 8000 --workers {profile['uvicorn_workers']}")
+    print("="*60)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,361 @@
+import argparse
+import json
+import os
+import time
+from collections import deque
+from itertools import islice
+from multiprocessing import Pool
+
+import numpy as np
+
+from exact_search import EXACT_SEARCH_DTYPES, EXACT_SEARCH_MEMORY_MB, MatrixIndex
+from projection import load_projection
+from runtime_profile import load_runtime_profile
+from scoring import detect_domains, emotions_from_scores, score_candidate
+
+# Offline batch scoring for JSONL journal exports.
+# Runs the same pipeline as search_with_emotions() in api.py, but on batches:
+# one classifier call, one encode call and one FAISS search per batch,
+# fanned out over a process pool. Models load through model_artifacts and run
+# through SharedTextPipeline like the API (student + calibration included), so
+# scores match what /get-advice returns. The input is streamed: at most a few
+# batches per worker are read ahead of the writer. Progress is checkpointed
+# after every batch so an interrupted run resumes where it stopped.
+# --search-backend matrix swaps FAISS for the blocked exact search in
+# exact_search.py (same results, float16 storage under a memory cap).
+#
+#   python batch_score.py exports/entries.jsonl scored.jsonl --workers 4
+#   python batch_score.py exports/entries.jsonl scored.parquet --resume
+#   python batch_score.py exports/entries.jsonl scored.jsonl --search-backend matrix --search-dtype float16
+
+# Per-process models, set by init_worker()
+text_pipeline = None
+classifier_thresholds = None
+index = None
+projection = None
+metadata = None
+settings = None
+
+
+def init_worker(options):
+    """Load models once per worker process."""
+    global text_pipeline, classifier_thresholds, index, projection, metadata, settings
+
+    import faiss
+    import torch
+
+    from model_artifacts import load_classifier, load_classifier_thresholds, load_encoder
+    from text_pipeline import SharedTextPipeline
+
+    if options["threads_per_worker"]:
+        torch.set_num_threads(options["threads_per_worker"])
+        faiss.omp_set_num_threads(options["threads_per_worker"])
+
+    classifier_model, classifier_tokenizer = load_classifier()
+    classifier_thresholds = load_classifier_thresholds()  # student only
+    # every text is seen once, so there is nothing to gain from a token cache
+    text_pipeline = SharedTextPipeline(classifier_model, classifier_tokenizer, load_encoder(), cache_size=0)
+    index = faiss.read_index('embeddings/layered_advice_faiss.index')
+    if options["search_backend"] == "matrix":
+        index = MatrixIndex.from_faiss(
+            index, dtype=options["search_dtype"], memory_cap_mb=options["search_memory_mb"]
+        )
+    projection = load_projection('embeddings')
+    with open('embeddings/layered_advice_metadata.json', 'r', encoding='utf-8') as f:
+        metadata = json.load(f)
+    settings = options
+
+
+def score_batch(batch):
+    """
+    Score a list of (line_no, record) pairs.
+    Returns (last line_no, output rows) so the parent can checkpoint in order.
+    """
+    text_field = settings["text_field"]
+    layer_type = settings["layer_type"]
+    top_k = settings["top_k"]
+
+    rows = []
+    texts = []
+    for line_no, record in batch:
+        if not isinstance(record, dict):
+            rows.append({"line": line_no, "record": {}, "error": "not a JSON object"})
+            continue
+        text = record.get(text_field)
+        if isinstance(text, str) and text.strip():
+            texts.append(text)
+            rows.append({"line": line_no, "record": record})
+        else:
+            rows.append({"line": line_no, "record": record, "error": f"missing '{text_field}'"})
+
+    if texts:
+        from model_artifacts import calibrate_probs
+
+        probs = text_pipeline.classify(texts)
+        if classifier_thresholds is not None:
+            probs = calibrate_probs(probs, classifier_thresholds)
+        full_embeddings = text_pipeline.embed(texts)
+        embeddings = projection.apply(full_embeddings) if projection is not None else full_embeddings
+        search_k = min(top_k * 10, len(metadata))
+        distances, indices = index.search(np.asarray(embeddings, dtype='float32'), search_k)
+
+        scored = iter(zip(texts, probs, full_embeddings, distances, indices))
+        for row in rows:
+            if "error" in row:
+                continue
+            text, scores, query, dists, idxs = next(scored)
+            if projection is not None:
+                # add back what the projection dropped and re-rank, like KnowledgeBase.full_distances()
+                dists = projection.full_distances(query, dists, idxs)
+                order = np.argsort(dists, kind="stable")
+                dists, idxs = dists[order], idxs[order]
+            emotions = emotions_from_scores(scores, threshold=0.5)
+            names = [e['emotion'] for e in emotions]
+            domains = detect_domains(text)
+
+            matches = []
+            for dist, idx in zip(dists, idxs):
+                entry = metadata[idx]
+                if layer_type and entry['layer_type'] != layer_type:
+                    continue
+                base_score = float(1 / (1 + dist))
+                matches.append({
+                    'parent_id': entry['parent_id'],
+                    'issue': entry['issue'],
+                    'sub_issue': entry['sub_issue'],
+                    'layer_type': entry['layer_type'],
+                    'base_score': base_score,
+                    'score': score_candidate(entry, base_score, names, domains),
+                    'emotion_overlap': sorted(set(entry.get('emotions', [])) & set(names)),
+                })
+                if len(matches) >= top_k:
+                    break
+            matches.sort(key=lambda m: m['score'], reverse=True)
+
+            row['detected_emotions'] = emotions
+            row['domains'] = sorted(domains)
+            row['matches'] = matches
+
+    return batch[-1][0], [flatten_row(r, settings["keep_fields"]) for r in rows]
+
+
+def flatten_row(row, keep_fields):
+    """Output shape: chosen input fields + scoring results."""
+    out = {"line": row["line"]}
+    for field in keep_fields:
+        out[field] = row["record"].get(field)
+    if "error" in row:
+        out["error"] = row["error"]
+        return out
+
+    best = row["matches"][0] if row["matches"] else None
+    out.update({
+        "detected_emotions": row["detected_emotions"],
+        "domains": row["domains"],
+        "matched_parent_id": best["parent_id"] if best else None,
+        "matched_issue": best["issue"] if best else None,
+        "matched_sub_issue": best["sub_issue"] if best else None,
+        "confidence": best["score"] if best else 0.0,
+        "matches": row["matches"],
+    })
+    return out
+
+
+# ---------- input / output ----------
+
+def read_batches(path, batch_size, skip_lines):
+    """Stream (line_no, record) batches, skipping lines already checkpointed."""
+    with open(path, 'r', encoding='utf-8') as f:
+        numbered = ((i, line) for i, line in enumerate(f) if i >= skip_lines)
+        while True:
+            chunk = list(islice(numbered, batch_size))
+            if not chunk:
+                return
+            batch = []
+            for line_no, line in chunk:
+                line = line.strip()
+                try:
+                    batch.append((line_no, json.loads(line) if line else {}))
+                except json.JSONDecodeError:
+                    batch.append((line_no, None))  # reported as "not a JSON object"
+            yield batch
+
+
+def ordered_window(pool, fn, items, window):
+    """
+    Like pool.imap(fn, items), but reads at most `window` items ahead of the
+    consumer; imap would drain the whole input into its task queue.
+    """
+    pending = deque()
+    for item in items:
+        pending.append(pool.apply_async(fn, (item,)))
+        if len(pending) >= window:
+            yield pending.popleft().get()
+    while pending:
+        yield pending.popleft().get()
+
+
+class JsonlWriter:
+    def __init__(self, path, resume_bytes):
+        self.f = open(path, 'ab' if resume_bytes else 'wb')
+        self.f.truncate(resume_bytes)  # drop anything written after the last checkpoint
+
+    def write(self, rows):
+        for row in rows:
+            self.f.write(json.dumps(row, ensure_ascii=False).encode('utf-8') + b'\n')
+        self.f.flush()
+        os.fsync(self.f.fileno())
+        return {"output_bytes": self.f.tell()}
+
+    def close(self):
+        self.f.close()
+
+
+class ParquetWriter:
+    """Parquet can't be appended to, so each flush becomes a part file in a directory."""
+
+    def __init__(self, path, resume_parts, rows_per_part=50_000):
+        import pyarrow  # noqa: F401  (fail early if parquet output isn't available)
+
+        os.makedirs(path, exist_ok=True)
+        self.path = path
+        self.part = resume_parts
+        self.rows_per_part = rows_per_part
+        self.pending = []
+
+    def write(self, rows):
+        self.pending.extend(rows)
+        if len(self.pending) >= self.rows_per_part:
+            self._flush()
+        return {"output_parts": self.part} if not self.pending else None
+
+    def _flush(self):
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+
+        if not self.pending:
+            return
+        # nested fields are kept as JSON strings so every part has one schema
+        table = pa.Table.from_pylist([
+            {k: json.dumps(v, ensure_ascii=False) if isinstance(v, (list, dict)) else v for k, v in row.items()}
+            for row in self.pending
+        ])
+        pq.write_table(table, os.path.join(self.path, f"part-{self.part:05d}.parquet"))
+        self.part += 1
+        self.pending = []
+
+    def close(self):
+        self._flush()
+        return {"output_parts": self.part}
+
+
+def load_checkpoint(path):
+    if os.path.exists(path):
+        with open(path, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    return {"lines_done": 0, "output_bytes": 0, "output_parts": 0}
+
+
+def save_checkpoint(path, state):
+    tmp = path + '.tmp'
+    with open(tmp, 'w', encoding='utf-8') as f:
+        json.dump(state, f)
+    os.replace(tmp, path)  # atomic, so a crash never leaves a half-written checkpoint
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Score a JSONL export of journal entries offline")
+    parser.add_argument("input", help="JSONL file, one entry per line")
+    parser.add_argument("output", help="*.jsonl file or *.parquet directory")
+    parser.add_argument("--text-field", default="text")
+    parser.add_argument("--keep-fields", default="id", help="comma-separated input fields to copy to the output")
+    parser.add_argument("--layer-type", default="validation")
+    parser.add_argument("--top-k", type=int, default=3)
+    parser.add_argument("--batch-size", type=int, default=load_runtime_profile()["classifier_batch_size"])
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--threads-per-worker", type=int, default=1)
+    parser.add_argument("--search-backend", choices=("faiss", "matrix"), default="faiss")
+    parser.add_argument("--search-dtype", choices=EXACT_SEARCH_DTYPES, default="auto",
+                        help="matrix backend storage (auto = float32 when it fits the cap)")
+    parser.add_argument("--search-memory-mb", type=float, default=EXACT_SEARCH_MEMORY_MB,
+                        help="matrix backend memory cap per worker")
+    parser.add_argument("--resume", action="store_true", help="continue from the last checkpoint")
+    args = parser.parse_args()
+
+    parquet = args.output.endswith('.parquet')
+    checkpoint_path = args.output.rstrip('/') + '.ckpt'
+    state = load_checkpoint(checkpoint_path) if args.resume else {"lines_done": 0, "output_bytes": 0, "output_parts": 0}
+
+    if parquet:
+        writer = ParquetWriter(args.output, state["output_parts"])
+    else:
+        writer = JsonlWriter(args.output, state["output_bytes"])
+
+    options = {
+        "text_field": args.text_field,
+        "keep_fields": [f for f in args.keep_fields.split(',') if f],
+        "layer_type": args.layer_type or None,
+        "top_k": args.top_k,
+        "batch_size": args.batch_size,
+        "threads_per_worker": args.threads_per_worker,
+        "search_backend": args.search_backend,
+        "search_dtype": args.search_dtype,
+        "search_memory_mb": args.search_memory_mb,
+    }
+
+    print(f"📂 {args.input} → {args.output}")
+    if state["lines_done"]:
+        print(f"↩️  Resuming after {state['lines_done']} lines")
+    print(f"⚙️  {args.workers} workers × {args.threads_per_worker} threads, batch size {args.batch_size}, "
+          f"{args.search_backend} search\n")
+
+    batches = read_batches(args.input, args.batch_size, state["lines_done"])
+    done = 0
+    start = time.perf_counter()
+
+    if args.workers > 1:
+        pool = Pool(args.workers, initializer=init_worker, initargs=(options,))
+        # ordered, so checkpoints stay contiguous; two batches queued per worker
+        results = ordered_window(pool, score_batch, batches, window=2 * args.workers)
+    else:
+        pool = None
+        init_worker(options)
+        results = map(score_batch, batches)
+
+    bad = 0
+    try:
+        for last_line, rows in results:
+            flushed = writer.write(rows)
+            done += len(rows)
+            bad += sum("error" in r for r in rows)
+            # parquet rows only count as done once their part file is written
+            if flushed is not None:
+                state.update(flushed, lines_done=last_line + 1)
+                save_checkpoint(checkpoint_path, state)
+
+            elapsed = time.perf_counter() - start
+            print(f"\r⚡ {done} entries, {done / elapsed:.1f} entries/s", end="", flush=True)
+    except BaseException:
+        if pool is not None:
+            pool.terminate()  # don't wait for the batches still queued
+        raise
+    finally:
+        closed = writer.close()
+        if closed is not None and done:
+            state.update(closed, lines_done=last_line + 1)
+            save_checkpoint(checkpoint_path, state)
+        if pool is not None:
+            pool.close()
+            pool.join()
+
+    elapsed = time.perf_counter() - start
+    print("\n" + "="*60)
+    print(f"✅ Scored {done} entries in {elapsed:.1f}s ({done / max(elapsed, 1e-9):.1f} entries/s)")
+    if bad:
+        print(f"⚠️  {bad} rows could not be scored (see their \"error\" field)")
+    print(f"💾 Checkpoint: {checkpoint_path}")
+    print("="*60)
+
+
+if __name__ == "__main__":
+    main()
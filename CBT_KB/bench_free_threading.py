@@ -0,0 +1,200 @@
+import argparse
+import json
+import os
+import subprocess
+import time
+import warnings
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+from advice_payloads import AdvicePayloads, render_response
+from runtime_profile import gil_warning, interpreter_info
+from scoring import detect_domains, score_candidate
+from semantic_cache import SemanticCache
+
+# Throughput vs handler threads, on a GIL build and a free-threaded build.
+# The "python" workload is the per-request Python work of /get-advice without
+# the models: domain detection, an exact scan of the advice vectors, re-scoring
+# with score_candidate, a shared semantic cache, payload lookup and response
+# rendering. It needs only the embeddings/ files, so it runs on interpreters
+# that torch/faiss have no wheels for yet. "full" calls api.build_advice with
+# the real models. Every result is checked against a single-threaded run.
+# sys._is_gil_enabled() is checked before and after the run; when the GIL is
+# on, the result carries a warning and free_threading_verified is false. Only
+# a run with it false on python3.13t/3.14t says free-threading works.
+#
+#   python3.14t bench_free_threading.py --threads 1 2 4 8 16
+#   python bench_free_threading.py --interpreters python3.14 python3.14t
+#   python3.14t bench_free_threading.py --workload full
+
+EMBEDDINGS_DIR = "embeddings"
+CANDIDATES = 30
+
+
+class PythonWorkload:
+    def __init__(self, directory: str = EMBEDDINGS_DIR):
+        with open(os.path.join(directory, "layered_advice_metadata.json"), "r", encoding="utf-8") as f:
+            self.metadata = json.load(f)
+        self.vectors = np.load(os.path.join(directory, "layered_embeddings.npy")).astype(np.float32)
+        self.payloads = AdvicePayloads(self.metadata)
+        self.cache = SemanticCache(dim=self.vectors.shape[1])
+
+    def requests(self, n: int, seed: int = 0) -> list[tuple[str, np.ndarray, list[str]]]:
+        """
+        (entry text, query embedding, detected emotions) triples from jittered
+        advice. Each query comes four times, so the cache only ever hits exact
+        repeats and results don't depend on request order.
+        """
+        rng = np.random.default_rng(seed)
+        out = []
+        for _ in range(max(1, n // 4)):
+            row = int(rng.integers(len(self.metadata)))
+            query = self.vectors[row] + rng.normal(0, 0.05, self.vectors.shape[1]).astype(np.float32)
+            emotions = list(self.metadata[row].get("emotions") or [])[:3]
+            out.append((self.metadata[row]["text"], query, emotions))
+        return [out[int(i)] for i in rng.permutation(np.arange(len(out)).repeat(4))]
+
+    def reset(self):
+        self.cache.clear()
+
+    def __call__(self, request) -> bytes:
+        text, query, emotions = request
+        domains = detect_domains(text)
+
+        cached = self.cache.get(query)
+        if cached is None:
+            dist = ((self.vectors - query) ** 2).sum(axis=1)
+            rows = np.argpartition(dist, CANDIDATES)[:CANDIDATES]
+            scored = sorted(
+                ((score_candidate(self.metadata[r], 1.0 / (1.0 + float(dist[r])), emotions, domains), int(r))
+                 for r in rows),
+                reverse=True,
+            )
+            cached = self.metadata[scored[0][1]]["parent_id"]
+            self.cache.put(query, cached)
+
+        return render_response({
+            "parent_id": cached,
+            "domains": sorted(domains),
+            "emotions": emotions,
+            "layer_urls": self.payloads.layer_urls(cached),
+            "advice": self.payloads.payload(cached),
+        })
+
+
+class FullWorkload:
+    def __init__(self):
+        import api
+
+        self.api = api
+        self.texts = [m["text"] for m in api.default_kb.metadata]
+
+    def requests(self, n: int, seed: int = 0) -> list[str]:
+        rng = np.random.default_rng(seed)
+        return [self.texts[int(i)] for i in rng.integers(len(self.texts), size=n)]
+
+    def reset(self):
+        self.api.default_kb.cache.clear()
+
+    def __call__(self, text) -> bytes:
+        entry = self.api.JournalEntry(text=text)
+        return render_response(self.api.build_advice(entry, "full", self.api.default_kb))
+
+
+def run(workload, requests, threads: int) -> tuple[float, list[bytes]]:
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=threads) as pool:
+        results = list(pool.map(workload, requests))
+    return len(requests) / (time.perf_counter() - start), results
+
+
+def measure(args) -> dict:
+    before = gil_warning(interpreter_info())
+    if before:
+        warnings.warn(before, RuntimeWarning, stacklevel=2)
+    workload = PythonWorkload() if args.workload == "python" else FullWorkload()
+    requests = workload.requests(args.requests)
+
+    # single-threaded reference, which also warms lazy imports
+    _, reference = run(workload, requests, 1)
+    rows = []
+    for threads in args.threads:
+        workload.reset()  # every run starts cold, like the reference
+        rps, results = run(workload, requests, threads)
+        rows.append({"threads": threads, "rps": rps, "mismatches": sum(a != b for a, b in zip(results, reference))})
+    # checked again after the run: importing an extension may have re-enabled the GIL
+    info = interpreter_info()
+    after = gil_warning(info)
+    if after and after != before:
+        warnings.warn(after, RuntimeWarning, stacklevel=2)
+    return {
+        "interpreter": info,
+        "free_threading_verified": not info["gil_enabled"],
+        "warnings": [w for w in dict.fromkeys((before, after)) if w],
+        "workload": args.workload,
+        "rows": rows,
+    }
+
+
+def print_result(result: dict):
+    info = result["interpreter"]
+    gil = "GIL enabled" if info["gil_enabled"] else "GIL disabled"
+    build = "free-threaded build" if info["free_threaded_build"] else "default build"
+    print(f"🐍 Python {info['python']} ({build}, {gil}), workload '{result['workload']}'")
+    base = result["rows"][0]["rps"]
+    for r in result["rows"]:
+        status = "✅" if not r["mismatches"] else "❌"
+        print(f"   {status} threads={r['threads']:<3} {r['rps']:8.1f} req/s   "
+              f"x{r['rps'] / base:4.2f}   mismatches {r['mismatches']}")
+    for warning in result.get("warnings", []):
+        print(f"   ⚠️  {warning}")
+
+
+def compare(args) -> bool:
+    """Run this script under each interpreter and print the results side by side."""
+    ok = True
+    verified = False
+    for interpreter in args.interpreters:
+        cmd = [interpreter, os.path.abspath(__file__), "--json", "--workload", args.workload,
+               "--requests", str(args.requests), "--threads", *map(str, args.threads)]
+        try:
+            proc = subprocess.run(cmd, capture_output=True, text=True, check=True)
+        except (OSError, subprocess.CalledProcessError) as e:
+            print(f"❌ {interpreter}: {getattr(e, 'stderr', '') or e}")
+            ok = False
+            continue
+        result = json.loads(proc.stdout.strip().splitlines()[-1])
+        print_result(result)
+        ok &= not any(r["mismatches"] for r in result["rows"])
+        verified |= result.get("free_threading_verified", False)
+        print()
+    if not verified:
+        print("⚠️  No interpreter ran with the GIL disabled: free-threading is not verified")
+    return ok
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Request throughput vs threads, with and without the GIL")
+    parser.add_argument("--workload", choices=("python", "full"), default="python")
+    parser.add_argument("--threads", type=int, nargs="+", default=[1, 2, 4, 8, 16])
+    parser.add_argument("--requests", type=int, default=4000)
+    parser.add_argument("--interpreters", nargs="+", help="compare these interpreters, e.g. python3.14 python3.14t")
+    parser.add_argument("--json", action="store_true", help="print the result as one JSON line")
+    args = parser.parse_args()
+
+    if args.interpreters:
+        ok = compare(args)
+    else:
+        result = measure(args)
+        if args.json:
+            print(json.dumps(result))
+            return
+        print_result(result)
+        ok = not any(r["mismatches"] for r in result["rows"])
+
+    raise SystemExit(0 if ok else 1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,82 @@
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+# Cold-start benchmark: time model loading + first inference in a fresh
+# interpreter, for the original model sources vs the artifacts written by
+# build_artifacts.py. Each run is a new process so nothing is warm except
+# the OS page cache.
+#
+#   python build_artifacts.py && python bench_startup.py --runs 5
+
+BASELINE = """
+import json, time
+t0 = time.perf_counter()
+from sentence_transformers import SentenceTransformer
+from transformers import pipeline
+from text_pipeline import SharedTextPipeline
+clf = pipeline("text-classification", model="../model", top_k=None)
+enc = SentenceTransformer('all-MiniLM-L6-v2')
+t1 = time.perf_counter()
+tp = SharedTextPipeline(clf.model, clf.tokenizer, enc)
+tp.classify(["I can't stop worrying about everything"]); tp.embed(["I can't stop worrying about everything"])
+t2 = time.perf_counter()
+print(json.dumps({"load_s": t1 - t0, "first_inference_s": t2 - t1}))
+"""
+
+ARTIFACTS = """
+import json, time
+t0 = time.perf_counter()
+from model_artifacts import load_classifier, load_encoder
+from text_pipeline import SharedTextPipeline
+model, tokenizer = load_classifier()
+enc = load_encoder()
+t1 = time.perf_counter()
+tp = SharedTextPipeline(model, tokenizer, enc)
+tp.classify(["I can't stop worrying about everything"]); tp.embed(["I can't stop worrying about everything"])
+t2 = time.perf_counter()
+print(json.dumps({"load_s": t1 - t0, "first_inference_s": t2 - t1}))
+"""
+
+
+def run(script, env_traced):
+    env = dict(os.environ, NOTIA_USE_TRACED=env_traced, HF_HUB_OFFLINE="1")
+    out = subprocess.run([sys.executable, "-c", script], capture_output=True, text=True, env=env, check=True)
+    return json.loads(out.stdout.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare API model cold-start time")
+    parser.add_argument("--runs", type=int, default=5)
+    args = parser.parse_args()
+
+    variants = {
+        "original models": (BASELINE, "0"),
+        "artifacts (eager)": (ARTIFACTS, "0"),
+        "artifacts (traced)": (ARTIFACTS, "1"),
+    }
+
+    print(f"⏱️  Cold start, median of {args.runs} fresh processes\n")
+    results = {}
+    for name, (script, traced) in variants.items():
+        runs = [run(script, traced) for _ in range(args.runs)]
+        results[name] = {
+            "load_s": statistics.median(r["load_s"] for r in runs),
+            "first_inference_s": statistics.median(r["first_inference_s"] for r in runs),
+        }
+        r = results[name]
+        print(f"   {name:<20} load {r['load_s']:6.2f}s   first inference {r['first_inference_s'] * 1000:7.1f} ms")
+
+    base = results["original models"]["load_s"]
+    print("\n" + "="*60)
+    for name, r in results.items():
+        print(f"{name:<20} {base / r['load_s']:.2f}x load speedup")
+    print("="*60)
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,85 @@
+import time
+
+import numpy as np
+from sentence_transformers import SentenceTransformer
+from transformers import pipeline
+
+from corpus_store import load_texts
+from text_pipeline import SharedTextPipeline
+
+# Compares the old per-request path (pipeline + SentenceTransformer.encode,
+# each tokenizing on its own) against SharedTextPipeline on CBT-Bench texts.
+
+N_TEXTS = 300
+
+print("🔧 Loading models...")
+emotion_classifier = pipeline("text-classification", model="../model", top_k=None)
+embedding_model = SentenceTransformer('all-MiniLM-L6-v2')
+print("✅ Models loaded\n")
+
+texts = load_texts(split="test")[:N_TEXTS]
+print(f"📝 {len(texts)} journal-like texts from CBT-Bench\n")
+
+
+def cpu_time(fn):
+    start = time.process_time()
+    fn()
+    return time.process_time() - start
+
+
+# Warm up both paths so lazy init isn't measured
+emotion_classifier(texts[0])
+embedding_model.encode([texts[0]])
+
+# ---- tokenization only ----
+cls_tok = emotion_classifier.tokenizer
+emb_tok = embedding_model.tokenizer
+
+twice = cpu_time(lambda: [(cls_tok(t), emb_tok(t, truncation=True, max_length=256)) for t in texts])
+once = cpu_time(lambda: [cls_tok(t, truncation=True, max_length=512) for t in texts])
+
+# ---- end to end ----
+def baseline():
+    for t in texts:
+        emotion_classifier(t)
+        embedding_model.encode([t])
+
+
+shared = SharedTextPipeline(emotion_classifier.model, emotion_classifier.tokenizer, embedding_model)
+
+
+def shared_path():
+    for t in texts:
+        shared.classify([t])
+        shared.embed([t])
+
+
+base_cpu = cpu_time(baseline)
+shared_cpu = cpu_time(shared_path)
+
+# ---- agreement ----
+def pipeline_probs(text):
+    result = emotion_classifier(text)
+    emotions = result[0] if isinstance(result[0], list) else result
+    emotions = sorted(emotions, key=lambda e: int(e['label'].split('_')[1]))
+    return [e['score'] for e in emotions]
+
+
+sample = texts[:50]
+ref_probs = np.array([pipeline_probs(t) for t in sample])
+ref_emb = embedding_model.encode(sample)
+probs_diff = np.abs(shared.classify(sample) - ref_probs).max()
+emb_diff = np.abs(shared.embed(sample) - ref_emb).max()
+
+print("="*60)
+print(f"Shared vocabulary: {shared.shared_vocab}")
+print(f"Tokenizer calls (shared path): {shared.tokenizer_calls} for {len(texts)} texts")
+print("-"*60)
+print(f"⏱️  Tokenization only:  twice {twice*1000:.1f} ms   once {once*1000:.1f} ms   "
+      f"saved {(twice-once)/len(texts)*1000:.3f} ms/entry")
+print(f"⏱️  End to end:         baseline {base_cpu:.2f} s   shared {shared_cpu:.2f} s   "
+      f"saved {(base_cpu-shared_cpu)/len(texts)*1000:.2f} ms/entry CPU")
+print("-"*60)
+print(f"🔗 Max |Δ| classifier probs: {probs_diff:.2e}")
+print(f"🔗 Max |Δ| embeddings:       {emb_diff:.2e}")
+print("="*60)
@@ -0,0 +1,33 @@
+import argparse
+import json
+
+from model_artifacts import ARTIFACT_DIR, build_artifacts
+
+# Build ready-to-load model artifacts for fast API cold starts.
+# Re-run after retraining ../model or upgrading torch/transformers; the
+# loaders in model_artifacts.py pick the artifacts up automatically.
+#
+#   python build_artifacts.py
+#   python build_artifacts.py --no-trace   # local copies only, eager models
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Build pre-compiled model artifacts")
+    parser.add_argument("--no-trace", action="store_true", help="skip TorchScript tracing")
+    args = parser.parse_args()
+
+    print(f"🔧 Building model artifacts in {ARTIFACT_DIR}/ ...")
+    manifest = build_artifacts(trace=not args.no_trace)
+
+    print("\n" + "="*60)
+    for name in ("emotion_classifier", "minilm"):
+        if manifest["traced"].get(name):
+            print(f"✅ {name}: traced graph + safetensors + fast tokenizer")
+        else:
+            print(f"⚠️  {name}: safetensors + fast tokenizer (eager model, no traced graph)")
+    print(json.dumps(manifest, indent=2))
+    print("="*60)
+
+
+if __name__ == "__main__":
+    main()
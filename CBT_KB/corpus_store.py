@@ -0,0 +1,210 @@
+import glob
+import json
+import os
+
+# Local columnar store for the CBT-Bench corpus.
+# Raw subsets are fetched from the Hub once and kept as Arrow datasets under
+# raw_data/, so later runs work offline. The processed corpus is written once,
+# as one Parquet file per subset with a fixed schema. Readers load only the
+# columns they need, instead of every script re-downloading and re-dumping
+# ~1 MB of pretty-printed JSON. Documents from other sources (the therapeutic
+# advice, see append_advice.py) are added as extra subsets with
+# write_documents().
+#
+# The per-subset processed_data/<subset>.json files stay committed: they are
+# what load_texts() reads on a fresh checkout with no network, pyarrow or
+# datasets, so the benchmarks and tuning scripts always have input.
+
+HF_DATASET = "Psychotherapy-LLM/CBT-Bench"
+RAW_DIR = "raw_data/cbt_bench"
+CORPUS_DIR = "processed_data/cbt_bench"
+
+SUBSETS = [
+    "distortions_seed",
+    "distortions_test",
+    "core_major_seed",
+    "core_major_test",
+    "core_fine_seed",
+    "core_fine_test",
+]
+
+# label column -> document type, checked in this order
+LABEL_COLUMNS = [
+    ("core_belief_fine_grained", "core_belief_fine"),
+    ("core_belief_major", "core_belief_major"),
+    ("distortion", "cognitive_distortion"),
+]
+
+
+def corpus_schema():
+    import pyarrow as pa
+
+    return pa.schema([
+        ("id", pa.string()),
+        ("source", pa.string()),
+        ("situation", pa.string()),
+        ("thoughts", pa.string()),
+        ("original_text", pa.string()),
+        ("classification", pa.list_(pa.string())),
+        ("type", pa.string()),
+        ("text", pa.string()),
+    ])
+
+
+def load_raw_subset(subset: str):
+    """
+    First split of a CBT-Bench subset, from raw_data/ when it is already there.
+    Only touches the network the first time a subset is requested.
+    """
+    from datasets import load_dataset, load_from_disk
+
+    local = os.path.join(RAW_DIR, subset)
+    if os.path.isdir(local):
+        ds = load_from_disk(local)
+    else:
+        ds = load_dataset(HF_DATASET, subset)
+        ds.save_to_disk(local)
+
+    split = list(ds.keys())[0]
+    return ds[split]
+
+
+def _to_documents(batch, indices, subset, label_column, doc_type):
+    """Batched map: raw CBT-Bench rows -> corpus rows."""
+    n = len(indices)
+    situations = batch.get("situation") or [""] * n
+    thoughts = batch.get("thoughts") or [""] * n
+    originals = batch.get("ori_text") or [""] * n
+    labels = batch.get(label_column) if label_column else None
+
+    classifications = []
+    texts = []
+    for i in range(n):
+        label = labels[i] if labels is not None else None
+        if isinstance(label, str):
+            label = [label]
+        classifications.append(label)
+        label_text = label if label is not None else 'N/A'
+        texts.append((
+            f"Situation: {situations[i] or ''}\n\n"
+            f"Thoughts: {thoughts[i] or ''}\n\n"
+            f"Classification: {label_text}\n\n"
+            f"Type: {doc_type or 'N/A'}"
+        ).strip())
+
+    return {
+        "id": [f"{subset}_{idx}" for idx in indices],
+        "source": [subset] * n,
+        "situation": [s or "" for s in situations],
+        "thoughts": [t or "" for t in thoughts],
+        "original_text": [o or "" for o in originals],
+        "classification": classifications,
+        "type": [doc_type] * n,
+        "text": texts,
+    }
+
+
+def build_subset(subset: str, num_proc: int | None = None) -> str:
+    """Process one raw subset into processed_data/cbt_bench/<subset>.parquet."""
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    data = load_raw_subset(subset)
+    label_column, doc_type = next(
+        ((col, t) for col, t in LABEL_COLUMNS if col in data.column_names), (None, None)
+    )
+
+    docs = data.map(
+        _to_documents,
+        batched=True,
+        with_indices=True,
+        num_proc=num_proc,
+        remove_columns=data.column_names,
+        fn_kwargs={"subset": subset, "label_column": label_column, "doc_type": doc_type},
+    )
+
+    os.makedirs(CORPUS_DIR, exist_ok=True)
+    path = os.path.join(CORPUS_DIR, f"{subset}.parquet")
+    table = pa.Table.from_pydict(docs.to_dict(), schema=corpus_schema())
+    pq.write_table(table, path, compression="zstd")
+    return path
+
+
+def write_documents(subset: str, documents: list[dict]) -> str:
+    """
+    Write documents from another source as processed_data/cbt_bench/<subset>.parquet.
+    Missing columns are left empty and text is stripped, like build_subset().
+    Rewrites the whole subset, so running it again never duplicates rows.
+    """
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    if subset in SUBSETS:
+        raise ValueError(f"'{subset}' is a CBT-Bench subset; rebuild it with process_cbt_data.py")
+
+    rows = []
+    for doc in documents:
+        classification = doc.get("classification")
+        rows.append({
+            "id": doc["id"],
+            "source": doc.get("source") or subset,
+            "situation": doc.get("situation") or "",
+            "thoughts": doc.get("thoughts") or "",
+            "original_text": doc.get("original_text") or "",
+            "classification": [classification] if isinstance(classification, str) else classification,
+            "type": doc.get("type"),
+            "text": (doc.get("text") or "").strip(),
+        })
+
+    os.makedirs(CORPUS_DIR, exist_ok=True)
+    path = os.path.join(CORPUS_DIR, f"{subset}.parquet")
+    pq.write_table(pa.Table.from_pylist(rows, schema=corpus_schema()), path, compression="zstd")
+    return path
+
+
+def corpus_paths(subsets=None, split: str | None = None) -> list[str]:
+    """
+    Parquet files for the requested subsets, or all of a split ("seed"/"test").
+    Without either, every subset on disk, extra ones included.
+    """
+    if subsets is None and split is None:
+        extra = sorted(
+            os.path.basename(p)[:-len(".parquet")] for p in glob.glob(os.path.join(CORPUS_DIR, "*.parquet"))
+        )
+        subsets = SUBSETS + [s for s in extra if s not in SUBSETS]
+    elif subsets is None:
+        subsets = [s for s in SUBSETS if s.endswith(f"_{split}")]
+    return [
+        os.path.join(CORPUS_DIR, f"{s}.parquet")
+        for s in subsets
+        if os.path.exists(os.path.join(CORPUS_DIR, f"{s}.parquet"))
+    ]
+
+
+def load_corpus(columns=None, subsets=None, split: str | None = None):
+    """Read only `columns` of the processed corpus as one pyarrow Table."""
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    paths = corpus_paths(subsets, split)
+    if not paths:
+        raise FileNotFoundError(f"No processed corpus in {CORPUS_DIR}; run process_cbt_data.py first")
+    return pa.concat_tables([pq.read_table(p, columns=columns) for p in paths])
+
+
+def load_texts(split: str = "test", columns=("situation", "thoughts")) -> list[str]:
+    """
+    Journal-like texts for benchmarks and tuning: the given columns joined per row.
+    Falls back to the committed processed_data/<subset>.json files when no
+    Parquet corpus has been built.
+    """
+    if corpus_paths(split=split):
+        table = load_corpus(columns=list(columns), split=split).to_pydict()
+        rows = zip(*(table[c] for c in columns))
+    else:
+        rows = []
+        for path in sorted(glob.glob(f"processed_data/*_{split}.json")):
+            with open(path, 'r', encoding='utf-8') as f:
+                rows.extend(tuple(doc.get(c, "") for c in columns) for doc in json.load(f))
+
+    return [" ".join(v for v in row if v).strip() for row in rows]
@@ -1,53 +1,170 @@
+import argparse
+import hashlib
 import json
+import os
+import shutil
+
+import faiss
 import numpy as np
 from sentence_transformers import SentenceTransformer
-import faiss
-import os
+
+from projection import PROJECTION_FILE, PROJECTION_METHODS, fit_projection
+from related_advice import RELATED_FILE, RELATED_K, build_related_graph, save_related_graph
+
+# Builds the layered advice index.
+# Texts are sorted by length so each batch pads to similar sizes, encoded in
+# chunks (optionally across several processes) and every finished chunk is
+# written to embeddings/chunks/ right away. A crashed run picks up at the
+# first missing chunk, as long as the texts, ids, model and chunking are all
+# unchanged (see the manifest below); the final .npy and FAISS index are assembled by
+# streaming the chunks back in, never holding every embedding twice.
+# --input/--output-dir build additional knowledge bases (knowledge_bases.py).
+# --project-dim fits a PCA (projection.py) and indexes the reduced vectors;
+# layered_embeddings.npy keeps the full vectors so the map can be refitted.
+# The related-advice graph (related_advice.py) is built from the full vectors.
+
+parser = argparse.ArgumentParser(description="Create embeddings + FAISS index for layered advice")
+parser.add_argument("--workers", type=int, default=1, help="encoding processes (>1 uses a multi-process pool)")
+parser.add_argument("--batch-size", type=int, default=64)
+parser.add_argument("--chunk-size", type=int, default=4096, help="texts per on-disk chunk")
+parser.add_argument("--input", default="processed_data/flattened_layered_advice.json")
+parser.add_argument("--output-dir", default="embeddings", help="e.g. knowledge_bases/<name> for another base")
+parser.add_argument("--chunk-dir", default=None, help="defaults to <output-dir>/chunks")
+parser.add_argument("--project-dim", type=int, default=0, help="reduce the index to this many dims (e.g. 64-128)")
+parser.add_argument("--projection", choices=PROJECTION_METHODS, default="pca")
+parser.add_argument("--related-k", type=int, default=RELATED_K, help="related entries kept per advice entry")
+parser.add_argument("--fresh", action="store_true", help="discard chunks from a previous run")
+args = parser.parse_args()
+args.chunk_dir = args.chunk_dir or os.path.join(args.output_dir, 'chunks')
 
 print("🔧 Creating embeddings for layered advice...\n")
 
 # Load flattened layered advice
 print("📂 Loading flattened data...")
-with open('processed_data/flattened_layered_advice.json', 'r', encoding='utf-8') as f:
+with open(args.input, 'r', encoding='utf-8') as f:
     documents = json.load(f)
 
 print(f"✅ Loaded {len(documents)} layer records\n")
 
 # Load model
 print("🧠 Loading sentence transformer...")
-model = SentenceTransformer('all-MiniLM-L6-v2')
-print("✅ Model loaded (384-dim)\n")
+ENCODER_NAME = 'all-MiniLM-L6-v2'
+model = SentenceTransformer(ENCODER_NAME)
+dimension = model.get_sentence_embedding_dimension()
+print(f"✅ Model loaded ({dimension}-dim)\n")
 
-# Extract text
+# Extract text, longest first so padding waste is minimal within each batch
 print("📝 Extracting text...")
 texts = [doc['text'] for doc in documents]
+order = sorted(range(len(texts)), key=lambda i: len(texts[i]), reverse=True)
 print(f"✅ {len(texts)} text chunks ready\n")
 
-# Create embeddings
+# Chunks are only reusable for the exact same texts, model and chunking;
+# edited advice keeps its ids, so the texts themselves are hashed
+texts_hash = hashlib.sha256()
+for text in texts:
+    texts_hash.update(text.encode('utf-8'))
+    texts_hash.update(b'\0')
+manifest = {
+    "model": ENCODER_NAME,
+    "max_seq_length": model.max_seq_length,
+    "texts_sha256": texts_hash.hexdigest(),
+    "count": len(texts),
+    "chunk_size": args.chunk_size,
+    "dimension": dimension,
+    "ids": [doc['id'] for doc in documents],
+}
+manifest_path = os.path.join(args.chunk_dir, 'manifest.json')
+if os.path.exists(manifest_path) and not args.fresh:
+    with open(manifest_path, 'r', encoding='utf-8') as f:
+        if json.load(f) != manifest:
+            print("⚠️  Corpus or model changed since the last run, starting over")
+            args.fresh = True
+if args.fresh and os.path.isdir(args.chunk_dir):
+    shutil.rmtree(args.chunk_dir)
+os.makedirs(args.chunk_dir, exist_ok=True)
+with open(manifest_path, 'w', encoding='utf-8') as f:
+    json.dump(manifest, f)
+
+# Create embeddings chunk by chunk
 print("⚡ Creating embeddings...")
-embeddings = model.encode(texts, show_progress_bar=True, convert_to_numpy=True)
-embeddings = np.array(embeddings, dtype='float32')
+pool = model.start_multi_process_pool(['cpu'] * args.workers) if args.workers > 1 else None
+chunk_paths = []
+
+try:
+    for start in range(0, len(order), args.chunk_size):
+        rows = np.array(order[start:start + args.chunk_size], dtype='int64')
+        path = os.path.join(args.chunk_dir, f"chunk_{start // args.chunk_size:05d}.npz")
+        chunk_paths.append(path)
+
+        if os.path.exists(path):
+            print(f"   ↩️  {os.path.basename(path)} already done")
+            continue
+
+        batch_texts = [texts[i] for i in rows]
+        if pool is not None:
+            emb = model.encode_multi_process(batch_texts, pool, batch_size=args.batch_size)
+        else:
+            emb = model.encode(batch_texts, batch_size=args.batch_size, convert_to_numpy=True)
+
+        # write-then-rename, so a chunk on disk is always complete
+        tmp = path + '.tmp.npz'
+        np.savez(tmp, rows=rows, embeddings=np.asarray(emb, dtype='float32'))
+        os.replace(tmp, path)
+        print(f"   ✅ {os.path.basename(path)}: {start + len(rows)}/{len(order)}")
+finally:
+    if pool is not None:
+        model.stop_multi_process_pool(pool)
+
+# Assemble: scatter chunks back into corpus order on disk
+print("\n🧩 Assembling embeddings from chunks...")
+os.makedirs(args.output_dir, exist_ok=True)
+embeddings = np.lib.format.open_memmap(
+    os.path.join(args.output_dir, 'layered_embeddings.npy'), mode='w+', dtype='float32', shape=(len(texts), dimension)
+)
+for path in chunk_paths:
+    with np.load(path) as chunk:
+        embeddings[chunk['rows']] = chunk['embeddings']
+embeddings.flush()
 
 print(f"✅ Shape: {embeddings.shape}\n")
 
-# Build FAISS index
+# Optional reduction, fitted on the full corpus vectors
+projection = None
+projection_path = os.path.join(args.output_dir, PROJECTION_FILE)
+if args.project_dim:
+    print(f"📉 Fitting {args.projection} projection {dimension} → {args.project_dim} dims...")
+    projection = fit_projection(embeddings, args.project_dim, args.projection)
+    # what each row loses to the map, added back to search distances (projection.py)
+    projection.corpus_residuals = projection.residuals(embeddings)
+    projection.save(projection_path)
+    print(f"✅ Keeps {projection.explained_variance(embeddings):.1%} of the variance\n")
+elif os.path.exists(projection_path):
+    os.remove(projection_path)  # a full-size rebuild must not keep an old projection
+
+# Build FAISS index, streaming from the memory-mapped file
 print("🔍 Building FAISS index...")
-dimension = embeddings.shape[1]
-index = faiss.IndexFlatL2(dimension)
-index.add(embeddings)
+index = faiss.IndexFlatL2(projection.out_dim if projection is not None else dimension)
+for start in range(0, len(texts), args.chunk_size):
+    block = np.ascontiguousarray(embeddings[start:start + args.chunk_size])
+    index.add(projection.apply(block) if projection is not None else block)
 print(f"✅ Index has {index.ntotal} vectors\n")
 
 # Save
-os.makedirs('embeddings', exist_ok=True)
-faiss.write_index(index, 'embeddings/layered_advice_faiss.index')
+faiss.write_index(index, os.path.join(args.output_dir, 'layered_advice_faiss.index'))
 
-with open('embeddings/layered_advice_metadata.json', 'w', encoding='utf-8') as f:
+with open(os.path.join(args.output_dir, 'layered_advice_metadata.json'), 'w', encoding='utf-8') as f:
     json.dump(documents, f, indent=2, ensure_ascii=False)
 
-np.save('embeddings/layered_embeddings.npy', embeddings)
+# Related-advice graph between entries, served by /advice/{parent_id}/related
+print("🕸️  Building related-advice graph...")
+related = build_related_graph(embeddings, documents, k=args.related_k)
+save_related_graph(related, os.path.join(args.output_dir, RELATED_FILE))
+print(f"✅ {len(related)} entries × {args.related_k} related\n")
 
 print("="*50)
 print("✅ DONE")
 print(f"📊 {len(documents)} layer records")
-print(f"📐 {dimension}-dimensional embeddings")
+print(f"📐 {dimension}-dimensional embeddings, {index.d}-dimensional index")
+print(f"🗂️  {len(chunk_paths)} chunks in {args.chunk_dir} (safe to delete)")
 print("="*50)
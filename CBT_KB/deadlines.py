@@ -0,0 +1,121 @@
+import os
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from concurrent.futures import TimeoutError as FutureTimeout
+
+import profiling
+import request_log
+
+# Request deadlines for /get-advice.
+# Each request gets a total time budget, split into per-stage budgets. Stages
+# run on a small worker pool so the handler can stop waiting for a stalled
+# classifier or encoder and answer with whatever did finish. The abandoned
+# call still runs to completion in the background; its result is dropped.
+# Abandoned calls keep their pool thread, so at most NOTIA_STAGE_MAX_ABANDONED
+# of them may be outstanding: past that, new stages are shed (they fail at
+# once with StageShed, reported like a missed deadline) until some finish.
+
+REQUEST_DEADLINE_MS = float(os.environ.get("NOTIA_REQUEST_DEADLINE_MS", "2000"))
+STAGE_WORKERS = int(os.environ.get("NOTIA_STAGE_WORKERS", "16"))
+STAGE_MAX_ABANDONED = int(os.environ.get("NOTIA_STAGE_MAX_ABANDONED", str(STAGE_WORKERS // 2)))
+
+# Share of the request deadline each stage may use. The classifier runs
+# alongside encode + retrieval, so it may use whatever is left of the request.
+STAGE_BUDGETS = {
+    "encode": 0.4,
+    "retrieval": 0.3,
+    "classify": 1.0,
+}
+
+
+class StageTimeout(Exception):
+    def __init__(self, stage: str):
+        super().__init__(f"stage '{stage}' missed its deadline")
+        self.stage = stage
+
+
+class StageShed(StageTimeout):
+    """The stage was never started: too many abandoned stages still hold pool threads."""
+
+    def __init__(self, stage: str):
+        super().__init__(stage)
+        self.args = (f"stage '{stage}' shed: too many abandoned stages still running",)
+
+
+class Deadline:
+    """Wall-clock budget for one request."""
+
+    def __init__(self, total_ms: float = REQUEST_DEADLINE_MS):
+        self.total = total_ms / 1000
+        self.expires = time.monotonic() + self.total
+
+    def remaining(self) -> float:
+        return max(0.0, self.expires - time.monotonic())
+
+    def budget(self, stage: str) -> float:
+        """Seconds this stage may wait: its share, capped by what is left."""
+        return min(self.total * STAGE_BUDGETS.get(stage, 1.0), self.remaining())
+
+
+class StageRunner:
+    """Runs pipeline stages on a shared pool and counts missed deadlines per stage."""
+
+    def __init__(self, max_workers: int = STAGE_WORKERS, max_abandoned: int = STAGE_MAX_ABANDONED):
+        self._pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="notia-stage")
+        self._lock = threading.Lock()
+        self.max_abandoned = max_abandoned
+        self.abandoned = 0  # timed out, still running
+        self.timeouts = {stage: 0 for stage in STAGE_BUDGETS}
+        self.shed = {stage: 0 for stage in STAGE_BUDGETS}
+
+    def submit(self, fn, *args, **kwargs) -> Future:
+        # traced(): a profiled request keeps sampling while its stages run here
+        return self._pool.submit(profiling.traced(fn), *args, **kwargs)
+
+    def wait(self, stage: str, future: Future, deadline: Deadline):
+        """Result of `future`, or StageTimeout if the stage's budget runs out first."""
+        try:
+            return future.result(timeout=deadline.budget(stage))
+        except FutureTimeout:
+            cancelled = future.cancel()  # only works if it never started
+            with self._lock:
+                self.timeouts[stage] = self.timeouts.get(stage, 0) + 1
+                if not cancelled:
+                    self.abandoned += 1
+            if not cancelled:
+                future.add_done_callback(self._release)
+            raise StageTimeout(stage) from None
+
+    def _release(self, _future: Future):
+        with self._lock:
+            self.abandoned -= 1
+
+    def start(self, stage: str, fn, *args, **kwargs) -> Future:
+        """
+        Submit `fn` as `stage`; its run time goes on the request's log event.
+        When too many abandoned stages are still running, the returned future
+        fails with StageShed instead.
+        """
+        with self._lock:
+            shed = self.abandoned >= self.max_abandoned
+            if shed:
+                self.shed[stage] = self.shed.get(stage, 0) + 1
+        if shed:
+            future = Future()
+            future.set_exception(StageShed(stage))
+            return future
+        return self.submit(request_log.timed(stage, fn), *args, **kwargs)
+
+    def run(self, stage: str, deadline: Deadline, fn, *args, **kwargs):
+        return self.wait(stage, self.start(stage, fn, *args, **kwargs), deadline)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "deadline_ms": REQUEST_DEADLINE_MS,
+                "timeouts": dict(self.timeouts),
+                "abandoned": self.abandoned,
+                "max_abandoned": self.max_abandoned,
+                "shed": dict(self.shed),
+            }
@@ -0,0 +1,283 @@
+import argparse
+import json
+import os
+import random
+import re
+import time
+
+import numpy as np
+
+from corpus_store import load_texts
+from model_artifacts import CLASSIFIER_SOURCE, STUDENT_DIR, THRESHOLDS_FILE, classifier_max_length
+from scoring import EMOTION_LABELS
+
+# Distils the DistilBERT emotion classifier (../model) into a smaller student
+# that runs on CPU at a fraction of the cost.
+#
+# 1) Teacher soft labels: sigmoid probabilities over the local texts (CBT-Bench
+#    situations/thoughts and posts, advice layers, and their single sentences,
+#    which look like entries still being typed). Cached, so re-runs skip it.
+# 2) Student: the teacher with most transformer layers removed; the kept layers,
+#    embeddings and head start from the teacher's weights. Same tokenizer and
+#    vocabulary, so text_pipeline.py still tokenizes once for both models.
+# 3) Training on CPU with BCE against the soft labels.
+# 4) Per-class thresholds on a calibration split (best F1 against the
+#    teacher's decisions), saved as optimal_thresholds.npy like the teacher's.
+# 5) Report on a separate evaluation split: agreement with the teacher and
+#    speedup, in distill_report.json.
+#
+# Splits are by source text, so a text and its sentences always land in the
+# same split. Everything runs at the serving max_length (512 for DistilBERT).
+#
+#   python distill_classifier.py --layers 2 --epochs 4
+#   NOTIA_EMOTION_MODEL=student uvicorn api:app
+
+SOFT_LABELS_PATH = "processed_data/teacher_soft_labels.npz"
+TEACHER_THRESHOLD = 0.5  # extract_emotions() default
+
+
+def sentences(text: str) -> list[str]:
+    return [s.strip() for s in re.split(r"(?<=[.!?])\s+", text) if len(s.strip()) > 15]
+
+
+def collect_texts() -> tuple[list[str], list[int]]:
+    """
+    Local distillation corpus, deduplicated, in a fixed order, and for each
+    text the index of the source text it came from (itself or the text it is
+    a sentence of).
+    """
+    sources = []
+    for split in ("seed", "test"):
+        sources += load_texts(split=split)
+        sources += load_texts(split=split, columns=("original_text",))
+    with open('processed_data/flattened_layered_advice.json', 'r', encoding='utf-8') as f:
+        sources += [doc['text'] for doc in json.load(f)]
+
+    texts, groups, seen = [], [], set()
+    for source_id, source in enumerate(dict.fromkeys(t for t in sources if t)):
+        for text in (source, *sentences(source)):
+            if text not in seen:
+                seen.add(text)
+                texts.append(text)
+                groups.append(source_id)
+    return texts, groups
+
+
+def split_by_source(groups: list[int], holdout: float, seed: int = 42) -> tuple[list[int], list[int], list[int]]:
+    """(train, calibration, evaluation) rows; held-out sources are halved between the last two."""
+    sources = sorted(set(groups))
+    random.Random(seed).shuffle(sources)
+    cut = int(len(sources) * (1 - holdout))
+    mid = cut + (len(sources) - cut) // 2
+    split_of = {s: 0 if pos < cut else 1 if pos < mid else 2 for pos, s in enumerate(sources)}
+
+    splits = ([], [], [])
+    for row, source in enumerate(groups):
+        splits[split_of[source]].append(row)
+    return splits
+
+
+def predict_probs(model, tokenizer, texts, max_length, batch_size=32) -> np.ndarray:
+    import torch
+
+    out = []
+    with torch.inference_mode():
+        for i in range(0, len(texts), batch_size):
+            enc = tokenizer(texts[i:i + batch_size], padding=True, truncation=True,
+                            max_length=max_length, return_tensors="pt")
+            out.append(torch.sigmoid(model(**enc).logits).float().numpy())
+    return np.concatenate(out)
+
+
+def teacher_soft_labels(texts, teacher, tokenizer, max_length, batch_size) -> np.ndarray:
+    if os.path.exists(SOFT_LABELS_PATH):
+        cached = np.load(SOFT_LABELS_PATH, allow_pickle=False)
+        if list(cached["texts"]) == texts and int(cached.get("max_length", 0)) == max_length:
+            print("↩️  Reusing cached teacher soft labels")
+            return cached["probs"]
+
+    print(f"🧠 Teacher labelling {len(texts)} texts...")
+    probs = predict_probs(teacher, tokenizer, texts, max_length, batch_size)
+    np.savez_compressed(SOFT_LABELS_PATH, texts=np.array(texts), probs=probs, max_length=max_length)
+    return probs
+
+
+def make_student(teacher, num_layers: int):
+    """Teacher with `num_layers` evenly spaced transformer layers kept."""
+    import copy
+
+    from transformers import AutoModelForSequenceClassification
+
+    teacher_layers = teacher.config.n_layers
+    keep = np.linspace(0, teacher_layers - 1, num_layers).round().astype(int).tolist()
+
+    config = copy.deepcopy(teacher.config)
+    config.n_layers = num_layers
+    student = AutoModelForSequenceClassification.from_config(config)
+
+    state = {}
+    for key, value in teacher.state_dict().items():
+        match = re.match(r"distilbert\.transformer\.layer\.(\d+)\.(.*)", key)
+        if match is None:
+            state[key] = value
+        elif int(match.group(1)) in keep:
+            state[f"distilbert.transformer.layer.{keep.index(int(match.group(1)))}.{match.group(2)}"] = value
+    student.load_state_dict(state)
+    return student, keep
+
+
+def train_student(student, tokenizer, texts, targets, max_length, epochs, batch_size, lr):
+    import torch
+
+    student.train()
+    optimizer = torch.optim.AdamW(student.parameters(), lr=lr)
+    loss_fn = torch.nn.BCEWithLogitsLoss()
+    order = list(range(len(texts)))
+    rng = random.Random(0)
+
+    for epoch in range(epochs):
+        rng.shuffle(order)
+        total = 0.0
+        start = time.perf_counter()
+        for i in range(0, len(order), batch_size):
+            rows = order[i:i + batch_size]
+            enc = tokenizer([texts[r] for r in rows], padding=True, truncation=True,
+                            max_length=max_length, return_tensors="pt")
+            loss = loss_fn(student(**enc).logits, torch.tensor(targets[rows]))
+            optimizer.zero_grad()
+            loss.backward()
+            optimizer.step()
+            total += loss.item() * len(rows)
+        print(f"   epoch {epoch + 1}/{epochs}: loss {total / len(order):.4f} "
+              f"({time.perf_counter() - start:.0f}s)")
+    student.eval()
+
+
+def f1(pred: np.ndarray, gold: np.ndarray) -> float:
+    tp = float((pred & gold).sum())
+    denom = float(pred.sum() + gold.sum())
+    return 2 * tp / denom if denom else 1.0
+
+
+def calibrate_thresholds(student_probs, teacher_probs) -> np.ndarray:
+    """Per class, the student threshold that best reproduces the teacher's decisions."""
+    gold = teacher_probs > TEACHER_THRESHOLD
+    grid = np.arange(0.05, 0.96, 0.01)
+    thresholds = np.full(student_probs.shape[1], TEACHER_THRESHOLD, dtype=np.float32)
+    for c in range(student_probs.shape[1]):
+        if not gold[:, c].any():
+            continue  # teacher never fires on this class here; keep its threshold
+        scores = [f1(student_probs[:, c] > t, gold[:, c]) for t in grid]
+        thresholds[c] = grid[int(np.argmax(scores))]
+    return thresholds
+
+
+def agreement(student_probs, teacher_probs, thresholds) -> dict:
+    from model_artifacts import calibrate_probs
+
+    calibrated = calibrate_probs(student_probs, thresholds)
+    gold = teacher_probs > TEACHER_THRESHOLD
+    pred = calibrated > TEACHER_THRESHOLD
+    per_class = {
+        EMOTION_LABELS[c]: round(f1(pred[:, c], gold[:, c]), 4)
+        for c in range(gold.shape[1]) if gold[:, c].any()
+    }
+    return {
+        "micro_f1": round(f1(pred, gold), 4),
+        "macro_f1": round(float(np.mean(list(per_class.values()))), 4) if per_class else None,
+        "exact_match": round(float((pred == gold).all(axis=1).mean()), 4),
+        "top1_agreement": round(float((calibrated.argmax(1) == teacher_probs.argmax(1)).mean()), 4),
+        "mean_abs_prob_diff": round(float(np.abs(calibrated - teacher_probs).mean()), 4),
+        "per_class_f1": per_class,
+    }
+
+
+def latency_ms(model, tokenizer, texts, max_length, runs=3) -> float:
+    """Median single-entry latency, the /get-advice access pattern."""
+    import torch
+
+    timings = []
+    with torch.inference_mode():
+        for _ in range(runs):
+            for text in texts:
+                enc = tokenizer(text, truncation=True, max_length=max_length, return_tensors="pt")
+                start = time.perf_counter()
+                model(**enc)
+                timings.append(time.perf_counter() - start)
+    return float(np.median(timings) * 1000)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Distil the emotion classifier into a smaller student")
+    parser.add_argument("--layers", type=int, default=2, help="transformer layers kept in the student")
+    parser.add_argument("--epochs", type=int, default=4)
+    parser.add_argument("--batch-size", type=int, default=32)
+    parser.add_argument("--lr", type=float, default=5e-5)
+    parser.add_argument("--holdout", type=float, default=0.2,
+                        help="share of source texts held out, half for calibration and half for the report")
+    parser.add_argument("--output", default=STUDENT_DIR)
+    args = parser.parse_args()
+
+    from transformers import AutoModelForSequenceClassification, AutoTokenizer
+
+    tokenizer = AutoTokenizer.from_pretrained(CLASSIFIER_SOURCE)
+    teacher = AutoModelForSequenceClassification.from_pretrained(CLASSIFIER_SOURCE).eval()
+
+    max_length = classifier_max_length(teacher, tokenizer)
+    texts, groups = collect_texts()
+    probs = teacher_soft_labels(texts, teacher, tokenizer, max_length, args.batch_size)
+    print(f"✅ {len(texts)} texts from {len(set(groups))} sources with soft labels (max_length {max_length})\n")
+
+    train_rows, calib_rows, eval_rows = split_by_source(groups, args.holdout)
+    random.Random(42).shuffle(train_rows)
+
+    student, kept = make_student(teacher, args.layers)
+    print(f"🎓 Student: {args.layers}/{teacher.config.n_layers} layers (teacher layers {kept}), "
+          f"{sum(p.numel() for p in student.parameters()) / 1e6:.1f}M params "
+          f"vs {sum(p.numel() for p in teacher.parameters()) / 1e6:.1f}M")
+    train_student(
+        student, tokenizer,
+        [texts[r] for r in train_rows], probs[train_rows],
+        max_length, args.epochs, args.batch_size, args.lr,
+    )
+
+    # thresholds are tuned on one held-out half and reported on the other
+    calib_probs = predict_probs(student, tokenizer, [texts[r] for r in calib_rows], max_length, args.batch_size)
+    thresholds = calibrate_thresholds(calib_probs, probs[calib_rows])
+    eval_texts = [texts[r] for r in eval_rows]
+    eval_probs = predict_probs(student, tokenizer, eval_texts, max_length, args.batch_size)
+
+    os.makedirs(args.output, exist_ok=True)
+    student.save_pretrained(args.output, safe_serialization=True)
+    tokenizer.save_pretrained(args.output)
+    np.save(os.path.join(args.output, THRESHOLDS_FILE), thresholds)
+
+    sample = eval_texts[:100]
+    teacher_ms = latency_ms(teacher, tokenizer, sample, max_length)
+    student_ms = latency_ms(student, tokenizer, sample, max_length)
+    report = {
+        "student_layers": args.layers,
+        "teacher_layers": teacher.config.n_layers,
+        "max_length": max_length,
+        "train_texts": len(train_rows),
+        "calibration_texts": len(calib_rows),
+        "evaluation_texts": len(eval_rows),
+        "teacher_threshold": TEACHER_THRESHOLD,
+        "agreement": agreement(eval_probs, probs[eval_rows], thresholds),
+        "latency_ms": {"teacher": round(teacher_ms, 2), "student": round(student_ms, 2)},
+        "speedup": round(teacher_ms / student_ms, 2),
+    }
+    with open(os.path.join(args.output, "distill_report.json"), 'w', encoding='utf-8') as f:
+        json.dump(report, f, indent=2)
+
+    print("\n" + "="*60)
+    print(f"✅ Agreement with teacher: micro-F1 {report['agreement']['micro_f1']}, "
+          f"top-1 {report['agreement']['top1_agreement']}")
+    print(f"⚡ {report['latency_ms']['teacher']:.1f} ms → {report['latency_ms']['student']:.1f} ms "
+          f"({report['speedup']}x)")
+    print(f"💾 Student saved to {args.output} (serve with NOTIA_EMOTION_MODEL=student)")
+    print("="*60)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,4 +1,4 @@
-from datasets import load_dataset
+from corpus_store import RAW_DIR, load_raw_subset
 
 print("Downloading CBT-Bench dataset...\n")
 
@@ -20,24 +20,11 @@ downloaded_data = {}
 for subset_key, description in subsets.items():
     try:
         print(f" Downloading '{subset_key}' - {description}...")
-        ds = load_dataset("Psychotherapy-LLM/CBT-Bench", subset_key)
-        downloaded_data[subset_key] = ds
-        
-        # Safely get split keys
-        split_keys = [str(s) for s in ds.keys()] if hasattr(ds, 'keys') else [] # type: ignore
-        # Count total examples across splits
-        total = 0
-        for split in split_keys:
-            subset = ds[split]
-            if hasattr(subset, '__len__'):
-
-                try:
-                    total += len(subset) # type: ignore
-                except TypeError:
-                    continue
-                pass  # Skip if size info is unavailable
-        print(f"   Downloaded: {total} examples")
-        print(f"   Splits: {split_keys}\n")
+        # Cached under raw_data/ as Arrow; later runs (and process_cbt_data.py) load it offline
+        data = load_raw_subset(subset_key)
+        downloaded_data[subset_key] = data
+        print(f"   Downloaded: {data.num_rows} examples")
+        print(f"   Stored in: {RAW_DIR}/{subset_key}\n")
         
     except Exception as e:
         print(f"   Skipped '{subset_key}': {e}\n")
@@ -47,22 +34,11 @@ print(" DOWNLOAD SUMMARY")
 print("="*60)
 
 total_examples = 0
-for subset_name, dataset in downloaded_data.items():
-    split_keys = [str(s) for s in dataset.keys()] if hasattr(dataset, 'keys') else []
-    if not split_keys:
-        continue
-    split = split_keys[0]
-    count = 0
-    if hasattr(dataset[split], '__len__'):
-        try:
-            count = len(dataset[split])
-        except TypeError:
-            pass
+for subset_name, data in downloaded_data.items():
+    count = data.num_rows
+    total_examples += count
     print(f"\n✓ {subset_name}: {count} examples")
-    print(f"  Columns: {dataset[split].column_names}")
-    if count > 0:
-        example = dataset[split][0]
-        print(f"  Sample keys: {list(example.keys())}")
+    print(f"  Columns: {data.column_names}")
 
 print(f"\n{'='*60}")
 print(f"🎉 Total examples downloaded: {total_examples}")
@@ -0,0 +1,96 @@
+import argparse
+import json
+import time
+
+import faiss
+import numpy as np
+
+from eval_projection import jittered_corpus
+from exact_search import EXACT_SEARCH_MEMORY_MB, MatrixIndex
+
+# Checks the blocked exact search (exact_search.py) against IndexFlatL2 and
+# times both on the batch_score.py access pattern: a few thousand queries
+# against corpora from a few hundred to a few hundred thousand vectors.
+# For every size and storage dtype: share of top-k ids identical to FAISS,
+# largest distance difference, resident MB, and queries/s next to FAISS
+# answering the same block in one search() call and one call per query.
+#
+#   python eval_exact_search.py --sizes 420 10000 100000 300000 --queries 4000
+#   python eval_exact_search.py --memory-mb 64   # force small blocks
+
+def throughput(search, queries, k) -> float:
+    start = time.perf_counter()
+    search(queries, k)
+    return len(queries) / (time.perf_counter() - start)
+
+
+def per_query_throughput(index, queries, k, limit=500) -> float:
+    queries = queries[:limit]
+    start = time.perf_counter()
+    for q in queries:
+        index.search(q[None, :], k)
+    return len(queries) / (time.perf_counter() - start)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare the blocked exact search with IndexFlatL2")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[420, 10_000, 100_000, 300_000])
+    parser.add_argument("--dtypes", nargs="+", choices=("float32", "float16"), default=["float32", "float16"])
+    parser.add_argument("--queries", type=int, default=4000)
+    parser.add_argument("--k", type=int, default=30)
+    parser.add_argument("--noise", type=float, default=0.02, help="jitter for synthetic corpus growth")
+    parser.add_argument("--memory-mb", type=float, default=EXACT_SEARCH_MEMORY_MB)
+    parser.add_argument("--faiss-threads", type=int, default=0, help="0 = FAISS default")
+    parser.add_argument("--output", default="exact_search_eval.json")
+    args = parser.parse_args()
+
+    if args.faiss_threads:
+        faiss.omp_set_num_threads(args.faiss_threads)
+    rng = np.random.default_rng(0)
+    base = np.load('embeddings/layered_embeddings.npy').astype(np.float32)
+    print(f"📐 {base.shape[0]} advice vectors ({base.shape[1]} dims), "
+          f"{args.queries} queries, top-{args.k}, {args.memory_mb:g} MB cap\n")
+
+    rows = []
+    for size in args.sizes:
+        corpus = jittered_corpus(base, size, args.noise, rng)
+        queries = jittered_corpus(base, size + args.queries, args.noise, rng)[size:]
+        flat = faiss.IndexFlatL2(corpus.shape[1])
+        flat.add(corpus)
+        truth_d, truth_i = flat.search(queries, args.k)
+
+        print(f"corpus {size:>8,}")
+        faiss_qps = throughput(flat.search, queries, args.k)
+        faiss_single_qps = per_query_throughput(flat, queries, args.k)
+        print(f"   faiss     batched {faiss_qps:9.0f} q/s   one per query {faiss_single_qps:9.0f} q/s")
+
+        for dtype in args.dtypes:
+            try:
+                matrix = MatrixIndex(corpus, dtype=dtype, memory_cap_mb=args.memory_mb)
+            except ValueError as e:
+                print(f"   {dtype:<9} skipped: {e}")
+                continue
+            found_d, found_i = matrix.search(queries, args.k)
+            row = {
+                "size": size,
+                "dtype": dtype,
+                "id_agreement": float((found_i == truth_i).mean()),
+                "top1_agreement": float((found_i[:, 0] == truth_i[:, 0]).mean()),
+                "max_distance_diff": float(np.abs(found_d - truth_d).max()),
+                "memory_mb": matrix.nbytes / 2**20,
+                "qps": throughput(matrix.search, queries, args.k),
+                "faiss_qps": faiss_qps,
+                "faiss_single_qps": faiss_single_qps,
+            }
+            rows.append(row)
+            print(f"   {dtype:<9} {row['qps']:9.0f} q/s   ids {row['id_agreement']:.4f}   "
+                  f"top-1 {row['top1_agreement']:.4f}   Δdist {row['max_distance_diff']:.1e}   "
+                  f"{row['memory_mb']:8.2f} MB")
+
+    with open(args.output, 'w', encoding='utf-8') as f:
+        json.dump(rows, f, indent=2)
+    print(f"\n💾 Saved to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,165 @@
+import argparse
+import json
+import time
+
+import faiss
+import numpy as np
+
+from projection import PROJECTION_METHODS, fit_projection
+from scoring import detect_domains, score_candidate
+
+# Recall / memory / latency of reduced-dimension advice indexes.
+# The real advice vectors (embeddings/layered_embeddings.npy) are scaled up
+# with jittered copies to simulate larger knowledge bases. For every corpus
+# size, each (method, dims) index is compared with the full-size IndexFlatL2:
+# recall@k against its exact top-k, index memory, and median single-query
+# search latency (the /get-advice access pattern).
+# Raw neighbour recall is not what users see, so each index also runs the
+# /get-advice ranking: top k*10 candidates, 1/(1+dist), score_candidate()
+# with the query's domains (emotion bonuses need the classifier and are left
+# out). "rank" is how often the re-ranked best advice matches the full index,
+# "rank_raw" the same on uncorrected projected distances, and "score_shift"
+# the mean base-score change of that winner; see projection.py on residuals.
+#
+#   python eval_projection.py --dims 64 96 128 --sizes 420 10000 100000
+
+def jittered_corpus(base: np.ndarray, size: int, noise: float, rng, return_rows: bool = False):
+    """
+    `size` unit vectors: the real ones first, then perturbed copies. With
+    `return_rows`, also the row of `base` each vector was made from.
+    """
+    if size <= len(base):
+        corpus, rows = base[:size].copy(), np.arange(size)
+    else:
+        extra_rows = rng.integers(0, len(base), size - len(base))
+        extra = base[extra_rows] + rng.normal(0, noise, (len(extra_rows), base.shape[1])).astype(np.float32)
+        extra /= np.linalg.norm(extra, axis=1, keepdims=True)
+        corpus = np.vstack([base, extra]).astype(np.float32)
+        rows = np.concatenate([np.arange(len(base)), extra_rows])
+    return (corpus, rows) if return_rows else corpus
+
+
+def query_vectors(args, corpus, metadata, rng) -> tuple[np.ndarray, list[str]]:
+    """(query vectors, their texts); jittered advice stands in for entries with --no-encoder."""
+    if args.no_encoder:
+        vectors, rows = jittered_corpus(corpus, len(corpus) + args.queries, args.noise, rng, return_rows=True)
+        return vectors[len(corpus):], [metadata[r]["text"] for r in rows[len(corpus):]]
+
+    from corpus_store import load_texts
+    from model_artifacts import load_sentence_transformer
+
+    texts = load_texts(split="test")[:args.queries]
+    vectors = load_sentence_transformer().encode(texts, convert_to_numpy=True)
+    return np.asarray(vectors, dtype=np.float32), texts
+
+
+def best_advice(dists, idxs, entries, domains) -> tuple[int, float]:
+    """(row, base score) /get-advice would pick from these candidates."""
+    scored = [
+        (score_candidate(entries[i], 1.0 / (1.0 + float(d)), [], domains), -int(i), 1.0 / (1.0 + float(d)))
+        for d, i in zip(dists, idxs)
+    ]
+    _, row, base = max(scored)
+    return -row, base
+
+
+def search_latency_ms(index, queries, k) -> float:
+    timings = []
+    for q in queries[:200]:
+        start = time.perf_counter()
+        index.search(q[None, :], k)
+        timings.append(time.perf_counter() - start)
+    return float(np.median(timings) * 1000)
+
+
+def recall_at_k(found: np.ndarray, truth: np.ndarray) -> float:
+    k = truth.shape[1]
+    return float(np.mean([len(set(f) & set(t)) / k for f, t in zip(found, truth)]))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Evaluate PCA / truncated advice indexes")
+    parser.add_argument("--dims", type=int, nargs="+", default=[64, 96, 128])
+    parser.add_argument("--methods", nargs="+", choices=PROJECTION_METHODS, default=list(PROJECTION_METHODS))
+    parser.add_argument("--sizes", type=int, nargs="+", default=[420, 10_000, 100_000])
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--noise", type=float, default=0.02, help="jitter for synthetic corpus growth")
+    parser.add_argument("--no-encoder", action="store_true", help="jittered corpus vectors as queries")
+    parser.add_argument("--output", default="projection_eval.json")
+    args = parser.parse_args()
+
+    faiss.omp_set_num_threads(1)
+    rng = np.random.default_rng(0)
+    base = np.load('embeddings/layered_embeddings.npy').astype(np.float32)
+    with open('embeddings/layered_advice_metadata.json', 'r', encoding='utf-8') as f:
+        metadata = json.load(f)
+    queries, texts = query_vectors(args, base, metadata, rng)
+    domains = [detect_domains(t) for t in texts]
+    candidates = args.k * 10  # what semantic_search() re-ranks
+    print(f"📐 {base.shape[0]} advice vectors ({base.shape[1]} dims), {len(queries)} queries, recall@{args.k}\n")
+
+    rows = []
+    for size in args.sizes:
+        corpus, sources = jittered_corpus(base, size, args.noise, rng, return_rows=True)
+        entries = [metadata[r] for r in sources]
+        full = faiss.IndexFlatL2(corpus.shape[1])
+        full.add(corpus)
+        full_d, full_i = full.search(queries, candidates)
+        truth = full_i[:, :args.k]
+        want = [best_advice(d, i, entries, dom) for d, i, dom in zip(full_d, full_i, domains)]
+        full_ms = search_latency_ms(full, queries, args.k)
+        rows.append({
+            "size": size, "method": "full", "dim": corpus.shape[1], "recall": 1.0,
+            "rank": 1.0, "rank_raw": 1.0, "score_shift": 0.0,
+            "index_mb": corpus.nbytes / 2**20, "search_ms": full_ms, "fit_s": 0.0,
+        })
+
+        for method in args.methods:
+            for dim in args.dims:
+                start = time.perf_counter()
+                projection = fit_projection(corpus, dim, method)
+                fit_s = time.perf_counter() - start
+
+                projection.corpus_residuals = projection.residuals(corpus)
+
+                reduced = faiss.IndexFlatL2(dim)
+                reduced.add(projection.apply(corpus))
+                projected = projection.apply(queries)
+                red_d, red_i = reduced.search(projected, candidates)
+
+                raw_hits = hits = 0
+                shift = []
+                for q, (d, i, dom, (want_row, want_base)) in enumerate(zip(red_d, red_i, domains, want)):
+                    raw_hits += best_advice(d, i, entries, dom)[0] == want_row
+                    d = projection.full_distances(queries[q], d, i)
+                    order = np.argsort(d, kind="stable")
+                    row, base_score = best_advice(d[order], i[order], entries, dom)
+                    hits += row == want_row
+                    shift.append(base_score - want_base)
+
+                rows.append({
+                    "size": size, "method": method, "dim": dim,
+                    "recall": recall_at_k(red_i[:, :args.k], truth),
+                    "rank": hits / len(queries),
+                    "rank_raw": raw_hits / len(queries),
+                    "score_shift": float(np.mean(shift)),
+                    "index_mb": (reduced.ntotal * dim * 4 + projection.components.nbytes) / 2**20,
+                    "search_ms": search_latency_ms(reduced, projected, args.k),
+                    "fit_s": fit_s,
+                })
+
+        print(f"corpus {size:>8,}")
+        for r in rows:
+            if r["size"] == size:
+                print(f"   {r['method']:<9} {r['dim']:>4}d   recall {r['recall']:.3f}   "
+                      f"rank {r['rank']:.3f} (raw {r['rank_raw']:.3f}, shift {r['score_shift']:+.3f})   "
+                      f"{r['index_mb']:8.2f} MB   {r['search_ms']:7.3f} ms/query   fit {r['fit_s']:.2f}s")
+
+    with open(args.output, 'w', encoding='utf-8') as f:
+        json.dump(rows, f, indent=2)
+    print(f"\n💾 Saved to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,138 @@
+import os
+
+import numpy as np
+
+# Batched exact L2 search without FAISS, for the offline paths (batch_score.py)
+# that search thousands of queries at once.
+# The corpus is kept as one contiguous float16 or float32 matrix with its
+# squared norms. A block of queries is answered with one matrix multiply per
+# corpus block, using ||q - x||^2 = ||q||^2 + ||x||^2 - 2 q.x, and a partial
+# top-k (argpartition) that is merged across corpus blocks. The multiply
+# always runs in float32; float16 only halves what is kept resident.
+#
+# search() has the IndexFlatL2 interface: squared L2 distances and int64 ids,
+# nearest first, padded with -1 / float32 max when k > ntotal. The corpus, its
+# norms and the per-block scratch space all stay under memory_cap_mb.
+
+EXACT_SEARCH_MEMORY_MB = float(os.environ.get("NOTIA_EXACT_SEARCH_MEMORY_MB", "256"))
+EXACT_SEARCH_DTYPES = ("auto", "float32", "float16")
+MAX_QUERY_BLOCK = 1024
+MIN_SCRATCH_BYTES = 4 * 2**20
+
+_EMPTY_DISTANCE = np.finfo(np.float32).max  # what IndexFlatL2 returns for missing neighbours
+
+
+class MatrixIndex:
+    def __init__(self, vectors: np.ndarray, dtype: str = "auto", memory_cap_mb: float = EXACT_SEARCH_MEMORY_MB):
+        vectors = np.asarray(vectors)
+        if vectors.ndim != 2:
+            raise ValueError(f"expected a (n, dim) matrix, got shape {vectors.shape}")
+        if dtype not in EXACT_SEARCH_DTYPES:
+            raise ValueError(f"unknown dtype '{dtype}', use one of {EXACT_SEARCH_DTYPES}")
+
+        self.memory_cap = int(memory_cap_mb * 2**20)
+        n, self.d = vectors.shape
+        if dtype == "auto":
+            # full precision whenever it fits, leaving room for the scratch space
+            dtype = "float32" if n * (self.d + 1) * 4 + MIN_SCRATCH_BYTES <= self.memory_cap else "float16"
+        resident = n * self.d * np.dtype(dtype).itemsize + n * 4
+        if resident + MIN_SCRATCH_BYTES > self.memory_cap:
+            raise ValueError(
+                f"{n} x {self.d} {dtype} vectors need {resident / 2**20:.1f} MB plus "
+                f"{MIN_SCRATCH_BYTES / 2**20:g} MB of search scratch, "
+                f"over the {memory_cap_mb:g} MB exact-search cap"
+            )
+
+        # converted a block of rows at a time, so no full-size float32 copy
+        # exists next to the resident matrix while it is filled
+        convert = vectors.dtype != dtype or not vectors.flags.c_contiguous
+        self.vectors = np.empty((n, self.d), dtype=dtype) if convert else vectors
+        # norms of the stored values, so float16 distances are self-consistent
+        self.norms = np.empty(n, dtype=np.float32)
+        step = max(1, MIN_SCRATCH_BYTES // (4 * max(1, self.d)))
+        for r0 in range(0, n, step):
+            if convert:
+                self.vectors[r0:r0 + step] = vectors[r0:r0 + step]
+            block = self.vectors[r0:r0 + step].astype(np.float32, copy=False)
+            self.norms[r0:r0 + len(block)] = np.einsum("ij,ij->i", block, block)
+        self.scratch_bytes = self.memory_cap - resident
+
+    @classmethod
+    def from_faiss(cls, index, **kwargs) -> "MatrixIndex":
+        """Copy the vectors out of a flat FAISS index."""
+        return cls(index.reconstruct_n(0, index.ntotal), **kwargs)
+
+    @property
+    def ntotal(self) -> int:
+        return self.vectors.shape[0]
+
+    @property
+    def dtype(self) -> str:
+        return self.vectors.dtype.name
+
+    @property
+    def nbytes(self) -> int:
+        return self.vectors.nbytes + self.norms.nbytes
+
+    def _block_sizes(self, nq: int) -> tuple[int, int]:
+        """(queries, corpus rows) per block that keep the scratch arrays under the cap."""
+        q_block = max(1, min(nq, MAX_QUERY_BLOCK))
+        # per corpus row: a float32 distance and an int64 argpartition slot per
+        # query, plus the float32 copy of the row when the matrix is float16
+        row_bytes = 12 * q_block + (4 * self.d if self.vectors.dtype != np.float32 else 0)
+        c_block = max(1, self.scratch_bytes // row_bytes)
+        return q_block, int(min(c_block, self.ntotal))
+
+    def search(self, queries: np.ndarray, k: int) -> tuple[np.ndarray, np.ndarray]:
+        """(distances, ids), each (nq, k), like IndexFlatL2.search."""
+        queries = np.atleast_2d(np.asarray(queries, dtype=np.float32))
+        if queries.shape[1] != self.d:
+            raise ValueError(f"queries have {queries.shape[1]} dims, the index {self.d}")
+        nq = queries.shape[0]
+        distances = np.full((nq, k), _EMPTY_DISTANCE, dtype=np.float32)
+        ids = np.full((nq, k), -1, dtype=np.int64)
+        if not self.ntotal or not nq or k <= 0:
+            return distances, ids
+
+        q_block, c_block = self._block_sizes(nq)
+        kk = min(k, self.ntotal)
+        for q0 in range(0, nq, q_block):
+            d, i = self._search_block(queries[q0:q0 + q_block], kk, c_block)
+            distances[q0:q0 + len(d), :kk] = d
+            ids[q0:q0 + len(d), :kk] = i
+        return distances, ids
+
+    def _search_block(self, queries: np.ndarray, k: int, c_block: int) -> tuple[np.ndarray, np.ndarray]:
+        query_norms = np.einsum("ij,ij->i", queries, queries)[:, None]
+        best_d = best_i = None
+
+        for c0 in range(0, self.ntotal, c_block):
+            block = self.vectors[c0:c0 + c_block]
+            if block.dtype != np.float32:
+                block = block.astype(np.float32)
+            dist = queries @ block.T
+            dist *= -2.0
+            dist += query_norms
+            dist += self.norms[c0:c0 + len(block)]
+            np.maximum(dist, 0.0, out=dist)  # rounding can dip just below zero
+
+            top = k if k < dist.shape[1] else dist.shape[1]
+            if top < dist.shape[1]:
+                cols = np.argpartition(dist, top - 1, axis=1)[:, :top]
+            else:
+                cols = np.broadcast_to(np.arange(top), dist.shape)
+            cand_d = np.take_along_axis(dist, cols, axis=1)
+            cand_i = cols + c0
+
+            if best_d is not None:
+                cand_d = np.concatenate([best_d, cand_d], axis=1)
+                cand_i = np.concatenate([best_i, cand_i], axis=1)
+                if cand_d.shape[1] > k:
+                    keep = np.argpartition(cand_d, k - 1, axis=1)[:, :k]
+                    cand_d = np.take_along_axis(cand_d, keep, axis=1)
+                    cand_i = np.take_along_axis(cand_i, keep, axis=1)
+            best_d, best_i = cand_d, cand_i
+
+        # nearest first; equal distances by id, as IndexFlatL2 orders them
+        order = np.lexsort((best_i, best_d), axis=1)
+        return np.take_along_axis(best_d, order, axis=1), np.take_along_axis(best_i, order, axis=1)
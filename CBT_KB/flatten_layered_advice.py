@@ -1,7 +1,17 @@
+import argparse
 import json
 
+# Other programmes/locales: flatten their own source JSON, then build a
+# knowledge base from it (see knowledge_bases.py):
+#   python flatten_layered_advice.py --source advice_de.json --output processed_data/advice_de.json
+#   python create_embeddings.py --input processed_data/advice_de.json --output-dir knowledge_bases/de
+parser = argparse.ArgumentParser(description="Flatten layered advice into one record per layer")
+parser.add_argument("--source", default="therapeutic_advice.json")
+parser.add_argument("--output", default="processed_data/flattened_layered_advice.json")
+args = parser.parse_args()
+
 # Load your new layered advice
-with open('therapeutic_advice.json', 'r', encoding='utf-8') as f:
+with open(args.source, 'r', encoding='utf-8') as f:
     layered_advice = json.load(f)
 
 flattened_entries = []
@@ -88,7 +98,7 @@ for entry in layered_advice:
 print(f"✅ Flattened {len(layered_advice)} entries into {len(flattened_entries)} layer records")
 
 # Save flattened entries
-with open('processed_data/flattened_layered_advice.json', 'w', encoding='utf-8') as f:
+with open(args.output, 'w', encoding='utf-8') as f:
     json.dump(flattened_entries, f, indent=2, ensure_ascii=False)
 
-print("✅ Saved to processed_data/flattened_layered_advice.json")
+print(f"✅ Saved to {args.output}")
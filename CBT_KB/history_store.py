@@ -0,0 +1,280 @@
+import hashlib
+import os
+import sqlite3
+import threading
+from collections import OrderedDict
+from datetime import datetime, timezone
+
+import numpy as np
+
+# Per-user journal history for "similar past reflections".
+# Entry metadata lives in SQLite (WAL); each user's MiniLM embeddings and
+# emotion vectors are appended to their own float32 files, which are only
+# read the first time that user is searched and then kept in a bounded LRU.
+#
+# Several uvicorn workers can share one store: an append holds a SQLite write
+# transaction (BEGIN IMMEDIATE, a cross-process lock) while it picks the row
+# from the table and writes the files. Every add (append or in-place
+# overwrite) bumps the user's row in user_versions in the same transaction,
+# and cached vectors are checked against that version before use, so entries
+# another worker added or rewrote are read in.
+
+HISTORY_DIR = os.environ.get("NOTIA_HISTORY_DIR", "user_data/history")
+MAX_CACHED_USERS = int(os.environ.get("NOTIA_HISTORY_CACHED_USERS", "512"))
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS entries (
+    user_id    TEXT NOT NULL,
+    row        INTEGER NOT NULL,
+    entry_id   TEXT NOT NULL,
+    created_at TEXT NOT NULL,
+    issue      TEXT,
+    sub_issue  TEXT,
+    PRIMARY KEY (user_id, row)
+) WITHOUT ROWID;
+
+CREATE INDEX IF NOT EXISTS entries_by_entry_id ON entries (user_id, entry_id);
+
+CREATE TABLE IF NOT EXISTS user_versions (
+    user_id TEXT PRIMARY KEY,
+    version INTEGER NOT NULL
+) WITHOUT ROWID;
+"""
+
+
+class _UserVectors:
+    """In-memory view of one user's vector files."""
+
+    def __init__(self, embeddings: np.ndarray, emotions: np.ndarray, version: int):
+        self.embeddings = embeddings
+        self.emotions = emotions
+        self.version = version  # user_versions.version these arrays match
+
+    def __len__(self):
+        return len(self.embeddings)
+
+
+class HistoryStore:
+    """Local store of past entry vectors with per-user nearest-neighbour search."""
+
+    def __init__(
+        self,
+        embedding_dim: int,
+        emotion_dim: int,
+        root: str = HISTORY_DIR,
+        max_cached_users: int = MAX_CACHED_USERS,
+    ):
+        self.embedding_dim = embedding_dim
+        self.emotion_dim = emotion_dim
+        self.root = root
+        self.max_cached_users = max_cached_users
+        os.makedirs(os.path.join(root, "vectors"), exist_ok=True)
+
+        self._conn = sqlite3.connect(
+            os.path.join(root, "history.sqlite3"),
+            check_same_thread=False,
+            isolation_level=None,
+        )
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript(SCHEMA)
+
+        self._lock = threading.Lock()
+        self._cache: OrderedDict[str, _UserVectors] = OrderedDict()
+
+    # ---------- files ----------
+
+    def _paths(self, user_id: str) -> tuple[str, str]:
+        key = hashlib.sha1(user_id.encode("utf-8")).hexdigest()
+        # Two-level fan-out keeps directories small with thousands of users
+        shard = os.path.join(self.root, "vectors", key[:2])
+        return os.path.join(shard, f"{key}.emb.f32"), os.path.join(shard, f"{key}.emo.f32")
+
+    def _row_count(self, user_id: str) -> int:
+        (count,) = self._conn.execute(
+            "SELECT COUNT(*) FROM entries WHERE user_id = ?", (user_id,)
+        ).fetchone()
+        return count
+
+    def _version(self, user_id: str) -> int:
+        found = self._conn.execute(
+            "SELECT version FROM user_versions WHERE user_id = ?", (user_id,)
+        ).fetchone()
+        return found[0] if found else 0
+
+    def _load(self, user_id: str) -> _UserVectors:
+        """
+        Return the user's vectors, reading them from disk on first use or when
+        another process has added or overwritten entries since they were cached.
+        """
+        # read before the rows and files: a write landing in between leaves
+        # newer data under an older version, which only costs a re-read
+        version = self._version(user_id)
+        cached = self._cache.get(user_id)
+        if cached is not None and cached.version == version:
+            self._cache.move_to_end(user_id)
+            return cached
+
+        rows = self._row_count(user_id)
+
+        emb_path, emo_path = self._paths(user_id)
+        if rows and os.path.exists(emb_path):
+            embeddings = np.fromfile(emb_path, dtype=np.float32).reshape(-1, self.embedding_dim)
+            emotions = np.fromfile(emo_path, dtype=np.float32).reshape(-1, self.emotion_dim)
+            # A crash between the file append and the SQLite insert can leave
+            # trailing vectors without metadata; ignore them.
+            embeddings, emotions = embeddings[:rows], emotions[:rows]
+        else:
+            embeddings = np.empty((0, self.embedding_dim), dtype=np.float32)
+            emotions = np.empty((0, self.emotion_dim), dtype=np.float32)
+
+        vectors = _UserVectors(embeddings, emotions, version)
+        self._cache[user_id] = vectors
+        while len(self._cache) > self.max_cached_users:
+            self._cache.popitem(last=False)
+        return vectors
+
+    # ---------- public API ----------
+
+    def add(
+        self,
+        user_id: str,
+        entry_id: str,
+        embedding: np.ndarray,
+        emotion_vector: np.ndarray,
+        issue: str | None = None,
+        sub_issue: str | None = None,
+        created_at: datetime | None = None,
+    ):
+        """
+        Append one entry's vectors and metadata to the user's history.
+        Adding an entry_id that is already stored overwrites its row in place.
+        """
+        embedding = np.asarray(embedding, dtype=np.float32).reshape(1, self.embedding_dim)
+        embedding = embedding / max(float(np.linalg.norm(embedding)), 1e-12)
+        emotion_vector = np.asarray(emotion_vector, dtype=np.float32).reshape(1, self.emotion_dim)
+        created_at = created_at or datetime.now(timezone.utc)
+
+        emb_path, emo_path = self._paths(user_id)
+        os.makedirs(os.path.dirname(emb_path), exist_ok=True)
+        with self._lock:
+            # the write transaction also keeps other worker processes out
+            # until the files and the table agree again
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                version = self._version(user_id)
+                count = self._row_count(user_id)
+                existing = self._conn.execute(
+                    "SELECT MAX(row) FROM entries WHERE user_id = ? AND entry_id = ?", (user_id, entry_id)
+                ).fetchone()[0]
+                row = count if existing is None else existing
+
+                for path, array, dim in (
+                    (emb_path, embedding, self.embedding_dim),
+                    (emo_path, emotion_vector, self.emotion_dim),
+                ):
+                    if existing is None:
+                        # Rewind any orphaned tail so file offsets stay aligned with `row`
+                        with open(path, "ab") as f:
+                            f.truncate(row * dim * 4)
+                            f.write(array.tobytes())
+                    else:
+                        with open(path, "r+b") as f:
+                            f.seek(row * dim * 4)
+                            f.write(array.tobytes())
+
+                self._conn.execute(
+                    "INSERT OR REPLACE INTO entries VALUES (?, ?, ?, ?, ?, ?)",
+                    (user_id, row, entry_id, created_at.isoformat(), issue, sub_issue),
+                )
+                self._conn.execute(
+                    """
+                    INSERT INTO user_versions VALUES (?, 1)
+                    ON CONFLICT DO UPDATE SET version = version + 1
+                    """,
+                    (user_id,),
+                )
+                self._conn.execute("COMMIT")
+            except BaseException:
+                self._conn.execute("ROLLBACK")
+                raise
+
+            vectors = self._cache.get(user_id)
+            if vectors is not None and vectors.version == version and len(vectors) == count:
+                vectors.version = version + 1
+                if existing is None:
+                    vectors.embeddings = np.vstack([vectors.embeddings, embedding])
+                    vectors.emotions = np.vstack([vectors.emotions, emotion_vector])
+                else:
+                    # copy, as similar() may be scanning the current arrays
+                    vectors.embeddings = vectors.embeddings.copy()
+                    vectors.emotions = vectors.emotions.copy()
+                    vectors.embeddings[row] = embedding
+                    vectors.emotions[row] = emotion_vector
+            else:
+                self._cache.pop(user_id, None)  # stale; the next _load() re-reads it
+
+    def similar(
+        self,
+        user_id: str,
+        embedding: np.ndarray,
+        emotion_vector: np.ndarray | None = None,
+        top_k: int = 5,
+        emotion_weight: float = 0.2,
+        exclude_entry_id: str | None = None,
+    ) -> list[dict]:
+        """
+        Nearest past entries for a user by cosine similarity of the text
+        embedding, optionally blended with emotion-vector similarity.
+        """
+        if top_k < 1:
+            return []
+        query = np.asarray(embedding, dtype=np.float32).reshape(-1)
+        query = query / max(float(np.linalg.norm(query)), 1e-12)
+
+        with self._lock:
+            vectors = self._load(user_id)
+            embeddings, emotions = vectors.embeddings, vectors.emotions
+
+        if not len(embeddings):
+            return []
+
+        scores = embeddings @ query
+        if emotion_vector is not None and emotion_weight:
+            emo = np.asarray(emotion_vector, dtype=np.float32).reshape(-1)
+            norms = np.linalg.norm(emotions, axis=1) * max(float(np.linalg.norm(emo)), 1e-12)
+            emo_scores = (emotions @ emo) / np.maximum(norms, 1e-12)
+            scores = (1 - emotion_weight) * scores + emotion_weight * emo_scores
+
+        k = min(top_k + 1, len(scores))  # +1 leaves room to drop the excluded entry
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top])]
+
+        placeholders = ",".join("?" * len(top))
+        with self._lock:
+            rows = self._conn.execute(
+                f"""
+                SELECT row, entry_id, created_at, issue, sub_issue FROM entries
+                WHERE user_id = ? AND row IN ({placeholders})
+                """,
+                (user_id, *[int(i) for i in top]),
+            ).fetchall()
+        meta = {row: rest for row, *rest in rows}
+
+        results = []
+        for i in top:
+            if int(i) not in meta:
+                continue
+            entry_id, created_at, issue, sub_issue = meta[int(i)]
+            if entry_id == exclude_entry_id:
+                continue
+            results.append(
+                {
+                    "entry_id": entry_id,
+                    "created_at": created_at,
+                    "issue": issue,
+                    "sub_issue": sub_issue,
+                    "similarity": float(scores[i]),
+                }
+            )
+        return results[:top_k]
@@ -1,8 +1,8 @@
 import json
 import numpy as np
 import faiss
-from sentence_transformers import SentenceTransformer
-from transformers import pipeline
+from model_artifacts import load_emotion_pipeline, load_sentence_transformer
+from projection import load_projection
 
 print("🔧 Loading models...\n")
 
@@ -15,16 +15,13 @@ EMOTION_LABELS = [
     'relief', 'remorse', 'sadness', 'surprise', 'neutral'
 ]
 
-emotion_classifier = pipeline(
-    "text-classification",
-    model="../model",
-    top_k=None
-)
+emotion_classifier = load_emotion_pipeline()
 print("✅ Emotion classifier loaded")
 
 # 2. Load sentence embedding model + FAISS index
-embedding_model = SentenceTransformer('all-MiniLM-L6-v2')
+embedding_model = load_sentence_transformer()
 index = faiss.read_index('embeddings/layered_advice_faiss.index')
+projection = load_projection('embeddings')  # set for reduced-dimension builds
 
 with open('embeddings/layered_advice_metadata.json', 'r', encoding='utf-8') as f:
     metadata = json.load(f)
@@ -79,6 +76,8 @@ def search_with_emotions(journal_entry, layer_type=None, top_k=3):
     
     # Stage 2: Semantic search
     query_emb = embedding_model.encode([journal_entry])[0]
+    if projection is not None:
+        query_emb = projection.apply(query_emb)
     search_k = min(top_k * 10, len(metadata))
     distances, indices = index.search(np.array([query_emb]).astype('float32'), search_k)
     
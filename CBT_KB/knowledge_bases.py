@@ -0,0 +1,216 @@
+import json
+import os
+import threading
+from collections import OrderedDict
+
+import faiss
+import numpy as np
+
+from advice_payloads import AdvicePayloads, index_version
+from projection import PROJECTION_FILE, load_projection
+from related_advice import RELATED_FILE, RelatedAdvice, build_related_graph, load_related_graph
+from semantic_cache import SemanticCache
+from taxonomy_router import TaxonomyRouter
+
+# Named advice knowledge bases (programmes, locales) served side by side.
+# Each base is a directory holding the files create_embeddings.py writes:
+#
+#   knowledge_bases/<name>/layered_advice_faiss.index
+#   knowledge_bases/<name>/layered_advice_metadata.json
+#   knowledge_bases/<name>/layered_advice_projection.npz   (only with --project-dim)
+#   knowledge_bases/<name>/layered_advice_related.json     (related-advice graph)
+#
+# The original embeddings/ directory is served as DEFAULT_KB. A base is loaded
+# the first time a request asks for it, together with everything derived from
+# it (pre-serialized payloads, taxonomy router, related advice, semantic
+# cache). When the
+# loaded bases exceed the memory budget, the least recently used ones are
+# dropped from the registry; requests still holding one finish normally and
+# its memory is freed when they do. The default base is never evicted.
+# The embedding and emotion models are not part of a base and stay shared.
+
+DEFAULT_KB = "default"
+DEFAULT_KB_DIR = "embeddings"
+KB_ROOT = os.environ.get("NOTIA_KB_DIR", "knowledge_bases")
+KB_MEMORY_BUDGET_MB = float(os.environ.get("NOTIA_KB_MEMORY_BUDGET_MB", "512"))
+
+INDEX_FILE = "layered_advice_faiss.index"
+METADATA_FILE = "layered_advice_metadata.json"
+
+
+class UnknownKnowledgeBase(KeyError):
+    def __init__(self, name: str):
+        super().__init__(name)
+        self.name = name
+
+
+class KnowledgeBase:
+    """One advice index with its metadata and per-base lookup structures."""
+
+    def __init__(self, name: str, directory: str, embedding_dim: int):
+        self.name = name
+        index_path = os.path.join(directory, INDEX_FILE)
+        metadata_path = os.path.join(directory, METADATA_FILE)
+
+        self.index = faiss.read_index(index_path)
+        with open(metadata_path, 'r', encoding='utf-8') as f:
+            self.metadata = json.load(f)
+
+        # reduced-dimension bases map query embeddings into the index space
+        self.projection = load_projection(directory)
+        if self.projection is not None and self.projection.in_dim != embedding_dim:
+            raise ValueError(
+                f"knowledge base '{name}' projects from {self.projection.in_dim} dims, "
+                f"the shared encoder produces {embedding_dim}"
+            )
+        search_dim = self.projection.out_dim if self.projection is not None else embedding_dim
+        if self.index.d != search_dim:
+            raise ValueError(
+                f"knowledge base '{name}' has a {self.index.d}-dim index, expected {search_dim}"
+            )
+
+        version_files = [index_path, metadata_path]
+        if self.projection is not None:
+            version_files.append(os.path.join(directory, PROJECTION_FILE))
+        related_graph = load_related_graph(directory)
+        if related_graph is not None:
+            version_files.append(os.path.join(directory, RELATED_FILE))
+        self.version = index_version(*version_files)
+        self.payloads = AdvicePayloads(
+            self.metadata, version=self.version, knowledge_base=None if name == DEFAULT_KB else name
+        )
+        # IndexFlat stores raw vectors, so the router can reuse them
+        self.router = TaxonomyRouter(self.index.reconstruct_n(0, self.index.ntotal), self.metadata)
+        # older builds have no saved graph; the index vectors are enough to make one
+        self.related = RelatedAdvice(
+            related_graph if related_graph is not None else build_related_graph(self.router.vectors, self.metadata),
+            self.metadata,
+            self.payloads,
+            version=self.version,
+            source="disk" if related_graph is not None else "computed",
+        )
+        self.cache = SemanticCache(dim=embedding_dim)
+
+        metadata_bytes = os.path.getsize(metadata_path)
+        self.nbytes = (
+            self.index.ntotal * self.index.d * 4  # FAISS vectors
+            + self.router.vectors.nbytes
+            + (self.projection.components.nbytes if self.projection is not None else 0)
+            + (self.projection.corpus_residuals.nbytes
+               if self.projection is not None and self.projection.corpus_residuals is not None else 0)
+            + self.cache.max_entries * embedding_dim * 4  # cache keys
+            + sum(len(body) for body, _ in self.related.bodies.values())
+            + 2 * metadata_bytes  # parsed metadata + pre-serialized payloads, roughly
+        )
+
+    def search_vector(self, query_emb):
+        """Query embedding in the index's space (projected for reduced bases)."""
+        return self.projection.apply(query_emb) if self.projection is not None else query_emb
+
+    def full_distances(self, query_emb, distances, rows):
+        """
+        (distances, rows) for one query, nearest first. Reduced bases add back
+        what the projection dropped (projection.py) and re-rank on that.
+        """
+        distances, rows = np.asarray(distances), np.asarray(rows)
+        if self.projection is None:
+            return distances, rows
+        distances = self.projection.full_distances(query_emb, distances, rows)
+        order = np.argsort(distances, kind="stable")
+        return distances[order], rows[order]
+
+    def stats(self) -> dict:
+        return {
+            "layers": len(self.metadata),
+            "dim": self.index.d,
+            "index_version": self.version,
+            "memory_mb": round(self.nbytes / 2**20, 2),
+            "related_graph": self.related.source,
+            "advice_cache": self.cache.stats(),
+        }
+
+
+class KnowledgeBaseRegistry:
+    def __init__(self, embedding_dim: int, root: str = KB_ROOT, memory_budget_mb: float = KB_MEMORY_BUDGET_MB):
+        self.embedding_dim = embedding_dim
+        self.root = root
+        self.memory_budget = memory_budget_mb * 2**20
+
+        self._loaded: OrderedDict[str, KnowledgeBase] = OrderedDict()  # oldest use first
+        self._lock = threading.Lock()
+        self._load_locks: dict[str, threading.Lock] = {}
+        self.loads = 0
+        self.evictions = 0
+
+    def directory(self, name: str) -> str | None:
+        if name == DEFAULT_KB:
+            return DEFAULT_KB_DIR
+        # names map to a single directory level under the root, nothing else
+        if not name or os.path.basename(name) != name or name.startswith('.'):
+            return None
+        path = os.path.join(self.root, name)
+        if os.path.exists(os.path.join(path, INDEX_FILE)) and os.path.exists(os.path.join(path, METADATA_FILE)):
+            return path
+        return None
+
+    def available(self) -> list[str]:
+        names = [DEFAULT_KB]
+        if os.path.isdir(self.root):
+            names += sorted(n for n in os.listdir(self.root) if n != DEFAULT_KB and self.directory(n))
+        return names
+
+    def get(self, name: str | None = None) -> KnowledgeBase:
+        """The named base, loading it on first use; raises UnknownKnowledgeBase."""
+        name = name or DEFAULT_KB
+        with self._lock:
+            kb = self._loaded.get(name)
+            if kb is not None:
+                self._loaded.move_to_end(name)
+                return kb
+
+        # only names that exist on disk get a load lock, so ?kb=<anything>
+        # can't grow the lock table; a name keeps its lock for the life of the
+        # registry, so a failed load or an eviction never lets two loaders of
+        # the same name run at once
+        directory = self.directory(name)
+        if directory is None:
+            raise UnknownKnowledgeBase(name)
+        with self._lock:
+            load_lock = self._load_locks.setdefault(name, threading.Lock())
+
+        # one loader per name; other names keep loading/serving in parallel
+        with load_lock:
+            with self._lock:
+                kb = self._loaded.get(name)
+            if kb is None:
+                kb = KnowledgeBase(name, directory, self.embedding_dim)
+                with self._lock:
+                    self._loaded[name] = kb
+                    self.loads += 1
+                    self._evict(keep=name)
+
+        with self._lock:
+            if name in self._loaded:
+                self._loaded.move_to_end(name)
+        return kb
+
+    def _evict(self, keep: str):
+        """Drop least recently used bases until the budget fits (caller holds the lock)."""
+        total = sum(kb.nbytes for kb in self._loaded.values())
+        for name in list(self._loaded):
+            if total <= self.memory_budget:
+                break
+            if name in (keep, DEFAULT_KB):
+                continue
+            total -= self._loaded.pop(name).nbytes
+            self.evictions += 1
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "memory_budget_mb": self.memory_budget / 2**20,
+                "memory_mb": round(sum(kb.nbytes for kb in self._loaded.values()) / 2**20, 2),
+                "loads": self.loads,
+                "evictions": self.evictions,
+                "loaded": {name: kb.stats() for name, kb in self._loaded.items()},
+            }
@@ -0,0 +1,60 @@
+import numpy as np
+
+from advice_payloads import LAYER_TYPES
+from exact_search import MatrixIndex
+
+# Every advice layer type for one query, from one query encoding.
+# The flat advice index is split into one exact index per layer type
+# (exact_search.MatrixIndex), so asking for all five layers scans the same
+# number of vectors as one flat search instead of over-fetching and filtering.
+# Queries must already be in the index's space (KnowledgeBase.search_vector).
+# Layer types with no entries, and top_k < 1, give empty result lists.
+
+
+class LayerPartitions:
+    def __init__(self, vectors: np.ndarray, metadata: list[dict], layer_types=LAYER_TYPES, **index_kwargs):
+        """
+        vectors: index vectors, row i belongs to metadata[i]
+        (e.g. index.reconstruct_n(0, index.ntotal)).
+        """
+        vectors = np.asarray(vectors, dtype=np.float32)
+        self.metadata = metadata
+        self.partitions: dict[str, tuple[MatrixIndex | None, np.ndarray]] = {}
+        for layer in layer_types:
+            rows = np.array([i for i, m in enumerate(metadata) if m["layer_type"] == layer], dtype=np.int64)
+            part = MatrixIndex(vectors[rows], **index_kwargs) if len(rows) else None
+            self.partitions[layer] = (part, rows)
+
+    def sizes(self) -> dict[str, int]:
+        return {layer: len(rows) for layer, (_, rows) in self.partitions.items()}
+
+    def search(self, query_emb, layer_types=None, top_k: int = 1, threshold: float = 0.0) -> dict[str, list[dict]]:
+        """{layer_type: best `top_k` layers, nearest first} for one query embedding."""
+        query = np.asarray(query_emb, dtype=np.float32).reshape(1, -1)
+        found = {}
+        for layer in layer_types or self.partitions:
+            part, rows = self.partitions.get(layer, (None, None))
+            if part is None or top_k < 1:
+                found[layer] = []
+                continue
+
+            distances, indices = part.search(query, min(top_k, part.ntotal))
+            results = []
+            for dist, idx in zip(distances[0], indices[0]):
+                score = 1 / (1 + float(dist))
+                if idx < 0 or score < threshold:
+                    continue
+                row = int(rows[idx])
+                entry = self.metadata[row]
+                results.append({
+                    "score": score,
+                    "row": row,
+                    "layer": entry["layer_type"],
+                    "parent_id": entry.get("parent_id"),
+                    "issue": entry["issue"],
+                    "sub_issue": entry["sub_issue"],
+                    "emotions": entry.get("emotions", []),
+                    "text": entry["text"],
+                })
+            found[layer] = results
+        return found
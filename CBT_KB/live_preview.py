@@ -0,0 +1,130 @@
+import asyncio
+import logging
+import os
+import threading
+
+import request_log
+
+# Live emotion preview while the user types (WebSocket /ws/emotion-preview).
+# Clients send the full text on every keystroke. Each session keeps only the
+# latest text: it waits for a quiet period (debounce), then classifies that
+# text, so intermediate keystrokes never reach the model. A session runs at
+# most one classifier pass at a time; text that arrives meanwhile replaces
+# the pending input, and a result whose input was superseded is dropped
+# instead of sent. Closing the session cancels its loop; a pass already on
+# the classifier thread finishes, but its result is discarded. A classifier
+# failure is logged and answered with an error frame (no emotions, "error"
+# set); the session keeps running and retries on the next input.
+
+PREVIEW_DEBOUNCE_MS = float(os.environ.get("NOTIA_PREVIEW_DEBOUNCE_MS", "300"))
+PREVIEW_MIN_CHARS = int(os.environ.get("NOTIA_PREVIEW_MIN_CHARS", "12"))
+
+
+class PreviewStats:
+    """Counters shared by all preview sessions, for /health."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.counts = {
+            "active_sessions": 0,
+            "inputs": 0,
+            "coalesced": 0,
+            "classified": 0,
+            "superseded": 0,
+            "cancelled": 0,
+            "errors": 0,
+        }
+
+    def add(self, key: str, n: int = 1):
+        with self._lock:
+            self.counts[key] += n
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            return {"debounce_ms": PREVIEW_DEBOUNCE_MS, **self.counts}
+
+
+class PreviewSession:
+    """Latest-text-wins classify loop for one connected client."""
+
+    def __init__(self, classify, send, stats: PreviewStats, debounce_ms: float = PREVIEW_DEBOUNCE_MS):
+        self.classify = classify  # text -> detected emotions (blocking)
+        self.send = send  # async, one JSON-able message to the client
+        self.stats = stats
+        self.debounce = debounce_ms / 1000
+
+        self._seq = 0
+        self._last_taken = 0  # seq of the newest input the loop has picked up
+        self._latest: tuple[int, str, object] | None = None  # (seq, text, client seq)
+        self._changed = asyncio.Event()
+        self._task: asyncio.Task | None = None
+
+    def start(self):
+        self.stats.add("active_sessions")
+        self._task = asyncio.create_task(self._run())
+
+    def submit(self, text: str, client_seq=None):
+        """Replace the pending input; earlier unprocessed text is dropped."""
+        self._seq += 1
+        if self._latest is not None and self._latest[0] > self._last_taken:
+            self.stats.add("coalesced")
+        self._latest = (self._seq, text, client_seq)
+        self.stats.add("inputs")
+        self._changed.set()
+
+    async def _settled(self):
+        """Wait until no new input has arrived for the debounce window."""
+        await self._changed.wait()
+        while True:
+            self._changed.clear()
+            try:
+                await asyncio.wait_for(self._changed.wait(), self.debounce)
+            except asyncio.TimeoutError:
+                return
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        last_text = None
+        while True:
+            await self._settled()
+            seq, text, client_seq = self._latest
+            self._last_taken = seq
+            text = text.strip()
+            if text == last_text:
+                continue
+
+            error = None
+            if len(text) < PREVIEW_MIN_CHARS:
+                emotions = []
+            else:
+                try:
+                    emotions = await loop.run_in_executor(None, self.classify, text)
+                    self.stats.add("classified")
+                except Exception as e:
+                    self.stats.add("errors")
+                    request_log.log_event("preview_error", level=logging.ERROR, error=repr(e))
+                    emotions, error = [], "classification failed"
+
+            if self._latest[0] != seq:
+                # typed on while the classifier ran; the next pass covers it
+                self.stats.add("superseded")
+                continue
+
+            if error is not None:
+                # leave last_text alone so the same text is tried again
+                await self.send({"seq": client_seq, "detected_emotions": [], "error": error})
+                continue
+            last_text = text
+            await self.send({"seq": client_seq, "detected_emotions": emotions})
+
+    async def close(self):
+        self.stats.add("active_sessions", -1)
+        if self._task is None:
+            return
+        if not self._task.done():
+            self._task.cancel()
+            self.stats.add("cancelled")
+        try:
+            await self._task
+        except (asyncio.CancelledError, Exception):
+            pass  # client is gone; nothing left to report to
@@ -0,0 +1,322 @@
+import hashlib
+import json
+import os
+import warnings
+from types import SimpleNamespace
+
+import numpy as np
+import torch
+
+# Ready-to-load model artifacts for fast cold starts.
+# build_artifacts() (run via build_artifacts.py) writes, per model:
+#   - a local copy with safetensors weights (memory-mappable) and a pre-built
+#     fast tokenizer, so startup never converts tokenizers or asks the Hub
+#   - a TorchScript graph traced from that model, so startup skips Python
+#     model construction and weight init entirely
+# The load_* helpers use these when present and fall back to the original
+# sources otherwise, so nothing breaks on a machine without artifacts.
+# The manifest records the torch version and a fingerprint of ../model (file
+# names, sizes, mtimes). Artifacts built by another torch, and classifier
+# artifacts older than the weights they were built from, are ignored with a
+# warning until build_artifacts.py is run again; the traced encoder gets the
+# same torch check.
+# With NOTIA_EMOTION_MODEL=student, load_classifier() serves the distilled
+# student from distill_classifier.py instead of the teacher in ../model; a
+# missing student is an error rather than a silent fallback to the teacher.
+
+ARTIFACT_DIR = os.environ.get("NOTIA_ARTIFACT_DIR", "artifacts")
+USE_TRACED = os.environ.get("NOTIA_USE_TRACED", "1") == "1"
+
+CLASSIFIER_SOURCE = "../model"
+STUDENT_DIR = os.environ.get("NOTIA_STUDENT_DIR", "../model_student")
+USE_STUDENT = os.environ.get("NOTIA_EMOTION_MODEL", "teacher") == "student"
+THRESHOLDS_FILE = "optimal_thresholds.npy"
+ENCODER_SOURCE = "all-MiniLM-L6-v2"
+
+CLASSIFIER_DIR = os.path.join(ARTIFACT_DIR, "emotion_classifier")
+ENCODER_DIR = os.path.join(ARTIFACT_DIR, "minilm")
+CLASSIFIER_GRAPH = os.path.join(ARTIFACT_DIR, "emotion_classifier.pt")
+ENCODER_GRAPH = os.path.join(ARTIFACT_DIR, "minilm.pt")
+MANIFEST = os.path.join(ARTIFACT_DIR, "manifest.json")
+
+
+# ============================================================
+# BUILD
+# ============================================================
+
+class _EncoderGraph(torch.nn.Module):
+    """SentenceTransformer forward with tensor inputs/outputs, for tracing."""
+
+    def __init__(self, st_model):
+        super().__init__()
+        self.st_model = st_model
+
+    def forward(self, input_ids, attention_mask, token_type_ids):
+        features = {
+            "input_ids": input_ids,
+            "attention_mask": attention_mask,
+            "token_type_ids": token_type_ids,
+        }
+        return self.st_model(features)["sentence_embedding"]
+
+
+def _example_inputs(tokenizer, texts):
+    enc = tokenizer(texts, padding=True, truncation=True, return_tensors="pt")
+    return enc["input_ids"], enc["attention_mask"], enc.get("token_type_ids", torch.zeros_like(enc["input_ids"]))
+
+
+def _trace_is_shape_generic(traced, eager, tokenizer, uses_token_types):
+    """Traced graphs can bake in shapes; check another batch/length still matches eager."""
+    ids, mask, types = _example_inputs(tokenizer, [
+        "Short one.",
+        "A much longer journal entry that pads the batch to a different sequence length than the trace example did.",
+    ])
+    args = (ids, mask, types) if uses_token_types else (ids, mask)
+    with torch.inference_mode():
+        got = traced(*args)
+        want = eager(*args)
+    got = got[0] if isinstance(got, (tuple, list)) else got
+    want = want[0] if isinstance(want, (tuple, list)) else want
+    return torch.allclose(got, want, atol=1e-4)
+
+
+def source_fingerprint(directory: str) -> str | None:
+    """Cheap fingerprint of a model directory: every file's name, size and mtime."""
+    if not os.path.isdir(directory):
+        return None
+    entries = []
+    for root, _, files in os.walk(directory):
+        for name in files:
+            st = os.stat(os.path.join(root, name))
+            entries.append((os.path.relpath(os.path.join(root, name), directory), st.st_size, st.st_mtime_ns))
+    return hashlib.sha256(json.dumps(sorted(entries)).encode("utf-8")).hexdigest()[:16]
+
+
+def build_artifacts(trace: bool = True) -> dict:
+    """Write local model copies (+ traced graphs) to ARTIFACT_DIR."""
+    import transformers
+    from sentence_transformers import SentenceTransformer
+    from transformers import AutoModelForSequenceClassification, AutoTokenizer
+
+    os.makedirs(ARTIFACT_DIR, exist_ok=True)
+    manifest = {
+        "torch": torch.__version__,
+        "transformers": transformers.__version__,
+        "classifier_source": source_fingerprint(CLASSIFIER_SOURCE),
+        "traced": {},
+    }
+
+    # ---- emotion classifier ----
+    tokenizer = AutoTokenizer.from_pretrained(CLASSIFIER_SOURCE, use_fast=True)
+    model = AutoModelForSequenceClassification.from_pretrained(CLASSIFIER_SOURCE).eval()
+    model.save_pretrained(CLASSIFIER_DIR, safe_serialization=True)
+    tokenizer.save_pretrained(CLASSIFIER_DIR)
+    # tuple outputs for tracing only; the saved config keeps ModelOutput returns
+    model.config.torchscript = True
+
+    if trace:
+        ids, mask, _ = _example_inputs(tokenizer, ["I keep putting off work because I'm afraid I'll fail"])
+        with torch.inference_mode():
+            traced = torch.jit.trace(model, (ids, mask))
+        traced = torch.jit.freeze(traced)
+        if _trace_is_shape_generic(traced, model, tokenizer, uses_token_types=False):
+            torch.jit.save(traced, CLASSIFIER_GRAPH)
+            manifest["traced"]["emotion_classifier"] = True
+
+    # ---- sentence encoder ----
+    encoder = SentenceTransformer(ENCODER_SOURCE).eval()
+    encoder.save(ENCODER_DIR)
+    manifest["encoder"] = {
+        "max_seq_length": encoder.max_seq_length,
+        "dimension": encoder.get_sentence_embedding_dimension(),
+    }
+
+    if trace:
+        graph = _EncoderGraph(encoder).eval()
+        ids, mask, types = _example_inputs(encoder.tokenizer, ["I can't stop worrying about everything"])
+        with torch.inference_mode():
+            traced = torch.jit.trace(graph, (ids, mask, types), strict=False)
+        traced = torch.jit.freeze(traced)
+        if _trace_is_shape_generic(traced, graph, encoder.tokenizer, uses_token_types=True):
+            torch.jit.save(traced, ENCODER_GRAPH)
+            manifest["traced"]["minilm"] = True
+
+    with open(MANIFEST, 'w', encoding='utf-8') as f:
+        json.dump(manifest, f, indent=2)
+    return manifest
+
+
+# ============================================================
+# LOAD
+# ============================================================
+
+def _manifest() -> dict:
+    if not os.path.exists(MANIFEST):
+        return {}
+    with open(MANIFEST, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+
+def _torch_mismatch(manifest: dict) -> str | None:
+    if manifest.get("torch") != torch.__version__:
+        return f"built with torch {manifest.get('torch')}, running {torch.__version__}"
+    return None
+
+
+def stale_classifier_artifacts() -> str | None:
+    """Why the classifier artifacts can't be trusted any more, or None if they can."""
+    manifest = _manifest()
+    if not manifest or not os.path.isdir(CLASSIFIER_DIR):
+        return None  # nothing built, nothing stale
+    mismatch = _torch_mismatch(manifest)
+    if mismatch is not None:
+        return mismatch
+    current = source_fingerprint(CLASSIFIER_SOURCE)
+    if current is not None and manifest.get("classifier_source") != current:
+        return f"{CLASSIFIER_SOURCE} changed since the artifacts were built"
+    return None
+
+
+def stale_encoder_artifacts() -> str | None:
+    """Why the traced encoder can't be trusted any more, or None if it can."""
+    manifest = _manifest()
+    if not manifest or not os.path.exists(ENCODER_GRAPH):
+        return None
+    # the local SentenceTransformer copy is plain weights; only the trace is torch-specific
+    return _torch_mismatch(manifest)
+
+
+def _classifier_artifacts_usable() -> bool:
+    reason = stale_classifier_artifacts()
+    if reason is not None:
+        warnings.warn(f"Ignoring {ARTIFACT_DIR}/ classifier artifacts: {reason}; run build_artifacts.py")
+    return reason is None
+
+
+class TracedClassifier:
+    """Traced classifier with the bits of the HF model API the pipeline code uses."""
+
+    def __init__(self, module, config):
+        self.module = module
+        self.config = config
+        self.device = torch.device("cpu")
+
+    def eval(self):
+        return self
+
+    def __call__(self, input_ids, attention_mask):
+        return SimpleNamespace(logits=self.module(input_ids, attention_mask)[0])
+
+
+class TracedEncoder:
+    """Traced MiniLM with the bits of the SentenceTransformer API the pipeline code uses."""
+
+    def __init__(self, module, tokenizer, max_seq_length, dimension):
+        self.module = module
+        self.tokenizer = tokenizer
+        self.max_seq_length = max_seq_length
+        self.dimension = dimension
+        self.device = torch.device("cpu")
+
+    def eval(self):
+        return self
+
+    def get_sentence_embedding_dimension(self):
+        return self.dimension
+
+    def __call__(self, features):
+        embedding = self.module(
+            features["input_ids"], features["attention_mask"], features["token_type_ids"]
+        )
+        return {"sentence_embedding": embedding}
+
+
+def load_classifier():
+    """(model, tokenizer) for the emotion classifier, fastest available form first."""
+    from transformers import AutoConfig, AutoModelForSequenceClassification, AutoTokenizer
+
+    if USE_STUDENT:
+        if not os.path.isdir(STUDENT_DIR):
+            raise FileNotFoundError(
+                f"NOTIA_EMOTION_MODEL=student but {STUDENT_DIR} does not exist; "
+                "run distill_classifier.py or unset NOTIA_EMOTION_MODEL"
+            )
+        model = AutoModelForSequenceClassification.from_pretrained(STUDENT_DIR).eval()
+        return model, AutoTokenizer.from_pretrained(STUDENT_DIR)
+
+    usable = _classifier_artifacts_usable()
+    traced = _manifest().get("traced", {})
+    if usable and USE_TRACED and traced.get("emotion_classifier") and os.path.exists(CLASSIFIER_GRAPH):
+        module = torch.jit.load(CLASSIFIER_GRAPH, map_location="cpu")
+        config = AutoConfig.from_pretrained(CLASSIFIER_DIR)
+        return TracedClassifier(module, config), AutoTokenizer.from_pretrained(CLASSIFIER_DIR)
+
+    source = CLASSIFIER_DIR if usable and os.path.isdir(CLASSIFIER_DIR) else CLASSIFIER_SOURCE
+    model = AutoModelForSequenceClassification.from_pretrained(source).eval()
+    return model, AutoTokenizer.from_pretrained(source)
+
+
+def load_classifier_thresholds() -> np.ndarray | None:
+    """Per-class decision thresholds of the served student, or None for the teacher."""
+    path = os.path.join(STUDENT_DIR, THRESHOLDS_FILE)
+    if USE_STUDENT and os.path.exists(path):
+        return np.load(path)
+    return None
+
+
+def classifier_max_length(model, tokenizer) -> int:
+    """Tokens the classifier sees per entry when serving (text_pipeline.py)."""
+    return min(tokenizer.model_max_length, model.config.max_position_embeddings)
+
+
+def calibrate_probs(probs: np.ndarray, thresholds: np.ndarray) -> np.ndarray:
+    """
+    Map student probabilities onto the teacher's scale: each class's calibrated
+    threshold lands on 0.5 (piecewise linear, 0 and 1 stay fixed), so callers
+    keep using the teacher's global thresholds.
+    """
+    t = np.clip(thresholds, 1e-6, 1 - 1e-6)
+    low = 0.5 * probs / t
+    high = 0.5 + 0.5 * (probs - t) / (1 - t)
+    return np.where(probs < t, low, high).astype(probs.dtype)
+
+
+def load_encoder():
+    """MiniLM encoder (SentenceTransformer-compatible), fastest available form first."""
+    from transformers import AutoTokenizer
+
+    manifest = _manifest()
+    stale = stale_encoder_artifacts()
+    if stale is not None:
+        warnings.warn(f"Ignoring {ENCODER_GRAPH}: {stale}; run build_artifacts.py")
+    if (
+        stale is None
+        and USE_TRACED
+        and manifest.get("traced", {}).get("minilm")
+        and os.path.exists(ENCODER_GRAPH)
+    ):
+        module = torch.jit.load(ENCODER_GRAPH, map_location="cpu")
+        return TracedEncoder(
+            module,
+            AutoTokenizer.from_pretrained(ENCODER_DIR),
+            manifest["encoder"]["max_seq_length"],
+            manifest["encoder"]["dimension"],
+        )
+
+    return load_sentence_transformer()
+
+
+def load_sentence_transformer():
+    """Full SentenceTransformer (with .encode), from the local copy when built."""
+    from sentence_transformers import SentenceTransformer
+
+    return SentenceTransformer(ENCODER_DIR if os.path.isdir(ENCODER_DIR) else ENCODER_SOURCE)
+
+
+def load_emotion_pipeline():
+    """transformers text-classification pipeline, from the local copy when built."""
+    from transformers import pipeline
+
+    usable = _classifier_artifacts_usable()
+    source = CLASSIFIER_DIR if usable and os.path.isdir(CLASSIFIER_DIR) else CLASSIFIER_SOURCE
+    return pipeline("text-classification", model=source, top_k=None)
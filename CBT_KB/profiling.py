@@ -0,0 +1,167 @@
+import hmac
+import os
+import random
+import sys
+import threading
+import time
+import uuid
+from collections import Counter
+from contextlib import contextmanager, nullcontext
+from contextvars import ContextVar
+
+# Opt-in sampling profiler for single API requests.
+# A request is profiled when it carries the admin header
+#   X-Notia-Profile: <NOTIA_PROFILE_TOKEN>
+# or when it falls into the NOTIA_PROFILE_SAMPLE_RATE fraction of traffic.
+# While it runs, a background thread snapshots the stacks of the handler
+# thread (and of any pipeline stage working for it) every few milliseconds.
+# The samples are written in "folded stacks" format, which flamegraph.pl,
+# inferno and speedscope read directly.
+# With no token and a zero sample rate the hook is a nullcontext.
+# Only the newest NOTIA_PROFILE_KEEP profiles are kept on disk.
+
+PROFILE_DIR = os.environ.get("NOTIA_PROFILE_DIR", "profiles")
+PROFILE_TOKEN = os.environ.get("NOTIA_PROFILE_TOKEN", "")
+PROFILE_SAMPLE_RATE = float(os.environ.get("NOTIA_PROFILE_SAMPLE_RATE", "0"))
+PROFILE_INTERVAL_MS = float(os.environ.get("NOTIA_PROFILE_INTERVAL_MS", "2"))
+PROFILE_KEEP = int(os.environ.get("NOTIA_PROFILE_KEEP", "200"))
+PROFILE_HEADER = "x-notia-profile"
+
+_active_sampler: ContextVar["StackSampler | None"] = ContextVar("notia_profiler", default=None)
+
+
+def _frame_label(frame) -> str:
+    code = frame.f_code
+    return f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})"
+
+
+class StackSampler:
+    """Periodically records the Python stacks of a set of watched threads."""
+
+    def __init__(self, interval_ms: float = PROFILE_INTERVAL_MS):
+        self.interval = interval_ms / 1000
+        self.samples: Counter[str] = Counter()
+        self._threads: dict[int, str] = {}
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="notia-profiler", daemon=True)
+
+    def watch(self, thread_id: int, label: str):
+        with self._lock:
+            self._threads[thread_id] = label
+
+    def unwatch(self, thread_id: int):
+        with self._lock:
+            self._threads.pop(thread_id, None)
+
+    @contextmanager
+    def watching_current_thread(self):
+        thread = threading.current_thread()
+        self.watch(thread.ident, thread.name)
+        try:
+            yield
+        finally:
+            self.unwatch(thread.ident)
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            with self._lock:
+                watched = dict(self._threads)
+            frames = sys._current_frames()
+            for thread_id, label in watched.items():
+                frame = frames.get(thread_id)
+                stack = []
+                while frame is not None:
+                    stack.append(_frame_label(frame))
+                    frame = frame.f_back
+                if stack:
+                    stack.append(label)
+                    self.samples[";".join(reversed(stack))] += 1
+
+    def start(self):
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+
+    def write_folded(self, path: str):
+        with open(path, "w", encoding="utf-8") as f:
+            for stack, count in self.samples.most_common():
+                f.write(f"{stack} {count}\n")
+
+
+def traced(fn):
+    """
+    Wrap `fn` so the thread that eventually runs it is sampled too, if the
+    caller is being profiled. Otherwise returns `fn` unchanged.
+    """
+    sampler = _active_sampler.get()
+    if sampler is None:
+        return fn
+
+    def run(*args, **kwargs):
+        with sampler.watching_current_thread():
+            return fn(*args, **kwargs)
+
+    return run
+
+
+class RequestProfiler:
+    def __init__(
+        self,
+        token: str = PROFILE_TOKEN,
+        sample_rate: float = PROFILE_SAMPLE_RATE,
+        out_dir: str = PROFILE_DIR,
+        keep: int = PROFILE_KEEP,
+    ):
+        self.token = token
+        self.sample_rate = sample_rate
+        self.out_dir = out_dir
+        self.keep = keep
+        self.enabled = bool(token) or sample_rate > 0
+        self.profiles_written = 0
+        self._lock = threading.Lock()
+
+    def selected(self, headers) -> bool:
+        if not self.enabled:
+            return False
+        supplied = headers.get(PROFILE_HEADER)
+        # compared as bytes: compare_digest raises on non-ASCII str
+        if supplied and self.token and hmac.compare_digest(supplied.encode("utf-8"), self.token.encode("utf-8")):
+            return True
+        return self.sample_rate > 0 and random.random() < self.sample_rate
+
+    def maybe_profile(self, headers, name: str):
+        """Context manager yielding the profile id, or None when not profiling."""
+        if not self.selected(headers):
+            return nullcontext(None)
+        return self._profile(name)
+
+    @contextmanager
+    def _profile(self, name: str):
+        profile_id = f"{time.strftime('%Y%m%d-%H%M%S')}-{name}-{uuid.uuid4().hex[:8]}"
+        sampler = StackSampler()
+        token = _active_sampler.set(sampler)
+        sampler.start()
+        try:
+            with sampler.watching_current_thread():
+                yield profile_id
+        finally:
+            sampler.stop()
+            _active_sampler.reset(token)
+            os.makedirs(self.out_dir, exist_ok=True)
+            sampler.write_folded(os.path.join(self.out_dir, f"{profile_id}.folded"))
+            with self._lock:
+                self.profiles_written += 1
+                self._rotate()
+
+    def _rotate(self):
+        """Delete the oldest profiles beyond `keep` (caller holds the lock)."""
+        # names start with a timestamp, so name order is age order
+        profiles = sorted(f for f in os.listdir(self.out_dir) if f.endswith(".folded"))
+        for name in profiles[:max(0, len(profiles) - self.keep)]:
+            try:
+                os.remove(os.path.join(self.out_dir, name))
+            except FileNotFoundError:
+                pass  # another worker got there first
@@ -0,0 +1,133 @@
+import os
+
+import numpy as np
+
+# Optional dimension reduction for the advice index.
+# create_embeddings.py --project-dim N fits a linear map from MiniLM's 384
+# dims down to N at build time and stores it next to the index; the FAISS
+# index, taxonomy router and per-query search then work in N dims, and
+# knowledge_bases.py applies the same map to every query embedding.
+#
+#   pca       principal components of the advice vectors (centred)
+#   truncate  first N coordinates; only sensible for Matryoshka-trained
+#             encoders, kept as a baseline for eval_projection.py
+#
+# Both maps are orthonormal, so the projected distance is exactly the part of
+# the full L2 distance that lies in the kept subspace, but it misses the rest:
+# distances shrink, 1/(1+dist) scores rise against score_candidate()'s fixed
+# bonuses (+0.05 per emotion, +0.4 / -0.3 per domain) and rankings change.
+# full_distances() therefore adds the dropped energy back,
+#
+#   ||q - x||^2  ~  ||P(q - x)||^2 + ||r_q||^2 + ||r_x||^2
+#
+# where r is the residual a vector loses to the projection. The residual
+# cross term (-2 r_q.r_x) is unknown and left out, so this slightly
+# overestimates distances between vectors whose residuals point the same way.
+# The per-row ||r_x||^2 are saved with the map (create_embeddings.py) or
+# recomputed from layered_embeddings.npy for older builds; callers re-rank
+# their candidates on the corrected distances.
+
+PROJECTION_FILE = "layered_advice_projection.npz"
+PROJECTION_METHODS = ("pca", "truncate")
+FULL_EMBEDDINGS_FILE = "layered_embeddings.npy"
+RESIDUAL_BLOCK = 65_536
+
+
+class EmbeddingProjection:
+    def __init__(
+        self, mean: np.ndarray, components: np.ndarray, method: str = "pca", corpus_residuals=None
+    ):
+        self.mean = np.asarray(mean, dtype=np.float32)
+        self.components = np.ascontiguousarray(components, dtype=np.float32)  # (out_dim, in_dim)
+        self.method = method
+        # ||r_x||^2 per index row, None when unknown
+        self.corpus_residuals = None if corpus_residuals is None else np.asarray(corpus_residuals, dtype=np.float32)
+
+    @property
+    def in_dim(self) -> int:
+        return self.components.shape[1]
+
+    @property
+    def out_dim(self) -> int:
+        return self.components.shape[0]
+
+    def apply(self, vectors: np.ndarray) -> np.ndarray:
+        """Project one vector or a (n, in_dim) batch."""
+        vectors = np.asarray(vectors, dtype=np.float32)
+        return np.ascontiguousarray((vectors - self.mean) @ self.components.T, dtype=np.float32)
+
+    def residuals(self, vectors: np.ndarray) -> np.ndarray:
+        """Squared norm each vector loses to the projection, computed in blocks."""
+        vectors = np.atleast_2d(vectors)
+        out = np.empty(len(vectors), dtype=np.float32)
+        for start in range(0, len(vectors), RESIDUAL_BLOCK):
+            block = np.asarray(vectors[start:start + RESIDUAL_BLOCK], dtype=np.float32)
+            centred = ((block - self.mean) ** 2).sum(axis=1)
+            kept = (self.apply(block) ** 2).sum(axis=1)
+            out[start:start + len(block)] = np.maximum(centred - kept, 0.0)
+        return out
+
+    def full_distances(self, query: np.ndarray, distances: np.ndarray, rows: np.ndarray) -> np.ndarray:
+        """
+        Estimated full-dimension squared L2 distances from one (unprojected)
+        query to index `rows`, given their projected `distances`.
+        """
+        corrected = np.asarray(distances, dtype=np.float32) + self.residuals(query)[0]
+        if self.corpus_residuals is not None:
+            rows = np.asarray(rows)
+            valid = rows >= 0  # FAISS pads missing neighbours with -1
+            corrected[valid] += self.corpus_residuals[rows[valid]]
+        return corrected
+
+    def explained_variance(self, vectors: np.ndarray) -> float:
+        """Share of the variance of `vectors` kept by the projection."""
+        centred = np.asarray(vectors, dtype=np.float32) - self.mean
+        total = float((centred ** 2).sum())
+        return float((self.apply(vectors) ** 2).sum()) / total if total else 1.0
+
+    def save(self, path: str):
+        arrays = {"mean": self.mean, "components": self.components, "method": self.method}
+        if self.corpus_residuals is not None:
+            arrays["corpus_residuals"] = self.corpus_residuals
+        np.savez(path, **arrays)
+
+    @classmethod
+    def load(cls, path: str) -> "EmbeddingProjection":
+        with np.load(path, allow_pickle=False) as data:
+            residuals = data["corpus_residuals"] if "corpus_residuals" in data.files else None
+            return cls(data["mean"], data["components"], str(data["method"]), residuals)
+
+
+def fit_projection(vectors: np.ndarray, dim: int, method: str = "pca", max_rows: int = 100_000) -> EmbeddingProjection:
+    """Fit a projection to `dim` dims on (a sample of) the corpus vectors."""
+    vectors = np.asarray(vectors, dtype=np.float32)
+    in_dim = vectors.shape[1]
+    if not 0 < dim < in_dim:
+        raise ValueError(f"projection dim must be between 1 and {in_dim - 1}, got {dim}")
+
+    if method == "truncate":
+        return EmbeddingProjection(np.zeros(in_dim, dtype=np.float32), np.eye(in_dim, dtype=np.float32)[:dim], method)
+    if method != "pca":
+        raise ValueError(f"unknown projection method '{method}', use one of {PROJECTION_METHODS}")
+
+    if len(vectors) > max_rows:
+        rows = np.random.default_rng(0).choice(len(vectors), max_rows, replace=False)
+        vectors = vectors[rows]
+    mean = vectors.mean(axis=0)
+    # principal axes = right singular vectors of the centred data
+    _, _, vt = np.linalg.svd(vectors - mean, full_matrices=False)
+    if vt.shape[0] < dim:
+        raise ValueError(f"need at least {dim} vectors to fit a {dim}-dim PCA, got {vt.shape[0]}")
+    return EmbeddingProjection(mean, vt[:dim], method)
+
+
+def load_projection(directory: str) -> EmbeddingProjection | None:
+    path = os.path.join(directory, PROJECTION_FILE)
+    if not os.path.exists(path):
+        return None
+    projection = EmbeddingProjection.load(path)
+    full_path = os.path.join(directory, FULL_EMBEDDINGS_FILE)
+    if projection.corpus_residuals is None and os.path.exists(full_path):
+        # built before residuals were saved; the full vectors are kept next to the index
+        projection.corpus_residuals = projection.residuals(np.load(full_path, mmap_mode="r"))
+    return projection
@@ -0,0 +1,144 @@
+import hashlib
+import json
+import os
+
+import numpy as np
+
+from advice_payloads import dumps, render_response
+
+# "Related advice" graph between advice entries (parent_ids).
+# create_embeddings.py builds it from the stored layer embeddings: each entry
+# is the normalized mean of its layer vectors, and every pair is scored as
+#
+#   cosine + RELATED_SAME_ISSUE * same issue + RELATED_SAME_SUB_ISSUE * same sub_issue
+#          + RELATED_EMOTION_WEIGHT * shared emotions (max RELATED_MAX_EMOTIONS)
+#
+# The k best neighbours per entry are saved next to the index, and
+# GET /advice/{parent_id}/related serves them as pre-encoded bodies: no
+# classifier, encoder or FAISS call. Bases built before the graph existed get
+# it computed from their index vectors when they are loaded.
+
+RELATED_FILE = "layered_advice_related.json"
+RELATED_K = 8
+RELATED_SAME_ISSUE = 0.05
+RELATED_SAME_SUB_ISSUE = 0.1
+RELATED_EMOTION_WEIGHT = 0.03  # per shared emotion
+RELATED_MAX_EMOTIONS = 3
+RELATED_BLOCK = 1024  # entries scored against all others at once
+
+
+def entry_features(vectors: np.ndarray, metadata: list[dict]):
+    """Per parent_id: normalized mean layer vector, issue, sub_issue, emotions."""
+    rows: dict[str, list[int]] = {}
+    for i, m in enumerate(metadata):
+        rows.setdefault(m["parent_id"], []).append(i)
+
+    parent_ids = list(rows)
+    centroids = np.stack([np.asarray(vectors[r], dtype=np.float32).mean(axis=0) for r in rows.values()])
+    centroids /= np.maximum(np.linalg.norm(centroids, axis=1, keepdims=True), 1e-12)
+
+    first = [metadata[r[0]] for r in rows.values()]
+    emotions = [sorted({e for i in r for e in (metadata[i].get("emotions") or [])}) for r in rows.values()]
+    return parent_ids, centroids, first, emotions
+
+
+def build_related_graph(vectors: np.ndarray, metadata: list[dict], k: int = RELATED_K) -> dict:
+    """parent_id -> [{"parent_id", "score", "shared_emotions"}], best first."""
+    parent_ids, centroids, first, emotions = entry_features(vectors, metadata)
+    n = len(parent_ids)
+    k = min(k, n - 1)
+    if k <= 0:
+        return {pid: [] for pid in parent_ids}
+
+    def codes(values):
+        lookup = {}
+        return np.array([lookup.setdefault(v, len(lookup)) for v in values])
+
+    issues = codes(m.get("issue") or "" for m in first)
+    sub_issues = codes((m.get("issue") or "", m.get("sub_issue") or "") for m in first)
+    labels = sorted({e for emos in emotions for e in emos})
+    label_pos = {label: j for j, label in enumerate(labels)}
+    multi_hot = np.zeros((n, max(len(labels), 1)), dtype=np.float32)
+    for i, emos in enumerate(emotions):
+        multi_hot[i, [label_pos[e] for e in emos]] = 1.0
+
+    graph = {}
+    for start in range(0, n, RELATED_BLOCK):
+        block = slice(start, min(start + RELATED_BLOCK, n))
+        scores = centroids[block] @ centroids.T
+        scores += RELATED_SAME_ISSUE * (issues[block, None] == issues[None, :])
+        scores += RELATED_SAME_SUB_ISSUE * (sub_issues[block, None] == sub_issues[None, :])
+        scores += RELATED_EMOTION_WEIGHT * np.minimum(multi_hot[block] @ multi_hot.T, RELATED_MAX_EMOTIONS)
+        rows = np.arange(block.start, block.stop)
+        scores[rows - start, rows] = -np.inf  # never related to itself
+
+        top = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+        for offset, cols in enumerate(top):
+            i = start + offset
+            cols = sorted(cols, key=lambda j: (-scores[offset, j], j))
+            graph[parent_ids[i]] = [
+                {
+                    "parent_id": parent_ids[j],
+                    "score": round(float(scores[offset, j]), 4),
+                    "shared_emotions": sorted(set(emotions[i]) & set(emotions[j])),
+                }
+                for j in cols
+            ]
+    return graph
+
+
+def save_related_graph(graph: dict, path: str):
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(graph, f, ensure_ascii=False)
+
+
+def load_related_graph(directory: str) -> dict | None:
+    path = os.path.join(directory, RELATED_FILE)
+    if not os.path.exists(path):
+        return None
+    with open(path, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+
+class RelatedAdvice:
+    """Pre-encoded /advice/{parent_id}/related bodies with strong ETags."""
+
+    def __init__(self, graph: dict, metadata: list[dict], payloads, version: str = "", source: str = "disk"):
+        # where the graph came from, shown in /health: "disk" (saved next to
+        # the index by the build) or "computed" (made from the index vectors
+        # at load time, for older builds without a saved graph)
+        self.source = source
+        first = {}
+        for m in metadata:
+            first.setdefault(m["parent_id"], m)
+
+        self.bodies: dict[str, tuple[bytes, str]] = {}
+        for pid, neighbours in graph.items():
+            related = []
+            for n in neighbours:
+                entry = first.get(n["parent_id"])
+                if entry is None:
+                    continue  # graph from another build of the metadata
+                related.append({
+                    "parent_id": n["parent_id"],
+                    "issue": entry["issue"],
+                    "sub_issue": entry["sub_issue"],
+                    "score": n["score"],
+                    "shared_emotions": n["shared_emotions"],
+                    "advice_layers": payloads.initial_payload(n["parent_id"]),
+                    "layer_urls": payloads.layer_urls(n["parent_id"]),
+                })
+            body = render_related(pid, related)
+            etag = f'"{version}-{hashlib.sha1(body).hexdigest()[:16]}"'
+            self.bodies[pid] = (body, etag)
+
+    def get(self, parent_id: str) -> tuple[bytes, str] | None:
+        """(JSON body, ETag) for one entry, or None if it doesn't exist."""
+        return self.bodies.get(parent_id)
+
+
+def render_related(parent_id: str, related: list[dict]) -> bytes:
+    """Encode the body; each item splices its pre-encoded advice_layers in."""
+    items = [render_response(r) for r in related]
+    head = dumps({"parent_id": parent_id})[:-1]
+    return head + b',"related":[' + b",".join(items) + b"]}"
@@ -0,0 +1,204 @@
+import atexit
+import copy
+import json
+import logging
+import os
+import queue
+import random
+import sys
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from contextvars import ContextVar
+from logging.handlers import QueueHandler, QueueListener
+
+# Structured, non-blocking logging for the API.
+# Log calls only put a record on a bounded in-memory queue; a background
+# listener thread formats it as one JSON object per line and writes it to
+# stdout (or NOTIA_LOG_FILE). When the sink can't keep up and the queue is
+# full, new records are dropped and counted instead of blocking the request.
+#
+# Each HTTP request gets an id (X-Request-Id, echoed back or generated) and a
+# field dict that handlers and pipeline stages add to: stage timings, service
+# mode, ... At the end of the request the fields are closed and one "request"
+# event is emitted with a copy of them; stages that finish later (a timed-out
+# stage thread) are dropped rather than written into a logged dict. Only
+# NOTIA_LOG_SAMPLE_RATE of normal requests are logged; errors and requests
+# slower than NOTIA_LOG_SLOW_MS always are.
+
+LOG_LEVEL = os.environ.get("NOTIA_LOG_LEVEL", "INFO").upper()
+LOG_FILE = os.environ.get("NOTIA_LOG_FILE", "")
+LOG_QUEUE_SIZE = int(os.environ.get("NOTIA_LOG_QUEUE_SIZE", "10000"))
+LOG_SAMPLE_RATE = float(os.environ.get("NOTIA_LOG_SAMPLE_RATE", "0.1"))
+LOG_SLOW_MS = float(os.environ.get("NOTIA_LOG_SLOW_MS", "800"))
+REQUEST_ID_HEADER = "x-request-id"
+
+logger = logging.getLogger("notia")
+
+_request_id: ContextVar[str | None] = ContextVar("notia_request_id", default=None)
+_request_fields: ContextVar["RequestFields | None"] = ContextVar("notia_request_fields", default=None)
+
+
+class JsonFormatter(logging.Formatter):
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "ts": round(record.created, 6),
+            "level": record.levelname.lower(),
+            "event": record.getMessage(),
+        }
+        if getattr(record, "request_id", None):
+            entry["request_id"] = record.request_id
+        entry.update(getattr(record, "fields", {}))
+        if record.exc_text:
+            entry["exc"] = record.exc_text
+        return json.dumps(entry, ensure_ascii=False, default=str)
+
+
+class DroppingQueueHandler(QueueHandler):
+    """QueueHandler that never blocks: a full queue drops the record and counts it."""
+
+    def __init__(self, log_queue: queue.Queue):
+        super().__init__(log_queue)
+        self.dropped = 0
+        self._lock = threading.Lock()
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        record = copy.copy(record)
+        # the listener thread has no request context, so capture it here
+        record.request_id = _request_id.get()
+        record.msg = record.getMessage()
+        record.args = None
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+    def enqueue(self, record: logging.LogRecord):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            with self._lock:
+                self.dropped += 1
+
+
+_handler: DroppingQueueHandler | None = None
+_listener: QueueListener | None = None
+
+
+def setup_logging() -> DroppingQueueHandler:
+    """Attach the queue handler and start the writer thread (once per process)."""
+    global _handler, _listener
+    if _handler is not None:
+        return _handler
+
+    if LOG_FILE:
+        sink = logging.FileHandler(LOG_FILE, encoding="utf-8")
+    else:
+        sink = logging.StreamHandler(sys.stdout)
+    sink.setFormatter(JsonFormatter())
+
+    log_queue = queue.Queue(maxsize=LOG_QUEUE_SIZE)
+    _handler = DroppingQueueHandler(log_queue)
+    _listener = QueueListener(log_queue, sink, respect_handler_level=False)
+    _listener.start()
+    atexit.register(_listener.stop)  # flush what is queued on shutdown
+
+    logger.addHandler(_handler)
+    logger.setLevel(LOG_LEVEL)
+    logger.propagate = False
+    return _handler
+
+
+def log_event(event: str, level: int = logging.INFO, **fields):
+    """One structured log line; keyword arguments become JSON fields."""
+    if logger.isEnabledFor(level):
+        logger.log(level, event, extra={"fields": fields})
+
+
+def stats() -> dict:
+    if _handler is None:
+        return {"enabled": False}
+    return {
+        "enabled": True,
+        "queued": _handler.queue.qsize(),
+        "queue_size": LOG_QUEUE_SIZE,
+        "dropped": _handler.dropped,
+        "sample_rate": LOG_SAMPLE_RATE,
+    }
+
+
+# ---------- per-request context ----------
+
+class RequestFields(dict):
+    """Field dict of one request; stage threads write to it until it is closed."""
+
+    def __init__(self):
+        super().__init__()
+        self.lock = threading.Lock()
+        self.closed = False
+
+    def record(self, **fields):
+        with self.lock:
+            if not self.closed:
+                self.update(fields)
+
+    def record_stage(self, stage: str, ms: float):
+        with self.lock:
+            if not self.closed:
+                self.setdefault("stages_ms", {})[stage] = ms
+
+    def close(self) -> dict:
+        """Stop accepting writes and return a copy that is safe to log."""
+        with self.lock:
+            self.closed = True
+            snapshot = dict(self)
+            if "stages_ms" in snapshot:
+                snapshot["stages_ms"] = dict(snapshot["stages_ms"])
+            return snapshot
+
+
+def annotate(**fields):
+    """Add fields to the current request's log event (no-op outside a request)."""
+    current = _request_fields.get()
+    if current is not None:
+        current.record(**fields)
+
+
+def timed(stage: str, fn):
+    """
+    Wrap `fn` so its run time is recorded as `stage` on the calling request,
+    even when it runs on another thread.
+    """
+    fields = _request_fields.get()
+    if fields is None:
+        return fn
+
+    def run(*args, **kwargs):
+        start = time.perf_counter()
+        try:
+            return fn(*args, **kwargs)
+        finally:
+            fields.record_stage(stage, round((time.perf_counter() - start) * 1000, 2))
+
+    return run
+
+
+@contextmanager
+def request_context(request_id: str | None = None):
+    """Yield (request id, RequestFields) for one request."""
+    request_id = request_id or uuid.uuid4().hex
+    fields = RequestFields()
+    id_token = _request_id.set(request_id)
+    fields_token = _request_fields.set(fields)
+    try:
+        yield request_id, fields
+    finally:
+        _request_fields.reset(fields_token)
+        _request_id.reset(id_token)
+
+
+def should_log(status_code: int, duration_ms: float) -> bool:
+    if status_code >= 500 or duration_ms >= LOG_SLOW_MS:
+        return True
+    return LOG_SAMPLE_RATE > 0 and random.random() < LOG_SAMPLE_RATE
@@ -0,0 +1,75 @@
+import json
+import os
+import platform
+import sys
+import sysconfig
+
+# Host-specific runtime settings written by autotune.py.
+# api.py applies the profile before loading any model; without a profile
+# file the library defaults are left alone.
+#
+# handler_threads sizes the thread pool FastAPI runs sync handlers on. On a
+# free-threaded build (python3.14t) those threads run Python code in
+# parallel, so it is worth raising; on a GIL build only model/FAISS calls
+# (which release the GIL) overlap. Free-threaded support has only been
+# measured on GIL builds so far: until bench_free_threading.py has been run
+# under python3.13t/3.14t with gil_enabled false, treat it as untested.
+
+RUNTIME_PROFILE_PATH = os.environ.get("NOTIA_RUNTIME_PROFILE", "runtime_profile.json")
+
+DEFAULT_PROFILE = {
+    "torch_threads": None,
+    "faiss_threads": None,
+    "uvicorn_workers": 1,
+    "classifier_batch_size": 32,
+    "handler_threads": None,  # None = anyio's default (40)
+}
+
+
+def load_runtime_profile(path: str = RUNTIME_PROFILE_PATH) -> dict:
+    profile = dict(DEFAULT_PROFILE)
+    if os.path.exists(path):
+        with open(path, 'r', encoding='utf-8') as f:
+            profile.update(json.load(f))
+    return profile
+
+
+def interpreter_info() -> dict:
+    """Whether this interpreter is a free-threaded build and the GIL is really off."""
+    free_threaded = bool(sysconfig.get_config_var("Py_GIL_DISABLED"))
+    # an extension without free-threading support re-enables the GIL on import
+    gil_enabled = sys._is_gil_enabled() if hasattr(sys, "_is_gil_enabled") else True
+    return {
+        "python": platform.python_version(),
+        "free_threaded_build": free_threaded,
+        "gil_enabled": gil_enabled,
+    }
+
+
+def gil_warning(info: dict) -> str | None:
+    """Why a run on this interpreter says nothing about free-threading, if it doesn't."""
+    if not info["gil_enabled"]:
+        return None
+    if info["free_threaded_build"]:
+        return "free-threaded build, but an extension re-enabled the GIL (PYTHON_GIL=0 forces it off)"
+    return "GIL build: threads only overlap in code that releases the GIL; free-threading not tested"
+
+
+def apply_handler_threads(profile: dict):
+    """Resize the threadpool sync FastAPI handlers run on (call from a startup hook)."""
+    if profile.get("handler_threads"):
+        from anyio import to_thread
+
+        to_thread.current_default_thread_limiter().total_tokens = profile["handler_threads"]
+
+
+def apply_runtime_profile(profile: dict):
+    """Set torch intra-op and FAISS OpenMP thread counts from the profile."""
+    if profile.get("torch_threads"):
+        import torch
+
+        torch.set_num_threads(profile["torch_threads"])
+    if profile.get("faiss_threads"):
+        import faiss
+
+        faiss.omp_set_num_threads(profile["faiss_threads"])
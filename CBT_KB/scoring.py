@@ -0,0 +1,171 @@
+from typing import Any, Dict, List, Set
+
+# Retrieval signals shared by the API and the offline tools: emotion labels,
+# keyword domains, the issue/sub_issue -> domain taxonomy and the re-scorer.
+
+# GoEmotions label names, in the classifier's LABEL_<idx> order
+EMOTION_LABELS = [
+    'admiration', 'amusement', 'anger', 'annoyance', 'approval', 'caring',
+    'confusion', 'curiosity', 'desire', 'disappointment', 'disapproval',
+    'disgust', 'embarrassment', 'excitement', 'fear', 'gratitude', 'grief',
+    'joy', 'love', 'nervousness', 'optimism', 'pride', 'realization',
+    'relief', 'remorse', 'sadness', 'surprise', 'neutral'
+]
+
+
+def emotions_from_scores(scores, threshold: float = 0.5) -> List[Dict[str, Any]]:
+    """
+    {emotion, confidence} for every label scoring above `threshold`, best first.
+    `scores` are per-label probabilities in EMOTION_LABELS order (calibrated
+    already when a student model is served).
+    """
+    detected = [
+        {'emotion': EMOTION_LABELS[idx], 'confidence': float(score)}
+        for idx, score in enumerate(scores)
+        if float(score) > threshold
+    ]
+    detected.sort(key=lambda x: x['confidence'], reverse=True)
+    return detected
+
+#domain matching for better retrieval
+DOMAIN_KEYWORDS = {
+    "academic": {
+        "exam", "test", "assignment", "grade", "grades", "school", "university",
+        "class", "lecture", "midterm", "final", "study", "studying", "homework"
+    },
+    "relationships": {
+        "boyfriend", "girlfriend", "partner", "relationship", "friend", "friends",
+        "family", "mom", "dad", "sister", "brother", "husband", "wife", "cheated",
+        "cheat", "affair", "broke up", "breakup"
+    },
+    "work": {
+        "job", "work", "manager", "boss", "deadline", "office", "coworker",
+        "colleague", "promotion", "fired"
+    },
+    "gratitude_positive": {
+        "grateful", "gratitude", "thankful", "appreciate", "blessed",
+        "happy for", "proud of", "excited about"
+    },
+}
+
+def detect_domains(text: str) -> set[str]:
+    text_lower = text.lower()
+    domains: set[str] = set()
+    for domain, keywords in DOMAIN_KEYWORDS.items():
+        if any(k in text_lower for k in keywords):
+            domains.add(domain)
+    return domains
+
+#mapping issues to domains for more contextual retrieval
+# ---- existing: DOMAIN_KEYWORDS + detect_domains here ----
+
+ISSUE_TO_DOMAIN = {
+    "emotional_regulation": "emotional_regulation",
+    "emotional_validation": "emotional_validation",
+    "worthlessness": "worth/self_worth",
+    "self_doubt": "self_doubt",
+    "all_or_nothing_thinking": "all_or_nothing",
+    "anxiety": "anxiety",
+    "shame": "shame",
+    "self_sabotage": "self_sabotage",
+    "unhealthy_coping_mechanisms": "coping",
+    # extend later if you add issues like gratitude / savoring
+}
+
+SUB_ISSUE_TO_DOMAIN = {
+    # emotional_regulation
+    "acceptance_vs_suppression": "emotional_regulation",
+    "cognitive_defusion": "emotional_regulation",
+    "values_driven_action": "emotional_regulation",
+    "self_as_context": "emotional_regulation",
+    "uncomfortable_vs_wrong": "emotional_regulation",
+    "emotional_intensity_overwhelm": "emotional_regulation",
+    "difficulty_sitting_with_discomfort": "emotional_regulation",
+    "reactive_emotional_responses": "emotional_regulation",
+    "emotional_numbness_shutdown": "emotional_regulation",
+    "confusion_about_what_you_feel": "emotional_regulation",
+
+    # worthlessness
+    "intrinsic_value_recognition": "worth/self_worth",
+    "challenging_negative_self_talk": "worth/self_worth",
+    "worthlessness_driven_self_sabotage": "worth/self_worth",
+
+    # anxiety
+    "fear_vs_intuition": "anxiety",
+    "worry_as_avoidance": "anxiety",
+    "physical_symptoms_management": "anxiety",
+    "cognitive_distortions_in_anxiety": "anxiety",
+    "resistance_during_positive_change": "anxiety",
+
+    # all_or_nothing_thinking
+    "perfectionism_trap": "all_or_nothing",
+    "discounting_partial_success": "all_or_nothing",
+    "fear_of_starting": "all_or_nothing",
+    "relationship_extremes": "relationships",
+    "goal_abandonment_after_setbacks": "all_or_nothing",
+
+    # shame
+    "shame_vs_guilt_distinction": "shame",
+    "childhood_origins_of_shame": "shame",
+    "shame_spirals_and_rumination": "shame",
+    "self_compassion_as_antidote": "shame",
+    "shame_and_vulnerability": "shame",
+
+    # self_doubt
+    "confidence_through_action": "self_doubt",
+    "challenging_inner_critic": "self_doubt",
+    "understanding_origins": "self_doubt",
+    "building_evidence_of_capability": "self_doubt",
+    "embracing_imperfection": "self_doubt",
+
+    # self_sabotage
+    "upper_limit_problem": "self_sabotage",
+    "procrastination_as_protection": "self_sabotage",
+    "fear_of_outgrowing_old_identity": "self_sabotage",
+    "fear_of_visibility_and_responsibility": "self_sabotage",
+    "fear_of_disappointing_others": "self_sabotage",
+
+    # unhealthy_coping_mechanisms
+    "numbing_and_avoidance": "coping",
+    "self_destructive_patterns": "coping",
+    "overworking_and_productivity_addiction": "coping",
+    "people_pleasing_and_self_abandonment": "coping",
+    "emotional_eating_or_restriction": "eating_body",
+
+    # emotional_validation
+    "self_invalidation": "emotional_validation",
+    "minimizing_your_pain": "emotional_validation",
+    "fear_of_being_too_much": "emotional_validation",
+    "needing_permission_to_feel": "emotional_validation",
+}
+
+def score_candidate(
+    entry_dict: Dict[str, Any],
+    base_score: float,
+    emotion_labels: List[str],
+    domains: Set[str],
+) -> float:
+    """Adjust FAISS base score using emotion overlap + domain match."""
+    score = base_score
+
+    # Emotion overlap
+    entry_emotions = set(entry_dict.get("emotions") or [])
+    overlap = entry_emotions.intersection(set(emotion_labels))
+    score += 0.05 * len(overlap)
+
+    # Domain from issue/sub_issue (ensure strings)
+    issue = entry_dict.get("issue") or ""
+    sub_issue = entry_dict.get("sub_issue") or ""
+
+    advice_domain = SUB_ISSUE_TO_DOMAIN.get(sub_issue) or ISSUE_TO_DOMAIN.get(issue)
+
+    # Domain match bonus
+    if advice_domain and advice_domain in domains:
+        score += 0.4
+
+    # Positive context: avoid pathologizing gratitude
+    if "gratitude_positive" in domains:
+        if advice_domain in {"shame", "self_sabotage", "self_doubt", "worth/self_worth"}:
+            score -= 0.3
+
+    return float(score)
@@ -0,0 +1,129 @@
+import os
+import threading
+import time
+
+import numpy as np
+
+# Near-duplicate cache keyed on the query embedding.
+# Paraphrased entries ("I can't stop worrying about everything" vs
+# "... everything lately") land on the same advice, so a lookup within a small
+# cosine radius of an earlier query reuses its match and assembled layers
+# instead of searching FAISS and rebuilding the layer dict again. Callers
+# store which advice row matched, not its score, and re-score that row for
+# the new query. Expired slots are skipped during the scan, so a live slot
+# within the radius still hits when the closest one has expired.
+
+CACHE_RADIUS = float(os.environ.get("NOTIA_ADVICE_CACHE_RADIUS", "0.05"))
+CACHE_SIZE = int(os.environ.get("NOTIA_ADVICE_CACHE_SIZE", "2048"))
+CACHE_TTL_SECONDS = float(os.environ.get("NOTIA_ADVICE_CACHE_TTL", "86400"))
+
+
+class SemanticCache:
+    """
+    Fixed-size ring buffer of (normalized embedding, payload) pairs.
+    A lookup is one matrix-vector product over the live slots.
+    """
+
+    def __init__(
+        self,
+        dim: int,
+        radius: float = CACHE_RADIUS,
+        max_entries: int = CACHE_SIZE,
+        ttl_seconds: float = CACHE_TTL_SECONDS,
+    ):
+        self.radius = radius
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+
+        self._keys = np.zeros((max_entries, dim), dtype=np.float32)
+        self._payloads: list = [None] * max_entries
+        self._created = np.zeros(max_entries, dtype=np.float64)
+        self._size = 0
+        self._next = 0
+        self._lock = threading.Lock()
+
+        self.hits = 0
+        self.misses = 0
+        self.stale = 0
+        self.evictions = 0
+
+    @staticmethod
+    def _normalize(embedding) -> np.ndarray:
+        vec = np.asarray(embedding, dtype=np.float32).reshape(-1)
+        return vec / max(float(np.linalg.norm(vec)), 1e-12)
+
+    def get(self, embedding):
+        """Payload of the closest cached query within `radius`, else None."""
+        query = self._normalize(embedding)
+        with self._lock:
+            size = self._size
+            if not size:
+                self.misses += 1
+                return None
+
+        # The scan runs outside the lock so concurrent lookups don't queue
+        # behind each other (they really run in parallel without the GIL).
+        # A concurrent put() may be rewriting a row mid-scan, so the winner
+        # is re-scored under the lock before it is trusted.
+        similarities = self._keys[:size] @ query
+        now = time.monotonic()
+        expired = now - self._created[:size] > self.ttl_seconds
+        if expired.any():
+            with self._lock:
+                for slot in np.flatnonzero(expired):
+                    # recheck: put() may have refreshed the slot since the scan
+                    if self._payloads[slot] is not None and now - self._created[slot] > self.ttl_seconds:
+                        self._payloads[slot] = None
+                        self._keys[slot] = 0.0
+                        self.stale += 1
+            similarities[expired] = -np.inf
+        best = int(np.argmax(similarities))
+
+        with self._lock:
+            similarity = float(self._keys[best] @ query)
+            if (
+                1.0 - similarity > self.radius
+                or self._payloads[best] is None
+                or time.monotonic() - self._created[best] > self.ttl_seconds
+            ):
+                self.misses += 1
+                return None
+
+            self.hits += 1
+            return self._payloads[best]
+
+    def put(self, embedding, payload):
+        """Cache `payload` for this query, overwriting the oldest slot when full."""
+        query = self._normalize(embedding)
+        with self._lock:
+            slot = self._next
+            if self._payloads[slot] is not None and self._size == self.max_entries:
+                self.evictions += 1
+            self._keys[slot] = query
+            self._payloads[slot] = payload
+            self._created[slot] = time.monotonic()
+            self._next = (slot + 1) % self.max_entries
+            self._size = min(self._size + 1, self.max_entries)
+
+    def clear(self):
+        """Invalidate everything, e.g. after the advice index is rebuilt."""
+        with self._lock:
+            self.stale += sum(p is not None for p in self._payloads)
+            self._keys[:] = 0.0
+            self._payloads = [None] * self.max_entries
+            self._size = 0
+            self._next = 0
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": sum(p is not None for p in self._payloads[: self._size]),
+                "capacity": self.max_entries,
+                "radius": self.radius,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+                "stale": self.stale,
+                "evictions": self.evictions,
+            }
@@ -0,0 +1,116 @@
+import argparse
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+from corpus_store import load_texts
+from model_artifacts import load_classifier, load_encoder
+from text_pipeline import SharedTextPipeline
+
+# Concurrency stress check for the shared inference engine (text_pipeline.py).
+# Many threads hammer one SharedTextPipeline with classify + embed calls, the
+# way FastAPI's handler pool does. Every result is compared with a
+# single-threaded reference; any exception ("Already borrowed", ...) or
+# mismatch fails the run with a non-zero exit code.
+#
+#   python stress_engine.py --threads 1 4 16 32 --requests 2000
+#   python stress_engine.py --shared-tokenizers   # the old, unsafe setup
+
+
+def reference_outputs(engine, texts):
+    """Single-threaded ground truth per distinct text."""
+    return {
+        text: (engine.classify([text])[0], engine.embed([text])[0])
+        for text in dict.fromkeys(texts)
+    }
+
+
+def run_load(engine, texts, reference, threads, requests):
+    errors = []
+    mismatches = 0
+    lock = threading.Lock()
+    rng = random.Random(threads)
+    # mostly unseen texts so tokenizers really run concurrently; the plain
+    # ones are checked against the reference
+    workload = [rng.choice(texts) + f" ({i})" if i % 4 else rng.choice(texts) for i in range(requests)]
+
+    def one(text):
+        nonlocal mismatches
+        try:
+            probs = engine.classify([text])[0]
+            emb = engine.embed([text])[0]
+        except Exception as e:  # noqa: BLE001 - every failure is a finding here
+            with lock:
+                errors.append(f"{type(e).__name__}: {e}")
+            return
+        expected = reference.get(text)
+        if expected is not None and not (
+            np.allclose(probs, expected[0], atol=1e-4) and np.allclose(emb, expected[1], atol=1e-4)
+        ):
+            with lock:
+                mismatches += 1
+
+    engine._cache.clear()
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=threads) as pool:
+        list(pool.map(one, workload))
+    wall = time.perf_counter() - start
+    return {
+        "threads": threads,
+        "requests": requests,
+        "throughput_rps": requests / wall,
+        "errors": len(errors),
+        "mismatches": mismatches,
+        "first_error": errors[0] if errors else None,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Stress the shared inference engine from many threads")
+    parser.add_argument("--threads", type=int, nargs="+", default=[1, 4, 16, 32])
+    parser.add_argument("--requests", type=int, default=1000)
+    parser.add_argument("--texts", type=int, default=200)
+    parser.add_argument("--inference-slots", type=int, default=0, help="cap on concurrent forwards (0 = none)")
+    parser.add_argument("--shared-tokenizers", action="store_true", help="disable per-thread tokenizer clones")
+    args = parser.parse_args()
+
+    texts = load_texts(split="test")[:args.texts]
+    if not texts:
+        print("❌ No CBT-Bench test entries found; run process_cbt_data.py or restore processed_data/*_test.json")
+        raise SystemExit(1)
+
+    classifier_model, classifier_tokenizer = load_classifier()
+    engine = SharedTextPipeline(
+        classifier_model,
+        classifier_tokenizer,
+        load_encoder(),
+        inference_slots=args.inference_slots,
+        per_thread_tokenizers=not args.shared_tokenizers,
+    )
+    print(f"🔧 Reference outputs for {len(texts)} texts...")
+    reference = reference_outputs(engine, texts)
+
+    mode = "shared tokenizers" if args.shared_tokenizers else "per-thread tokenizers"
+    print(f"⚡ {args.requests} requests per run, {mode}, "
+          f"inference slots {args.inference_slots or 'unlimited'}\n")
+
+    failed = False
+    for threads in args.threads:
+        r = run_load(engine, texts, reference, threads, args.requests)
+        status = "✅" if not r["errors"] and not r["mismatches"] else "❌"
+        failed |= status == "❌"
+        print(f"   {status} threads={threads:<3} {r['throughput_rps']:7.1f} req/s   "
+              f"errors {r['errors']}   mismatches {r['mismatches']}"
+              + (f"   ({r['first_error']})" if r["first_error"] else ""))
+
+    print("\n" + "="*60)
+    print(f"{'❌ FAILED' if failed else '✅ PASSED'}  {engine.stats()}")
+    print("="*60)
+    raise SystemExit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
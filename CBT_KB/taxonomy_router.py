@@ -0,0 +1,102 @@
+import os
+from collections import defaultdict
+
+import numpy as np
+
+# Two-level retrieval routed through the advice taxonomy.
+# The knowledge base is organised issue -> sub_issue -> layers. Instead of a
+# flat search over every layer vector, the query is first matched against
+# issue centroids, then against the sub_issue centroids of the best issues,
+# and only the layer vectors of the winning sub_issues are scored exactly.
+# This is IVF with clusters that mean something, and the routing decisions
+# can be returned to explain a match.
+
+TAXONOMY_ROUTING = os.environ.get("NOTIA_TAXONOMY_ROUTING", "0") == "1"
+ROUTE_TOP_ISSUES = int(os.environ.get("NOTIA_ROUTE_TOP_ISSUES", "3"))
+ROUTE_TOP_SUB_ISSUES = int(os.environ.get("NOTIA_ROUTE_TOP_SUB_ISSUES", "4"))
+
+
+def _normalize_rows(matrix: np.ndarray) -> np.ndarray:
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    return matrix / np.maximum(norms, 1e-12)
+
+
+class TaxonomyRouter:
+    def __init__(self, vectors: np.ndarray, metadata: list[dict]):
+        """
+        vectors: layer embeddings, row i belongs to metadata[i]
+        (e.g. index.reconstruct_n(0, index.ntotal)).
+        """
+        self.vectors = np.ascontiguousarray(vectors, dtype=np.float32)
+
+        issue_rows = defaultdict(list)
+        sub_issue_rows = defaultdict(list)
+        # (issue, sub_issue) -> layer_type -> rows
+        self.layer_rows = defaultdict(lambda: defaultdict(list))
+        for i, m in enumerate(metadata):
+            key = (m["issue"], m["sub_issue"])
+            issue_rows[m["issue"]].append(i)
+            sub_issue_rows[key].append(i)
+            self.layer_rows[key][m["layer_type"]].append(i)
+
+        self.issues = list(issue_rows)
+        self.issue_centroids = _normalize_rows(
+            np.stack([self.vectors[rows].mean(axis=0) for rows in issue_rows.values()])
+        )
+
+        self.sub_issues = list(sub_issue_rows)
+        self.sub_issue_centroids = _normalize_rows(
+            np.stack([self.vectors[rows].mean(axis=0) for rows in sub_issue_rows.values()])
+        )
+        self.sub_issues_of = defaultdict(list)  # issue -> positions in self.sub_issues
+        for pos, (issue, _) in enumerate(self.sub_issues):
+            self.sub_issues_of[issue].append(pos)
+
+    def route(self, query_emb, top_issues: int = ROUTE_TOP_ISSUES, top_sub_issues: int = ROUTE_TOP_SUB_ISSUES):
+        """Pick the closest issues, then the closest sub_issues inside them."""
+        query = np.asarray(query_emb, dtype=np.float32).reshape(-1)
+        query = query / max(float(np.linalg.norm(query)), 1e-12)
+
+        issue_scores = self.issue_centroids @ query
+        best_issues = np.argsort(-issue_scores)[:top_issues]
+
+        positions = [p for i in best_issues for p in self.sub_issues_of[self.issues[i]]]
+        sub_scores = self.sub_issue_centroids[positions] @ query
+        best_subs = [positions[j] for j in np.argsort(-sub_scores)[:top_sub_issues]]
+
+        routing = {
+            "issues": [
+                {"issue": self.issues[i], "score": float(issue_scores[i])} for i in best_issues
+            ],
+            "sub_issues": [
+                {
+                    "issue": self.sub_issues[p][0],
+                    "sub_issue": self.sub_issues[p][1],
+                    "score": float(sub_scores[positions.index(p)]),
+                }
+                for p in best_subs
+            ],
+        }
+        return [self.sub_issues[p] for p in best_subs], routing
+
+    def search(self, query_emb, k: int, layer_type: str | None = None):
+        """
+        Exact squared-L2 search restricted to the routed sub_issues.
+        Returns (distances, indices, routing) like IndexFlatL2.search for one query.
+        """
+        sub_issues, routing = self.route(query_emb)
+
+        rows = []
+        for key in sub_issues:
+            by_layer = self.layer_rows[key]
+            if layer_type:
+                rows.extend(by_layer.get(layer_type, []))
+            else:
+                rows.extend(r for layer in by_layer.values() for r in layer)
+        rows = np.asarray(rows, dtype=np.int64)
+        routing["candidates"] = int(len(rows))
+
+        query = np.asarray(query_emb, dtype=np.float32).reshape(-1)
+        dists = ((self.vectors[rows] - query) ** 2).sum(axis=1)
+        order = np.argsort(dists)[:k]
+        return dists[order], rows[order], routing
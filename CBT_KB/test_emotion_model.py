@@ -1,24 +1,51 @@
-from transformers import pipeline
-
-# Path to  model 
-MODEL_PATH = "../model"
-
-# GoEmotions label names (28 emotions)
-EMOTION_LABELS = [
-    'admiration', 'amusement', 'anger', 'annoyance', 'approval', 'caring',
-    'confusion', 'curiosity', 'desire', 'disappointment', 'disapproval',
-    'disgust', 'embarrassment', 'excitement', 'fear', 'gratitude', 'grief',
-    'joy', 'love', 'nervousness', 'optimism', 'pride', 'realization',
-    'relief', 'remorse', 'sadness', 'surprise', 'neutral'
-]
+import argparse
 
-print("🧠 Loading emotion classifier...")
-classifier = pipeline(
-    "text-classification",
-    model=MODEL_PATH,
-    top_k=None,
+import torch
+
+from model_artifacts import (
+    build_artifacts,
+    classifier_max_length,
+    load_classifier,
+    stale_classifier_artifacts,
 )
-print("✅ Model loaded\n")
+from scoring import EMOTION_LABELS
+
+# Smoke test for the emotion classifier, loaded the way api.py loads it
+# (traced artifact, local copy or ../model, see model_artifacts.py).
+# Artifacts older than ../model are reported; --rebuild rebuilds them first.
+#
+#   python test_emotion_model.py
+#   python test_emotion_model.py --rebuild
+
+parser = argparse.ArgumentParser(description="Check the emotion classifier on a few entries")
+parser.add_argument("--rebuild", action="store_true", help="rebuild stale model artifacts before testing")
+args = parser.parse_args()
+
+stale = stale_classifier_artifacts()
+if stale and args.rebuild:
+    print(f"🔧 Rebuilding model artifacts ({stale})...")
+    build_artifacts()
+elif stale:
+    print(f"⚠️  Model artifacts are stale: {stale}")
+    print("   Testing ../model instead; run build_artifacts.py (or pass --rebuild)\n")
+
+print("🧠 Loading emotion classifier...")
+model, tokenizer = load_classifier()
+max_length = classifier_max_length(model, tokenizer)
+print(f"✅ Model loaded ({type(model).__name__})\n")
+
+
+def detect(text, threshold=0.5):
+    """(emotion, score) pairs above threshold, best first."""
+    enc = tokenizer(text, truncation=True, max_length=max_length, return_tensors="pt")
+    with torch.inference_mode():
+        scores = torch.sigmoid(model(enc["input_ids"], enc["attention_mask"]).logits)[0]
+    emotion_scores = [
+        (EMOTION_LABELS[idx], float(score)) for idx, score in enumerate(scores) if score > threshold
+    ]
+    emotion_scores.sort(key=lambda x: x[1], reverse=True)
+    return emotion_scores
+
 
 # Test entries
 test_entries = [
@@ -34,37 +61,10 @@ print("="*60)
 
 for entry in test_entries:
     print(f"\n📝 Entry: {entry}")
-    
-    result = classifier(entry)
-
-    print(f"Detected emotions:")
-    
-    
-    # Handle output format
-    if isinstance(result, list) and len(result) > 0:
-        emotions = result[0] if isinstance(result[0], list) else result
-        
-        # Map LABEL_X to actual emotion names
-        emotion_scores = []
-        for emo in emotions:
-            label = emo['label']
-            score = emo['score']
-            
-            # Extract index from LABEL_X
-            if label.startswith('LABEL_'):
-                idx = int(label.split('_')[1])
-                emotion_name = EMOTION_LABELS[idx]
-                
-                # Only show emotions above threshold
-                if score > 0.5:
-                    emotion_scores.append({'emotion': emotion_name, 'score': score})
-        
-        # Sort by score and show top 3
-        emotion_scores.sort(key=lambda x: x['score'], reverse=True)
-        
-        for emo in emotion_scores[:3]:
-            print(f"   - {emo['emotion']}: {emo['score']:.3f}")
-    
+    print("Detected emotions:")
+    # show top 3
+    for emotion, score in detect(entry)[:3]:
+        print(f"   - {emotion}: {score:.3f}")
     print("-"*60)
 
 print("\n" + "="*60)
@@ -77,29 +77,8 @@ user_entry = input("Your entry: ").strip()
 
 if user_entry:
     print(f"\n🔍 Analyzing: \"{user_entry}\"\n")
-    
-    result = classifier(user_entry)
-    
-    print(f"Detected emotions:")
-    
-    if isinstance(result, list) and len(result) > 0:
-        emotions = result[0] if isinstance(result[0], list) else result
-        
-        emotion_scores = []
-        for emo in emotions:
-            label = emo['label']
-            score = emo['score']
-            
-            if label.startswith('LABEL_'):
-                idx = int(label.split('_')[1])
-                emotion_name = EMOTION_LABELS[idx]
-                
-                if score > 0.5:
-                    emotion_scores.append({'emotion': emotion_name, 'score': score})
-        
-        emotion_scores.sort(key=lambda x: x['score'], reverse=True)
-        
-        for emo in emotion_scores[:3]:
-            print(f"   - {emo['emotion']}: {emo['score']:.3f}")
-
-print("\n Emotion classifier is working!")
\ No newline at end of file
+    print("Detected emotions:")
+    for emotion, score in detect(user_entry)[:3]:
+        print(f"   - {emotion}: {score:.3f}")
+
+print("\n Emotion classifier is working!")
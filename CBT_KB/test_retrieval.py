@@ -3,6 +3,9 @@ import numpy as np
 import faiss
 from sentence_transformers import SentenceTransformer
 
+from layer_search import LayerPartitions
+from projection import load_projection
+
 print("🔍 Testing Layered Retrieval System\n")
 
 # Load model
@@ -12,6 +15,8 @@ model = SentenceTransformer('all-MiniLM-L6-v2')
 # Load FAISS index
 print("Loading FAISS index...")
 index = faiss.read_index('embeddings/layered_advice_faiss.index')
+# reduced-dimension builds (create_embeddings.py --project-dim) project queries too
+projection = load_projection('embeddings')
 
 # Load metadata
 print("Loading metadata...\n")
@@ -21,9 +26,22 @@ with open('embeddings/layered_advice_metadata.json', 'r', encoding='utf-8') as f
 print(f"✅ Loaded {len(metadata)} layer records")
 print(f"   📊 {len(set(m['parent_id'] for m in metadata))} unique advice entries")
 print(f"   📐 5 layers per entry (validation, psychoeducation, technique, reframing, journaling)\n")
+
+LAYER_TYPES = ['validation', 'psychoeducation', 'technique', 'reframing', 'journaling']
+
+# One small index per layer type (layer_search.py), so a single query
+# embedding can be searched against every layer in one pass
+layer_partitions = LayerPartitions(index.reconstruct_n(0, index.ntotal), metadata, LAYER_TYPES)
+
 print("="*60)
 
 
+def encode(query):
+    """Query embedding in the index's space"""
+    query_emb = model.encode([query])[0]
+    return projection.apply(query_emb) if projection is not None else query_emb
+
+
 def search_layers(query, layer_type=None, top_k=3, threshold=0.0):  # Changed threshold to 0.0
     """
     Search for relevant advice layers - ALWAYS returns results
@@ -34,7 +52,7 @@ def search_layers(query, layer_type=None, top_k=3, threshold=0.0):  # Changed th
         top_k: Number of results
         threshold: Minimum similarity score (0-1)
     """
-    query_emb = model.encode([query])[0]
+    query_emb = encode(query)
     
     # Search more than needed for filtering
     search_k = min(top_k * 10, len(metadata))
@@ -68,10 +86,22 @@ def search_layers(query, layer_type=None, top_k=3, threshold=0.0):  # Changed th
     return results
 
 
+def search_layer_set(query, layer_types=LAYER_TYPES, top_k=1, threshold=0.0):
+    """
+    Best matches for several layer types from ONE query encoding
+
+    Returns: {layer_type: [results]} in the same format as search_layers
+    """
+    return layer_partitions.search(encode(query), layer_types, top_k=top_k, threshold=threshold)
+
+
 def stepwise_response(query):
     """Generate initial response - ALWAYS returns something"""
-    validation = search_layers(query, layer_type='validation', top_k=1, threshold=0.0)
-    psychoed = search_layers(query, layer_type='psychoeducation', top_k=1, threshold=0.0)
+    # One encode + one pass over the partitions gives every layer up front,
+    # so the "next steps" below don't need to search again
+    layers = search_layer_set(query, LAYER_TYPES, top_k=1, threshold=0.0)
+    validation = layers['validation']
+    psychoed = layers['psychoeducation']
     
     # Safety check - if still empty, get ANY validation/psychoed layers
     if not validation:
@@ -83,8 +113,11 @@ def stepwise_response(query):
     return {
         'validation': validation[0],
         'psychoeducation': psychoed[0],
-        'technique_available': True,
-        'deeper_available': True
+        'technique': layers['technique'],
+        'reframing': layers['reframing'],
+        'journaling': layers['journaling'],
+        'technique_available': bool(layers['technique']),
+        'deeper_available': bool(layers['reframing'] or layers['journaling'])
     }
 
 
@@ -117,7 +150,7 @@ for i, query in enumerate(test_queries, 1):
     print(f"   {psy['text']}...")
     
     # Show technique preview
-    tech = search_layers(query, layer_type='technique', top_k=1, threshold=0.0)
+    tech = response['technique']
     if tech:
         print(f"\n TECHNIQUE AVAILABLE:")
         print(f"   {tech[0]['text'][:150]}...")
@@ -168,19 +201,19 @@ if user_query:
             break
     
         if choice == "1":
-            tech = search_layers(user_query, layer_type='technique', top_k=1, threshold=0.0)
+            tech = response['technique']
             if tech:
                 print(f"\n🛠️  TECHNIQUE:\n{tech[0]['text']}\n")
                 shown_layers.add('1')
         
         elif choice == "2":
-            reframe = search_layers(user_query, layer_type='reframing', top_k=1, threshold=0.0)
+            reframe = response['reframing']
             if reframe:
                 print(f"\n🔄 REFRAME YOUR THINKING:\n{reframe[0]['text']}\n")
                 shown_layers.add('2')
         
         elif choice == "3":
-            journal = search_layers(user_query, layer_type='journaling', top_k=1, threshold=0.0)
+            journal = response['journaling']
             if journal:
                 print(f"\n📝 JOURNAL PROMPT:\n{journal[0]['text']}\n")
                 shown_layers.add('3')
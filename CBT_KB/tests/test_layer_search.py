@@ -0,0 +1,61 @@
+import numpy as np
+
+from layer_search import LayerPartitions
+
+
+def make_base(layers=("validation", "technique"), per_layer=20, dim=8, seed=0):
+    rng = np.random.default_rng(seed)
+    metadata, vectors = [], []
+    for layer in layers:
+        for i in range(per_layer):
+            metadata.append({
+                "parent_id": f"p{i}",
+                "layer_type": layer,
+                "issue": "anxiety",
+                "sub_issue": f"s{i % 3}",
+                "emotions": ["fear"],
+                "text": f"{layer} {i}",
+            })
+            vectors.append(rng.normal(size=dim))
+    return np.asarray(vectors, dtype=np.float32), metadata
+
+
+def test_matches_a_filtered_flat_search():
+    vectors, metadata = make_base()
+    partitions = LayerPartitions(vectors, metadata, ("validation", "technique"))
+    query = vectors[3] + 0.01
+
+    found = partitions.search(query, top_k=5)
+
+    dists = ((vectors - query) ** 2).sum(axis=1)
+    for layer in ("validation", "technique"):
+        rows = [i for i in np.argsort(dists) if metadata[i]["layer_type"] == layer][:5]
+        assert [r["row"] for r in found[layer]] == rows
+        assert all(r["layer"] == layer for r in found[layer])
+        assert np.allclose([r["score"] for r in found[layer]], 1 / (1 + dists[rows]), atol=1e-5)
+
+
+def test_empty_partitions_and_non_positive_k():
+    vectors, metadata = make_base(layers=("validation",))
+    partitions = LayerPartitions(vectors, metadata, ("validation", "journaling"))
+
+    assert partitions.sizes() == {"validation": 20, "journaling": 0}
+    assert partitions.search(vectors[0], top_k=3)["journaling"] == []
+    assert partitions.search(vectors[0], top_k=0) == {"validation": [], "journaling": []}
+    # an unknown layer type is empty too, not a KeyError
+    assert partitions.search(vectors[0], ["reframing"]) == {"reframing": []}
+
+
+def test_top_k_larger_than_partition():
+    vectors, metadata = make_base(per_layer=2)
+    partitions = LayerPartitions(vectors, metadata, ("validation",))
+
+    assert len(partitions.search(vectors[0], top_k=10)["validation"]) == 2
+
+
+def test_threshold_filters_far_layers():
+    vectors, metadata = make_base()
+    partitions = LayerPartitions(vectors, metadata, ("validation",))
+
+    found = partitions.search(vectors[0], top_k=20, threshold=0.99)["validation"]
+    assert [r["row"] for r in found] == [0]
@@ -0,0 +1,221 @@
+import copy
+import os
+import threading
+from collections import OrderedDict
+from concurrent.futures import Future
+from contextlib import nullcontext
+
+import numpy as np
+import torch
+
+from model_artifacts import classifier_max_length
+
+# Shared pre-processing for the emotion classifier and the sentence encoder.
+# The DistilBERT model in ../model and all-MiniLM-L6-v2 both ship the uncased
+# BERT WordPiece vocabulary, so one tokenizer call can feed both models; the
+# ids only differ in how far they are truncated. If the vocabularies ever
+# diverge we fall back to tokenizing separately, still cached per text so
+# /get-advice never tokenizes the same entry twice. /get-advice classifies
+# and encodes concurrently, so a text that is already being tokenized is
+# waited for rather than tokenized again.
+#
+# FastAPI runs sync handlers on a thread pool, so this object is shared by
+# concurrent requests. Fast tokenizers keep mutable truncation/padding state
+# in their Rust backend and raise "Already borrowed" when two threads use one
+# at once, so every thread tokenizes with its own clone. Model weights are
+# shared: inference-mode forwards don't mutate them. NOTIA_INFERENCE_SLOTS
+# optionally caps how many forwards run at once, so N request threads don't
+# each start a full set of torch intra-op threads.
+
+TOKEN_CACHE_SIZE = 1024
+INFERENCE_SLOTS = int(os.environ.get("NOTIA_INFERENCE_SLOTS", "0"))  # 0 = no cap
+
+
+def vocabularies_compatible(tokenizer_a, tokenizer_b) -> bool:
+    """True when both tokenizers map every text to the same input ids."""
+    def signature(tok):
+        return (
+            tok.init_kwargs.get("do_lower_case"),
+            tok.init_kwargs.get("strip_accents"),
+            tok.cls_token_id,
+            tok.sep_token_id,
+            tok.pad_token_id,
+            tok.unk_token_id,
+        )
+
+    return (
+        signature(tokenizer_a) == signature(tokenizer_b)
+        and tokenizer_a.get_vocab() == tokenizer_b.get_vocab()
+    )
+
+
+def truncate_ids(input_ids: list[int], max_length: int, sep_token_id: int) -> list[int]:
+    """Cut a [CLS] ... [SEP] sequence to max_length, keeping the final [SEP]."""
+    if len(input_ids) <= max_length:
+        return input_ids
+    return input_ids[: max_length - 1] + [sep_token_id]
+
+
+class SharedTextPipeline:
+    """
+    Tokenize a journal entry once, then run the classifier and the encoder
+    on tensors built from the same ids.
+    """
+
+    def __init__(
+        self,
+        classifier_model,
+        classifier_tokenizer,
+        embedding_model,
+        cache_size=TOKEN_CACHE_SIZE,
+        inference_slots=INFERENCE_SLOTS,
+        per_thread_tokenizers=True,
+    ):
+        self.classifier_model = classifier_model.eval()
+        self.classifier_tokenizer = classifier_tokenizer
+        self.embedding_model = embedding_model.eval()
+        self.embedding_tokenizer = embedding_model.tokenizer
+
+        self.classifier_max_length = classifier_max_length(classifier_model, classifier_tokenizer)
+        self.embedding_max_length = embedding_model.max_seq_length
+        self.multi_label = classifier_model.config.problem_type == "multi_label_classification"
+
+        self.shared_vocab = vocabularies_compatible(classifier_tokenizer, self.embedding_tokenizer)
+
+        self.cache_size = cache_size
+        self._cache: OrderedDict[str, tuple[list[int], list[int]]] = OrderedDict()
+        self._pending: dict[str, Future] = {}  # texts being tokenized right now
+        self._lock = threading.Lock()
+        self.tokenizer_calls = 0
+
+        self.per_thread_tokenizers = per_thread_tokenizers
+        self._local = threading.local()
+        self.tokenizer_clones = 0
+        self.inference_slots = inference_slots
+        self._slots = threading.BoundedSemaphore(inference_slots) if inference_slots else None
+
+    # ---------- per-thread handles ----------
+
+    def _tokenizers(self):
+        """(classifier, encoder) tokenizers owned by the calling thread."""
+        if not self.per_thread_tokenizers:
+            return self.classifier_tokenizer, self.embedding_tokenizer
+        tokenizers = getattr(self._local, "tokenizers", None)
+        if tokenizers is None:
+            classifier_tok = copy.deepcopy(self.classifier_tokenizer)
+            # the encoder tokenizer is only called when the vocabularies differ
+            embedding_tok = classifier_tok if self.shared_vocab else copy.deepcopy(self.embedding_tokenizer)
+            tokenizers = self._local.tokenizers = (classifier_tok, embedding_tok)
+            with self._lock:
+                self.tokenizer_clones += 1
+        return tokenizers
+
+    def _model_slot(self):
+        return self._slots if self._slots is not None else nullcontext()
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "shared_vocab": self.shared_vocab,
+                "cached_texts": len(self._cache),
+                "tokenizer_calls": self.tokenizer_calls,
+                "tokenizer_clones": self.tokenizer_clones,
+                "inference_slots": self.inference_slots or None,
+            }
+
+    def clear_cache(self):
+        with self._lock:
+            self._cache.clear()
+
+    # ---------- tokenization ----------
+
+    def token_ids(self, text: str) -> tuple[list[int], list[int]]:
+        """(classifier ids, encoder ids) for `text`, tokenizing at most once per tokenizer."""
+        with self._lock:
+            cached = self._cache.get(text)
+            if cached is not None:
+                self._cache.move_to_end(text)
+                return cached
+            pending = self._pending.get(text)
+            if pending is None:
+                self._pending[text] = future = Future()
+        if pending is not None:
+            return pending.result()  # another thread is tokenizing this text
+
+        try:
+            pair, calls = self._tokenize(text)
+        except BaseException as e:
+            with self._lock:
+                del self._pending[text]
+            future.set_exception(e)
+            raise
+
+        with self._lock:
+            del self._pending[text]
+            self.tokenizer_calls += calls
+            self._cache[text] = pair
+            while len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
+        future.set_result(pair)
+        return pair
+
+    def _tokenize(self, text: str) -> tuple[tuple[list[int], list[int]], int]:
+        """((classifier ids, encoder ids), tokenizer calls made)."""
+        classifier_tokenizer, embedding_tokenizer = self._tokenizers()
+        if self.shared_vocab:
+            ids = classifier_tokenizer(
+                text,
+                truncation=True,
+                max_length=max(self.classifier_max_length, self.embedding_max_length),
+            )["input_ids"]
+            calls = 1
+            sep = self.classifier_tokenizer.sep_token_id
+            pair = (
+                truncate_ids(ids, self.classifier_max_length, sep),
+                truncate_ids(ids, self.embedding_max_length, sep),
+            )
+        else:
+            pair = (
+                classifier_tokenizer(
+                    text, truncation=True, max_length=self.classifier_max_length
+                )["input_ids"],
+                embedding_tokenizer(
+                    text, truncation=True, max_length=self.embedding_max_length
+                )["input_ids"],
+            )
+            calls = 2
+        return pair, calls
+
+    @staticmethod
+    def _batch(sequences: list[list[int]], pad_token_id: int, device) -> dict:
+        """Right-pad id lists into input_ids / attention_mask tensors."""
+        width = max(len(s) for s in sequences)
+        input_ids = torch.full((len(sequences), width), pad_token_id, dtype=torch.long)
+        attention_mask = torch.zeros((len(sequences), width), dtype=torch.long)
+        for i, seq in enumerate(sequences):
+            input_ids[i, : len(seq)] = torch.tensor(seq, dtype=torch.long)
+            attention_mask[i, : len(seq)] = 1
+        return {
+            "input_ids": input_ids.to(device),
+            "attention_mask": attention_mask.to(device),
+        }
+
+    # ---------- models ----------
+
+    def classify(self, texts: list[str]) -> np.ndarray:
+        """Per-label probabilities, shape (len(texts), num_labels)."""
+        ids = [self.token_ids(t)[0] for t in texts]
+        inputs = self._batch(ids, self.classifier_tokenizer.pad_token_id, self.classifier_model.device)
+        with self._model_slot(), torch.inference_mode():
+            logits = self.classifier_model(**inputs).logits
+        probs = torch.sigmoid(logits) if self.multi_label else torch.softmax(logits, dim=-1)
+        return probs.float().cpu().numpy()
+
+    def embed(self, texts: list[str]) -> np.ndarray:
+        """Sentence embeddings, identical to embedding_model.encode(texts)."""
+        ids = [self.token_ids(t)[1] for t in texts]
+        features = self._batch(ids, self.embedding_tokenizer.pad_token_id, self.embedding_model.device)
+        features["token_type_ids"] = torch.zeros_like(features["input_ids"])
+        with self._model_slot(), torch.inference_mode():
+            embeddings = self.embedding_model(features)["sentence_embedding"]
+        return embeddings.float().cpu().numpy()
@@ -0,0 +1,204 @@
+import os
+import sqlite3
+import threading
+from datetime import date, datetime, timedelta, timezone
+
+# Rolling per-user emotion trend aggregates.
+# Every /get-advice call bumps one daily and one weekly bucket per detected
+# emotion, so trend queries read at most `periods` buckets per emotion
+# instead of scanning every reflection the user ever wrote. Each entry_id is
+# folded in once (trend_entries), so a retried request doesn't count twice.
+
+TREND_DB_PATH = os.environ.get("NOTIA_TREND_DB", "user_data/trends.sqlite3")
+
+GRANULARITIES = {
+    "day": timedelta(days=1),
+    "week": timedelta(weeks=1),
+}
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS trend_entries (
+    user_id  TEXT NOT NULL,
+    entry_id TEXT NOT NULL,
+    PRIMARY KEY (user_id, entry_id)
+) WITHOUT ROWID;
+
+CREATE TABLE IF NOT EXISTS entry_buckets (
+    user_id      TEXT NOT NULL,
+    granularity  TEXT NOT NULL,
+    bucket_start TEXT NOT NULL,
+    entries      INTEGER NOT NULL,
+    PRIMARY KEY (user_id, granularity, bucket_start)
+) WITHOUT ROWID;
+
+CREATE TABLE IF NOT EXISTS emotion_buckets (
+    user_id       TEXT NOT NULL,
+    granularity   TEXT NOT NULL,
+    bucket_start  TEXT NOT NULL,
+    emotion       TEXT NOT NULL,
+    count         INTEGER NOT NULL,
+    intensity_sum REAL NOT NULL,
+    intensity_max REAL NOT NULL,
+    PRIMARY KEY (user_id, granularity, bucket_start, emotion)
+) WITHOUT ROWID;
+
+CREATE TABLE IF NOT EXISTS issue_buckets (
+    user_id      TEXT NOT NULL,
+    granularity  TEXT NOT NULL,
+    bucket_start TEXT NOT NULL,
+    issue        TEXT NOT NULL,
+    sub_issue    TEXT NOT NULL,
+    count        INTEGER NOT NULL,
+    PRIMARY KEY (user_id, granularity, bucket_start, issue, sub_issue)
+) WITHOUT ROWID;
+"""
+
+
+def bucket_start(moment: datetime, granularity: str) -> date:
+    """Start date (UTC) of the day/week bucket that contains `moment`."""
+    if moment.tzinfo is not None:
+        moment = moment.astimezone(timezone.utc)
+    day = moment.date()
+    if granularity == "week":
+        return day - timedelta(days=day.weekday())  # ISO weeks start on Monday
+    return day
+
+
+class TrendStore:
+    """SQLite (WAL) store of daily/weekly emotion and issue counts per user."""
+
+    def __init__(self, path: str = TREND_DB_PATH):
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript(SCHEMA)
+        self._lock = threading.Lock()
+
+    def record(
+        self,
+        user_id: str,
+        entry_id: str,
+        emotions: list[dict],
+        issue: str | None = None,
+        sub_issue: str | None = None,
+        created_at: datetime | None = None,
+    ) -> bool:
+        """
+        Fold one reflection into every granularity's current bucket.
+        Returns False (and changes nothing) if `entry_id` was already recorded.
+        """
+        created_at = created_at or datetime.now(timezone.utc)
+
+        entry_rows, emotion_rows, issue_rows = [], [], []
+        for granularity in GRANULARITIES:
+            start = bucket_start(created_at, granularity).isoformat()
+            entry_rows.append((user_id, granularity, start))
+
+            for e in emotions:
+                confidence = float(e["confidence"])
+                emotion_rows.append(
+                    (user_id, granularity, start, e["emotion"], confidence, confidence)
+                )
+
+            if issue:
+                issue_rows.append((user_id, granularity, start, issue, sub_issue or ""))
+
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                inserted = self._conn.execute(
+                    "INSERT OR IGNORE INTO trend_entries VALUES (?, ?)", (user_id, entry_id)
+                ).rowcount
+                if not inserted:
+                    self._conn.execute("COMMIT")
+                    return False
+                self._conn.executemany(
+                    """
+                    INSERT INTO entry_buckets VALUES (?, ?, ?, 1)
+                    ON CONFLICT DO UPDATE SET entries = entries + 1
+                    """,
+                    entry_rows,
+                )
+                self._conn.executemany(
+                    """
+                    INSERT INTO emotion_buckets VALUES (?, ?, ?, ?, 1, ?, ?)
+                    ON CONFLICT DO UPDATE SET
+                        count = count + 1,
+                        intensity_sum = intensity_sum + excluded.intensity_sum,
+                        intensity_max = MAX(intensity_max, excluded.intensity_max)
+                    """,
+                    emotion_rows,
+                )
+                self._conn.executemany(
+                    """
+                    INSERT INTO issue_buckets VALUES (?, ?, ?, ?, ?, 1)
+                    ON CONFLICT DO UPDATE SET count = count + 1
+                    """,
+                    issue_rows,
+                )
+                self._conn.execute("COMMIT")
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+        return True
+
+    def trends(
+        self,
+        user_id: str,
+        granularity: str = "day",
+        periods: int = 30,
+        now: datetime | None = None,
+    ) -> list[dict]:
+        """
+        Return the last `periods` buckets (oldest first) for a user.
+        Buckets without any reflections are omitted.
+        """
+        now = now or datetime.now(timezone.utc)
+        until = bucket_start(now, granularity)
+        since = until - GRANULARITIES[granularity] * (periods - 1)
+        params = (user_id, granularity, since.isoformat(), until.isoformat())
+
+        with self._lock:
+            entry_rows = self._conn.execute(
+                """
+                SELECT bucket_start, entries FROM entry_buckets
+                WHERE user_id = ? AND granularity = ? AND bucket_start >= ? AND bucket_start <= ?
+                ORDER BY bucket_start
+                """,
+                params,
+            ).fetchall()
+            emotion_rows = self._conn.execute(
+                """
+                SELECT bucket_start, emotion, count, intensity_sum, intensity_max
+                FROM emotion_buckets
+                WHERE user_id = ? AND granularity = ? AND bucket_start >= ? AND bucket_start <= ?
+                """,
+                params,
+            ).fetchall()
+            issue_rows = self._conn.execute(
+                """
+                SELECT bucket_start, issue, sub_issue, count FROM issue_buckets
+                WHERE user_id = ? AND granularity = ? AND bucket_start >= ? AND bucket_start <= ?
+                """,
+                params,
+            ).fetchall()
+
+        buckets = {
+            start: {"start": start, "entries": entries, "emotions": {}, "issues": []}
+            for start, entries in entry_rows
+        }
+        for start, emotion, count, intensity_sum, intensity_max in emotion_rows:
+            buckets[start]["emotions"][emotion] = {
+                "count": count,
+                "mean_intensity": intensity_sum / count,
+                "max_intensity": intensity_max,
+            }
+        for start, issue, sub_issue, count in issue_rows:
+            buckets[start]["issues"].append(
+                {"issue": issue, "sub_issue": sub_issue or None, "count": count}
+            )
+
+        return list(buckets.values())
@@ -1,5 +1,6 @@
 import 'package:flutter/material.dart';
 import '../../services/advice_service.dart'; // Your service file
+import '../../services/emotion_preview_service.dart';
 import '../../models/advice_response.dart'; // Adjust path if different
 
 class JournalInputScreen extends StatefulWidget {
@@ -19,9 +20,22 @@ class JournalInputScreen extends StatefulWidget {
 
 class _JournalInputScreenState extends State<JournalInputScreen> {
   final TextEditingController _controller = TextEditingController();
+  late final EmotionPreviewService _preview = EmotionPreviewService(
+    baseUrl: widget.adviceService.baseUrl,
+  );
+  List<Emotion> _previewEmotions = [];
   bool _isLoading = false;
   String? _errorMessage;
 
+  @override
+  void initState() {
+    super.initState();
+    // live emotions while typing
+    _preview.emotions.listen((emotions) {
+      if (mounted) setState(() => _previewEmotions = emotions.take(3).toList());
+    });
+  }
+
   void _submitEntry() async {
     final text = _controller.text.trim();
     if (text.isEmpty) {
@@ -69,6 +83,7 @@ class _JournalInputScreenState extends State<JournalInputScreen> {
 
   @override
   void dispose() {
+    _preview.close();
     _controller.dispose();
     super.dispose();
   }
@@ -84,6 +99,7 @@ class _JournalInputScreenState extends State<JournalInputScreen> {
             TextField(
               controller: _controller,
               maxLines: 8,
+              onChanged: _preview.update,
               decoration: InputDecoration(
                 //use prompt if provided
                 hintText:
@@ -92,6 +108,13 @@ class _JournalInputScreenState extends State<JournalInputScreen> {
                 border: OutlineInputBorder(),
               ),
             ),
+            const SizedBox(height: 8),
+            Wrap(
+              spacing: 6,
+              children: _previewEmotions
+                  .map((e) => Chip(label: Text(e.emotion)))
+                  .toList(),
+            ),
             const SizedBox(height: 12),
             if (_errorMessage != null)
               Text(_errorMessage!, style: TextStyle(color: Colors.red)),
@@ -0,0 +1,62 @@
+import 'dart:async';
+import 'dart:convert';
+import 'dart:io';
+import '../models/advice_response.dart';
+
+// Live emotion preview over /ws/emotion-preview.
+// Send the full text on every change; the server debounces, drops
+// superseded text and only answers for the latest input.
+class EmotionPreviewService {
+  final String baseUrl;
+  final _emotions = StreamController<List<Emotion>>.broadcast();
+  WebSocket? _socket;
+  Future<void>? _connecting;
+  int _seq = 0;
+
+  EmotionPreviewService({required this.baseUrl});
+
+  Stream<List<Emotion>> get emotions => _emotions.stream;
+
+  Future<void> _connect() async {
+    final wsUrl = baseUrl.replaceFirst(RegExp(r'^http'), 'ws');
+    final socket = await WebSocket.connect('$wsUrl/ws/emotion-preview');
+    _socket = socket;
+    socket.listen(
+      (data) {
+        final message = jsonDecode(data as String);
+        // ignore answers for text we have already replaced
+        if (message['seq'] != _seq) return;
+        // server could not classify this text; keep showing the last preview
+        if (message['error'] != null) return;
+        _emotions.add(
+          (message['detected_emotions'] as List)
+              .map((e) => Emotion.fromJson(e))
+              .toList(),
+        );
+      },
+      onDone: () => _socket = null,
+      onError: (_) => _socket = null,
+      cancelOnError: true,
+    );
+  }
+
+  Future<void> update(String text) async {
+    try {
+      // one connection attempt at a time, however fast the user types
+      if (_socket == null) await (_connecting ??= _connect());
+      _seq++;
+      _socket?.add(jsonEncode({'seq': _seq, 'text': text}));
+    } catch (e) {
+      // preview is best effort; the journal still works without it
+      _socket = null;
+    } finally {
+      _connecting = null;
+    }
+  }
+
+  Future<void> close() async {
+    await _socket?.close();
+    _socket = null;
+    await _emotions.close();
+  }
+}